@@ -0,0 +1,84 @@
+"""Benchmark of reply compression codecs on simulated transaction responses.
+
+    python -m benchmarks.compression --pages 10 --repeat 20
+"""
+import argparse
+import json
+from time import monotonic
+
+from sapi_kiwoom.sim import SimulationConfig, SimulatedKiwoomControl, install
+from sapi_kiwoom.sim.stats import get_rate, format_report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark reply compression codecs")
+    parser.add_argument("--pages", type=int, default=10, help="continuation pages per response")
+    parser.add_argument("--repeat", type=int, default=20, help="compressions of each response per codec")
+    parser.add_argument("--json", help="write the report to this file as json")
+    return parser.parse_args()
+
+
+def get_payloads(pages):
+    # pylint: disable=import-outside-toplevel
+    from sapi_kiwoom.kiwoom.schema import get_schema
+    from sapi_kiwoom.kiwoom.transaction import REQUEST_MINUTE_CANDLE_CODE, REQUEST_DAY_CANDLE_CODE
+    from sapi_kiwoom.messenger import get_success_message, serialize_task_response
+    from sapi_kiwoom.sim.control import TransactionCursor
+
+    control = SimulatedKiwoomControl(None, SimulationConfig(max_pages=pages))
+    payloads = {}
+    for name, transaction_code, inputs in (
+        ("minute_candle", REQUEST_MINUTE_CANDLE_CODE, {"종목코드": "005930", "틱범위": "1"}),
+        ("day_candle", REQUEST_DAY_CANDLE_CODE, {"종목코드": "005930"}),
+    ):
+        cursor = TransactionCursor(control, transaction_code, inputs)
+        rows = []
+        for _ in range(pages):
+            rows.extend(cursor.next_page()[0])
+        result = get_schema(transaction_code).decode(rows)
+        payloads[name] = serialize_task_response(get_success_message("benchmark", result)).encode("utf-8")
+    return payloads
+
+
+def run_codec(codec, body, repeat):
+    started = monotonic()
+    for _ in range(repeat):
+        compressed = codec.compress(body)
+    compress_seconds = monotonic() - started
+    started = monotonic()
+    for _ in range(repeat):
+        codec.decompress(compressed)
+    decompress_seconds = monotonic() - started
+    megabytes = repeat * len(body) / 2**20
+    return {
+        "compressed_bytes": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "compress_megabytes_per_second": get_rate(megabytes, compress_seconds),
+        "decompress_megabytes_per_second": get_rate(megabytes, decompress_seconds),
+    }
+
+
+def main():
+    args = parse_args()
+    # Messenger imports pika, the in-process stand-in is enough here
+    install()
+    # pylint: disable=import-outside-toplevel
+    from sapi_kiwoom.compression import CODECS, get_codec, is_codec_available
+
+    report = {}
+    for name, body in get_payloads(args.pages).items():
+        report[name] = {"bytes": len(body)}
+        for codec_name in CODECS:
+            if not is_codec_available(codec_name):
+                report[name][codec_name] = "not installed"
+                continue
+            report[name][codec_name] = run_codec(get_codec(codec_name), body, args.repeat)
+
+    print(format_report("sapi-kiwoom compression benchmark", report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
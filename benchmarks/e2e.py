@@ -0,0 +1,148 @@
+"""End-to-end benchmark of `KiwoomModule` and `Messenger` against simulated OpenAPI and broker.
+
+    python -m benchmarks.e2e --transactions 50 --pages 3 --codes 20 --tick-rate 200
+"""
+import argparse
+import json
+import tracemalloc
+from time import monotonic, sleep
+
+from sapi_kiwoom.sim import SimulationConfig, install
+from sapi_kiwoom.sim.server import SimulatedServer, SimulatedClient
+from sapi_kiwoom.sim.stats import summarize_latencies, get_rate, get_memory_usage, reset_memory_peak, format_report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark sapi-kiwoom with simulated OpenAPI and broker")
+    parser.add_argument("--lookups", type=int, default=500, help="number of get-stock-name requests")
+    parser.add_argument("--transactions", type=int, default=50, help="number of request-day-candle requests")
+    parser.add_argument("--pages", type=int, default=3, help="continuation pages per transaction")
+    parser.add_argument("--response-delay", type=float, default=0.0, help="simulated OpenAPI delay per page")
+    parser.add_argument("--codes", type=int, default=20, help="number of subscribed stock codes")
+    parser.add_argument("--tick-rate", type=float, default=100.0, help="ticks per second for each code")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to stream real time data")
+    parser.add_argument("--messages", type=int, default=200, help="number of Messenger.send calls")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the OpenAPI request limit")
+    parser.add_argument("--trace-memory", action="store_true", help="trace python allocations (slow)")
+    parser.add_argument("--json", help="write the report to this file as json")
+    return parser.parse_args()
+
+
+def run_requests(client, count, method, parameters):
+    reset_memory_peak()
+    started = monotonic()
+    for _ in range(count):
+        client.request(method, parameters)
+    replies = client.wait(count)
+    elapsed = monotonic() - started
+    client.replies = []
+    return {
+        "requests": count,
+        "seconds": round(elapsed, 3),
+        "failed": sum(1 for each in replies if each[2]["status"] != "TASK_SUCCEED"),
+        "requests_per_second": get_rate(len(replies), elapsed),
+        "latency_ms": summarize_latencies([each[1] for each in replies]),
+        "memory": get_memory_usage(),
+    }
+
+
+def run_real_time(server, client, codes, duration):
+    reset_memory_peak()
+    control = server.control
+    control.config.record_tick_latency = True
+    stock_codes = control.config.stock_codes[:codes]
+    task_ids = [client.request("subscribe-realtime", {"stock_code": each}) for each in stock_codes]
+    client.wait(len(stock_codes))
+    client.replies = []
+    emitted = control.emitted_ticks
+    control.tick_latencies.clear()
+
+    started = monotonic()
+    while monotonic() - started < duration:
+        client.connection.process_data_events(time_limit=0.05)
+    elapsed = monotonic() - started
+    received = len(client.replies)
+    emitted = control.emitted_ticks - emitted
+
+    for task_id, stock_code in zip(task_ids, stock_codes):
+        client.request("unsubscribe-realtime", {"stock_code": stock_code}, task_id=task_id)
+    return {
+        "codes": len(stock_codes),
+        "emitted_ticks_per_second": get_rate(emitted, elapsed),
+        "delivered_ticks_per_second": get_rate(received, elapsed),
+        "tick_handling_latency_ms": summarize_latencies(control.tick_latencies),
+        "memory": get_memory_usage(),
+    }
+
+
+def run_messenger(server, count):
+    # pylint: disable=import-outside-toplevel
+    from sapi_kiwoom.messenger import get_success_message, serialize_task_response
+    from sapi_kiwoom.sim.broker import BlockingConnection, BROKER
+
+    reset_memory_peak()
+    client = SimulatedClient()
+    payload = [
+        {"day": f"2021{index:04d}", "closing": "+12300", "opening": "-12250", "high": "12400",
+         "low": "12200", "volume": "123456"}
+        for index in range(600)
+    ]
+    channel = BlockingConnection().channel()
+    body_size = len(serialize_task_response(get_success_message("benchmark", payload)).encode("utf-8"))
+    latencies = []
+    started = monotonic()
+    for _ in range(count):
+        sent = monotonic()
+        server.module.messenger.send(get_success_message("benchmark", payload), client.reply_queue, channel)
+        latencies.append(monotonic() - sent)
+    elapsed = monotonic() - started
+    BROKER.delete(client.reply_queue)
+    return {
+        "messages": count,
+        "message_bytes": body_size,
+        "messages_per_second": get_rate(count, elapsed),
+        "megabytes_per_second": get_rate(count * body_size / 2**20, elapsed),
+        "send_latency_ms": summarize_latencies(latencies),
+        "memory": get_memory_usage(),
+    }
+
+
+def main():
+    args = parse_args()
+    # Before any server module imports PyQt5 or pika
+    install()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    config = SimulationConfig(
+        response_delay=args.response_delay,
+        max_pages=args.pages,
+        tick_rate=args.tick_rate,
+    )
+    server = SimulatedServer(config, rate_limit=args.rate_limit).start()
+    sleep(0.1)
+    client = SimulatedClient()
+
+    report = {"lookup": run_requests(client, args.lookups, "get-stock-name", {"stock_code": "005930"})}
+    report["transaction"] = run_requests(
+        client,
+        args.transactions,
+        "request-day-candle",
+        {"stock_code": "005930", "from": "19000101", "to": "99991231", "is_adjusted": "1"},
+    )
+    report["transaction"]["pages_per_second"] = get_rate(
+        server.control.requested_pages,
+        report["transaction"]["seconds"]
+    )
+    report["real_time"] = run_real_time(server, client, args.codes, args.duration)
+    report["messenger"] = run_messenger(server, args.messages)
+
+    server.stop()
+    print(format_report("sapi-kiwoom benchmark", report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Load test of one server by many simulated clients, with simulated OpenAPI and broker.
+
+    python -m benchmarks.load --clients 50 --rate 200 --concurrency 4 --mix lookup=7,transaction=2,subscribe=1
+"""
+import argparse
+import json
+
+from sapi_kiwoom.sim import SimulationConfig, install
+from sapi_kiwoom.sim.server import SimulatedServer
+from sapi_kiwoom.sim.stats import format_report
+
+
+def parse_args():
+    # pylint: disable=import-outside-toplevel
+    from sapi_kiwoom.sim.load import parse_mix
+
+    parser = argparse.ArgumentParser(description="Load test sapi-kiwoom with simulated clients")
+    parser.add_argument("--clients", type=int, default=10, help="number of clients with their own reply queue")
+    parser.add_argument("--rate", type=float, default=100.0, help="requests per second of all clients")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight per client")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default="lookup=7,transaction=2,subscribe=1",
+        help="weights of lookup, transaction and subscribe operations"
+    )
+    parser.add_argument("--hold", type=float, default=1.0, help="seconds before unsubscribing")
+    parser.add_argument("--pages", type=int, default=1, help="continuation pages per transaction")
+    parser.add_argument("--response-delay", type=float, default=0.0, help="simulated OpenAPI delay per page")
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="ticks per second for each code")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the OpenAPI request limit")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="seconds between queue depth samples")
+    parser.add_argument("--json", help="write the report, with every queue depth sample, to this file as json")
+    return parser.parse_args()
+
+
+def main():
+    # Before any server module imports PyQt5 or pika, the load test imports the messenger
+    install()
+    # pylint: disable=import-outside-toplevel
+    from sapi_kiwoom.sim.load import LoadConfig, run_load
+
+    args = parse_args()
+    config = SimulationConfig(response_delay=args.response_delay, max_pages=args.pages, tick_rate=args.tick_rate)
+    server = SimulatedServer(config, rate_limit=args.rate_limit).start()
+    report = run_load(LoadConfig(
+        clients=args.clients,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        mix=args.mix,
+        hold=args.hold,
+        sample_interval=args.sample_interval,
+    ))
+    server.stop()
+
+    samples = report.pop("queue_depth_samples")
+    print(format_report("sapi-kiwoom load test", report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({**report, "queue_depth_samples": samples}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
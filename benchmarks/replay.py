@@ -0,0 +1,50 @@
+"""Replay of a captured workload (--capture) against simulated OpenAPI and broker.
+
+    python -m benchmarks.replay workload.log --speed 2 --json current.json --baseline previous.json
+"""
+import argparse
+import json
+
+from sapi_kiwoom.sim import SimulationConfig, install
+from sapi_kiwoom.sim.server import SimulatedServer
+from sapi_kiwoom.sim.stats import format_report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a captured sapi-kiwoom workload")
+    parser.add_argument("workload", help="capture log written by the server with --capture")
+    parser.add_argument("--speed", type=float, default=1.0, help="times the captured pace, 0 for as fast as possible")
+    parser.add_argument("--drain", type=float, default=30.0, help="seconds to wait for replies after the last request")
+    parser.add_argument("--pages", type=int, default=1, help="continuation pages per transaction")
+    parser.add_argument("--response-delay", type=float, default=0.0, help="simulated OpenAPI delay per page")
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="ticks per second for each code")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the OpenAPI request limit")
+    parser.add_argument("--json", help="write the report to this file as json, a baseline of the next build")
+    parser.add_argument("--baseline", help="report of another build (--json) to compare throughput and latency with")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Before any server module imports PyQt5 or pika, the replay imports the messenger
+    install()
+    # pylint: disable=import-outside-toplevel
+    from sapi_kiwoom.sim.replay import ReplayConfig, run_replay, compare_reports
+
+    config = SimulationConfig(response_delay=args.response_delay, max_pages=args.pages, tick_rate=args.tick_rate)
+    server = SimulatedServer(config, rate_limit=args.rate_limit).start()
+    report = run_replay(args.workload, ReplayConfig(speed=args.speed, drain=args.drain))
+    server.stop()
+
+    print(format_report("sapi-kiwoom replay", report))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        print(format_report(f"compared with {args.baseline}", compare_reports(baseline, report)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
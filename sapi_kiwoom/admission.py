@@ -0,0 +1,161 @@
+"""Cost estimation of transaction requests in pages, and page budgets per client."""
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Lock
+from time import monotonic
+
+from . import delay
+
+
+BUDGET_WINDOW = 3600  # seconds
+DEFAULT_RESPONSE_SECONDS = 0.3
+RESPONSE_SMOOTHING = 0.2
+
+
+def is_estimate_requested(parameters):
+    return bool(parameters.get("estimate")) if isinstance(parameters, dict) else False
+
+
+def parse_budgets(budgets):
+    """Parse `client=pages,client=pages` into {client: pages,}."""
+    parsed = {}
+    for each in filter(None, budgets.split(",")):
+        client, _, pages = each.rpartition("=")
+        if not client or not pages.isdigit():
+            raise ValueError(f"Client budget '{each}' should be formatted as client=pages")
+        parsed[client] = int(pages)
+    return parsed
+
+
+@dataclass
+class Estimate:
+    pages: int
+    backlog_pages: int
+    seconds: float
+    completion_time: datetime
+
+    def to_dict(self):
+        return {
+            "estimated_pages": self.pages,
+            "backlog_pages": self.backlog_pages,
+            "estimated_seconds": round(self.seconds, 1),
+            "estimated_completion_time": f"{self.completion_time:%Y-%m-%d %H:%M:%S}",
+        }
+
+
+class AdmissionRejected(Exception):
+
+    def __init__(self, message, pages, budget, used, retry_after=None):
+        # pylint: disable=too-many-arguments
+        super().__init__(message)
+        self.pages = pages
+        self.budget = budget
+        self.used = used
+        self.retry_after = retry_after
+
+    def to_dict(self):
+        return {
+            "reason": str(self),
+            "estimated_pages": self.pages,
+            "budget_pages": self.budget,
+            "used_pages": self.used,
+            "retry_after_seconds": None if self.retry_after is None else round(self.retry_after, 1),
+        }
+
+
+class AdmissionController:
+
+    def __init__(self, budget=None, budgets=None, window=BUDGET_WINDOW):
+        self.budget = budget  # pages per window of a client without its own budget, None for unlimited
+        self.budgets = budgets or {}  # {client: pages per window,}
+        self.window = window
+        self.response_seconds = DEFAULT_RESPONSE_SECONDS
+        self.pending = {}  # {task_id: [estimated pages, dispatched pages, last dispatched time],}
+        self.charges = {}  # {client: deque([[charged time, task_id, pages],]),}
+        self.task_charges = {}  # {task_id: charge,}
+        # Requests are admitted from the consumer thread and paged from the Qt event loop
+        self.lock = Lock()
+
+    def get_budget(self, client):
+        return self.budgets.get(client, self.budget)
+
+    def get_backlog_pages(self):
+        return sum(max(estimated - dispatched, 0) for estimated, dispatched, _ in self.pending.values())
+
+    def estimate(self, pages, request_timestamps):
+        with self.lock:
+            backlog_pages = self.get_backlog_pages()
+            spacing = delay.INTERVAL + self.response_seconds
+        seconds = delay.get_dispatch_seconds(request_timestamps, backlog_pages + pages, spacing) + spacing
+        return Estimate(pages, backlog_pages, seconds, datetime.now() + timedelta(seconds=seconds))
+
+    def get_used_pages(self, client, now):
+        charges = self.charges.get(client)
+        if not charges:
+            return 0
+        while charges and charges[0][0] <= now - self.window:
+            self.task_charges.pop(charges.popleft()[1], None)
+        return sum(each[2] for each in charges)
+
+    def admit(self, client, task_id, pages):
+        """Charge the pages of a request to its client or raise `AdmissionRejected`."""
+        now = monotonic()
+        with self.lock:
+            budget = self.get_budget(client)
+            used = self.get_used_pages(client, now)
+            if budget is not None and used + pages > budget:
+                retry_after = None
+                if pages <= budget:
+                    # Pages are given back as the oldest charges leave the window
+                    released = 0
+                    for charged_time, _, charged_pages in self.charges[client]:
+                        released += charged_pages
+                        if used - released + pages <= budget:
+                            retry_after = charged_time + self.window - now
+                            break
+                raise AdmissionRejected(
+                    f"Request needs about {pages} pages but {client} has {max(budget - used, 0)} "
+                    f"of {budget} pages left in {self.window} seconds",
+                    pages,
+                    budget,
+                    used,
+                    retry_after,
+                )
+            charge = [now, task_id, pages]
+            self.charges.setdefault(client, deque()).append(charge)
+            self.task_charges[task_id] = charge
+            self.pending[task_id] = [pages, 0, None]
+
+    def add_backlog(self, task_id, pages):
+        # Pages of download jobs and prefetches, not charged to any client
+        with self.lock:
+            self.pending[task_id] = [pages, 0, None]
+
+    def get_estimated_pages(self, task_id):
+        with self.lock:
+            pending = self.pending.get(task_id)
+            return pending[0] if pending is not None else None
+
+    def dispatched(self, task_id):
+        with self.lock:
+            pending = self.pending.get(task_id)
+            if pending is not None:
+                pending[1] += 1
+                pending[2] = monotonic()
+
+    def received(self, task_id):
+        with self.lock:
+            pending = self.pending.get(task_id)
+            if pending is None or pending[2] is None:
+                return
+            response_seconds = monotonic() - pending[2]
+            self.response_seconds += RESPONSE_SMOOTHING * (response_seconds - self.response_seconds)
+
+    def settle(self, task_id):
+        """Finish a request, charging the pages it actually used."""
+        with self.lock:
+            pending = self.pending.pop(task_id, None)
+            charge = self.task_charges.pop(task_id, None)
+            if pending is not None and charge is not None:
+                charge[2] = pending[1]
@@ -0,0 +1,168 @@
+"""Degraded modes of real time subscribers whose reply queue backs up."""
+from dataclasses import dataclass
+
+
+# Subscriber Mode
+NORMAL = "normal"
+LATEST = "latest"
+SAMPLED = "sampled"
+
+DEGRADED_MODES = (LATEST, SAMPLED)
+
+# Reply Queue Overflow Policy
+DROP_HEAD = "drop-head"
+REJECT_PUBLISH = "reject-publish"
+
+OVERFLOW_POLICIES = (DROP_HEAD, REJECT_PUBLISH)
+
+BACKPRESSURE_CHECK_INTERVAL = 500  # ms
+LOW_WATERMARK_RATIO = 4  # low watermark is a quarter of the high watermark
+
+# Messages with the same values of these keys replace each other in latest mode
+CONFLATION_KEYS = ("stock_code", "real_data_type", "bar_type", "size")
+
+
+@dataclass
+class BackpressureParameter:
+    name: str
+    description: str
+    default: object
+
+
+BACKPRESSURE_PARAMETERS = [
+    BackpressureParameter("max_length", "응답큐의 최대 메시지 수, 초과하면 overflow 정책을 따릅니다", None),
+    BackpressureParameter("message_ttl", "응답큐 메시지의 유효시간(ms)", None),
+    BackpressureParameter("overflow", "drop-head:오래된 메시지 삭제, reject-publish:새 메시지 거부", None),
+    BackpressureParameter("degrade", "latest:종목별 최신값만 전송, sampled:일부만 전송", None),
+    BackpressureParameter("high_watermark", "저하모드로 전환할 응답큐 메시지 수", 1000),
+    BackpressureParameter("sample_interval", "sampled 모드에서 전송할 메시지 간격", 10),
+]
+
+
+def get_positive_integer(parameters, name):
+    try:
+        value = int(parameters[name])
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Backpressure parameter '{name}' should be a positive integer") from error
+    if value <= 0:
+        raise ValueError(f"Backpressure parameter '{name}' should be a positive integer")
+    return value
+
+
+def get_backpressure_parameters(parameters):
+    backpressure_parameters = {each.name: parameters.get(each.name, each.default) for each in BACKPRESSURE_PARAMETERS}
+    for name in ("max_length", "message_ttl", "high_watermark", "sample_interval"):
+        if backpressure_parameters[name] is not None:
+            backpressure_parameters[name] = get_positive_integer(backpressure_parameters, name)
+    if backpressure_parameters["overflow"] not in (None, *OVERFLOW_POLICIES):
+        raise ValueError(f"Backpressure parameter 'overflow' should be one of {OVERFLOW_POLICIES}")
+    if backpressure_parameters["degrade"] not in (None, *DEGRADED_MODES):
+        raise ValueError(f"Backpressure parameter 'degrade' should be one of {DEGRADED_MODES}")
+    if "high_watermark" not in parameters and backpressure_parameters["max_length"] is not None:
+        # A full queue never grows, so it has to degrade before that
+        backpressure_parameters["high_watermark"] = max(1, backpressure_parameters["max_length"] // 2)
+    return backpressure_parameters
+
+
+def get_conflation_key(message):
+    if not isinstance(message, dict):
+        return None
+    return tuple(message.get(each) for each in CONFLATION_KEYS)
+
+
+class SubscriberState:
+
+    __slots__ = (
+        "task_id", "reply_queue", "degraded_mode", "high_watermark", "low_watermark", "sample_interval",
+        "mode", "depth", "skipped", "sampled", "pending",
+    )
+
+    def __init__(self, task_id, reply_queue, degraded_mode, high_watermark, sample_interval):
+        # pylint: disable=too-many-arguments
+        self.task_id = task_id
+        self.reply_queue = reply_queue
+        self.degraded_mode = degraded_mode
+        self.high_watermark = high_watermark
+        self.low_watermark = high_watermark // LOW_WATERMARK_RATIO
+        self.sample_interval = sample_interval
+        self.mode = NORMAL
+        self.depth = 0
+        self.skipped = 0  # messages not sent when received while degraded
+        self.sampled = 0
+        self.pending = {}  # {conflation key: latest message,}
+
+    def admit(self, message):
+        """Return whether the message should be sent now."""
+        if self.mode == NORMAL:
+            return True
+        if self.mode == SAMPLED:
+            self.sampled += 1
+            if self.sampled >= self.sample_interval:
+                self.sampled = 0
+                return True
+        else:
+            self.pending[get_conflation_key(message)] = message
+        self.skipped += 1
+        return False
+
+    def update(self, depth):
+        """Switch the mode by the depth of the reply queue and return the messages to flush."""
+        self.depth = depth
+        if self.mode == NORMAL and depth >= self.high_watermark:
+            self.mode = self.degraded_mode
+            print(
+                f"Subscriber {self.task_id} is slow ({depth} messages in '{self.reply_queue}'), "
+                f"switched to {self.mode} mode"
+            )
+        elif self.mode != NORMAL and depth <= self.low_watermark:
+            print(f"Subscriber {self.task_id} caught up, switched to normal mode after skipping {self.skipped}")
+            self.mode = NORMAL
+            self.skipped = 0
+            self.sampled = 0
+        if not self.pending:
+            return []
+        pending = list(self.pending.values())
+        self.pending = {}
+        return pending
+
+
+class BackpressureMonitor:
+
+    def __init__(self):
+        self.subscribers = {}  # {task_id: SubscriberState,}
+
+    def add(self, task_id, reply_queue, backpressure_parameters):
+        state = SubscriberState(
+            task_id,
+            reply_queue,
+            backpressure_parameters["degrade"],
+            backpressure_parameters["high_watermark"],
+            backpressure_parameters["sample_interval"],
+        )
+        # Replaced instead of mutated as it is iterated from the Qt event loop
+        self.subscribers = {**self.subscribers, task_id: state}
+
+    def remove(self, task_id):
+        if task_id in self.subscribers:
+            self.subscribers = {key: value for key, value in self.subscribers.items() if key != task_id}
+
+    def get_mode(self, task_id):
+        state = self.subscribers.get(task_id)
+        return state.mode if state is not None else None
+
+    def admit(self, task_id, message):
+        state = self.subscribers.get(task_id)
+        return state is None or state.admit(message)
+
+    def check(self, get_depth):
+        """Update every subscriber with `get_depth(reply_queue)` and return [(task_id, message),] to flush."""
+        depths = {}
+        flushed = []
+        for state in self.subscribers.values():
+            if state.reply_queue not in depths:
+                depths[state.reply_queue] = get_depth(state.reply_queue)
+            depth = depths[state.reply_queue]
+            if depth is None:
+                continue
+            flushed.extend((state.task_id, message) for message in state.update(depth))
+        return flushed
@@ -0,0 +1,134 @@
+"""Cache of the 1 minute candles of past days, resampled to the `tick` of later requests.
+
+Only the days newer than the cached ones are requested from OpenAPI, which pages back from the latest candle.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+
+from .kiwoom.bar import SESSION_OPENING_MINUTE
+from .kiwoom.cost import DATE_FORMAT
+
+
+MINUTE_CANDLE_TICKS = (1, 3, 5, 10, 15, 30, 45, 60)
+SESSION_CLOSING_MINUTE = 15 * 60 + 30
+MAX_CACHED_ROWS = 2_000_000
+
+
+def get_minute_of_day(timestamp):
+    # timestamp: YYYYMMDDHHMMSS
+    return int(timestamp[8:10]) * 60 + int(timestamp[10:12])
+
+
+def get_bar_timestamp(timestamp, tick):
+    buckets = -(-(get_minute_of_day(timestamp) - SESSION_OPENING_MINUTE) // tick)
+    minute = min(SESSION_OPENING_MINUTE + max(buckets, 0) * tick, SESSION_CLOSING_MINUTE)
+    return f"{timestamp[:8]}{minute // 60:02d}{minute % 60:02d}00"
+
+
+def to_price(value):
+    return abs(int(value)) if value else 0
+
+
+def resample_minute_candles(candles, tick):
+    """Candles of `tick` minutes from 1 minute `candles`, both newest first as OPT10080 responds."""
+    if tick == 1:
+        return list(candles)
+    bars = []
+    bar = {"timestamp": None}
+    # From the oldest minute so the opening and closing are the first and the last
+    for candle in reversed(candles):
+        timestamp = get_bar_timestamp(candle["timestamp"], tick)
+        if bar["timestamp"] != timestamp:
+            bar = {**candle, "timestamp": timestamp, "volume": 0}
+            bars.append(bar)
+        elif to_price(candle["high"]) > to_price(bar["high"]):
+            bar["high"] = candle["high"]
+        if to_price(candle["low"]) < to_price(bar["low"]):
+            bar["low"] = candle["low"]
+        bar["closing"] = candle["closing"]
+        bar["volume"] += to_price(candle["volume"])
+    for each in bars:
+        each["volume"] = str(each["volume"])
+    bars.reverse()
+    return bars
+
+
+def get_days(start, end):
+    """Weekdays from `start` to `end` (YYYYMMDD) inclusive."""
+    day = datetime.strptime(start, DATE_FORMAT)
+    last = datetime.strptime(end, DATE_FORMAT)
+    days = []
+    while day <= last:
+        if day.weekday() < 5:
+            days.append(f"{day:{DATE_FORMAT}}")
+        day += timedelta(days=1)
+    return days
+
+
+class MinuteCandleCache:
+
+    def __init__(self, max_rows=MAX_CACHED_ROWS):
+        self.max_rows = max_rows
+        self.candles = OrderedDict()  # {(stock_code, is_adjusted): {day: 1 minute candles,},}, least recent first
+        self.rows = 0
+        # Candles are added from the Qt event loop and read from the consumer thread
+        self.lock = Lock()
+
+    def add(self, stock_code, is_adjusted, candles, today=None):
+        """Keep the days of `candles` (every page of a tick 1 request) known to be complete."""
+        if not candles or self.max_rows <= 0:
+            return
+        today = today or f"{datetime.now():{DATE_FORMAT}}"
+        days = {}
+        for candle in candles:
+            days.setdefault(candle["timestamp"][:8], []).append(candle)
+        # The oldest day may start before the first page, today is not over yet
+        oldest, newest = min(days), max(days)
+        complete = {
+            day: days.get(day, [])  # weekdays without candles in between are holidays
+            for day in get_days(oldest, min(newest, today))
+            if oldest < day < today
+        }
+        if not complete:
+            return
+        key = (stock_code, str(is_adjusted))
+        with self.lock:
+            cached = self.candles.pop(key, {})
+            self.rows -= sum(len(each) for each in cached.values())
+            cached = {**cached, **complete}
+            self.candles[key] = cached
+            self.rows += sum(len(each) for each in cached.values())
+            while self.rows > self.max_rows and self.candles:
+                _, evicted = self.candles.popitem(last=False)
+                self.rows -= sum(len(each) for each in evicted.values())
+
+    def get(self, stock_code, is_adjusted, start, end, tick, today=None):
+        """Candles of `tick` minutes of the `start`..`end` days newest first, None unless all are cached."""
+        cached = self.get_oldest(stock_code, is_adjusted, start, end, tick, today)
+        if cached is None or cached[0] is not None:
+            return None
+        return cached[1]
+
+    def get_oldest(self, stock_code, is_adjusted, start, end, tick, today=None):
+        """(first day to request from OpenAPI or None, candles of the cached days before it), None if none is."""
+        # pylint: disable=too-many-arguments
+        if tick not in MINUTE_CANDLE_TICKS:
+            return None
+        today = today or f"{datetime.now():{DATE_FORMAT}}"
+        key = (stock_code, str(is_adjusted))
+        with self.lock:
+            cached = self.candles.get(key)
+            if cached is None:
+                return None
+            days = get_days(start[:8], min(end[:8], today))
+            count = 0
+            while count < len(days) and days[count] in cached:
+                count += 1
+            if count == 0:
+                return None
+            self.candles.move_to_end(key)
+            candles = [candle for day in reversed(days[:count]) for candle in cached[day]]
+        # Today is never cached, it is not over yet
+        missing = days[count] if count < len(days) else today if end[:8] >= today else None
+        return missing, resample_minute_candles(candles, tick)
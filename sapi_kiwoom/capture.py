@@ -0,0 +1,120 @@
+"""Capture of the requests received on the `tasks` queue, replayed by `sapi_kiwoom.sim.replay`."""
+import json
+import os
+import struct
+from dataclasses import dataclass
+from time import time_ns
+
+
+MAGIC = b"SKWL"
+VERSION = 1
+FILE_HEADER = MAGIC + bytes([VERSION])
+
+# arrival_ns, properties length, body length, then the properties json and the body
+RECORD_HEADER = struct.Struct("<qII")
+
+CAPTURED_PROPERTIES = (
+    "content_type",
+    "content_encoding",
+    "headers",
+    "correlation_id",
+    "reply_to",
+    "expiration",
+    "message_id",
+    "app_id",
+)
+
+
+class WorkloadLogError(Exception):
+    pass
+
+
+@dataclass
+class CapturedRequest:
+    arrival_ns: int
+    properties: dict
+    body: bytes
+
+
+def get_captured_properties(properties):
+    if properties is None:
+        return {}
+    captured = {}
+    for name in CAPTURED_PROPERTIES:
+        value = getattr(properties, name, None)
+        if value is not None:
+            captured[name] = value
+    return captured
+
+
+class WorkloadCapture:
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not is_new:
+            truncate_incomplete_record(path)
+        self.file = open(path, "ab")  # pylint: disable=consider-using-with
+        if is_new:
+            self.file.write(FILE_HEADER)
+        self.unflushed = 0
+
+    def record(self, properties, body, arrival_ns=None):
+        arrival_ns = time_ns() if arrival_ns is None else arrival_ns
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        encoded_properties = json.dumps(
+            get_captured_properties(properties), ensure_ascii=False, default=str
+        ).encode("utf-8")
+        self.file.write(RECORD_HEADER.pack(arrival_ns, len(encoded_properties), len(body)))
+        self.file.write(encoded_properties)
+        self.file.write(body)
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+        self.unflushed = 0
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+        self.file = None
+
+
+def read_records(file, path):
+    """Yield (CapturedRequest, offset after it) of an open capture log."""
+    if file.read(len(FILE_HEADER)) != FILE_HEADER:
+        raise WorkloadLogError(f"'{path}' is not a workload capture log")
+    while True:
+        header = file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            # A truncated tail is what an interrupted append leaves behind
+            return
+        arrival_ns, properties_length, body_length = RECORD_HEADER.unpack(header)
+        properties = file.read(properties_length)
+        body = file.read(body_length)
+        if len(properties) < properties_length or len(body) < body_length:
+            return
+        yield CapturedRequest(arrival_ns, json.loads(properties.decode("utf-8")), body), file.tell()
+
+
+def truncate_incomplete_record(path):
+    with open(path, "r+b") as file:
+        end = len(FILE_HEADER)
+        for _, end in read_records(file, path):
+            pass
+        if end < os.path.getsize(path):
+            print(f"Incomplete record at the end of '{path}' is truncated")
+            file.truncate(end)
+
+
+def read_workload(path):
+    """Yield the `CapturedRequest`s of a capture log in arrival order."""
+    with open(path, "rb") as file:
+        for captured, _ in read_records(file, path):
+            yield captured
@@ -0,0 +1,344 @@
+"""Asynchronous client of sapi-kiwoom on pika's asyncio adapter, many requests in flight on one connection."""
+import asyncio
+import itertools
+import uuid
+from datetime import datetime
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from .mq import serialize, deserialize, decode_body
+from .compression import ACCEPT_ENCODING_HEADER, get_accept_encoding
+from .messenger import (
+    DEFAULT_REQUEST_QUEUE_NAME,
+    TASK_SUCCEED,
+    TASK_ACCEPTED,
+    TASK_REJECTED,
+    TASK_PARTIAL,
+)
+from .kiwoom.method import (
+    SUBSCRIBE_REALTIME,
+    UNSUBSCRIBE_REALTIME,
+    SUBSCRIBE_BAR,
+    UNSUBSCRIBE_BAR,
+    SUBSCRIBE_ORDERBOOK,
+    UNSUBSCRIBE_ORDERBOOK,
+    SUBSCRIBE_SCREEN,
+    UNSUBSCRIBE_SCREEN,
+)
+
+
+DEFAULT_MAX_IN_FLIGHT = 100
+
+UNSUBSCRIBE_METHODS = {
+    SUBSCRIBE_REALTIME: UNSUBSCRIBE_REALTIME,
+    SUBSCRIBE_BAR: UNSUBSCRIBE_BAR,
+    SUBSCRIBE_ORDERBOOK: UNSUBSCRIBE_ORDERBOOK,
+    SUBSCRIBE_SCREEN: UNSUBSCRIBE_SCREEN,
+}
+
+
+class KiwoomClientError(Exception):
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class TaskFailedError(KiwoomClientError):
+    pass
+
+
+class TaskRejectedError(KiwoomClientError):
+    pass
+
+
+def get_response_error(response):
+    if response["status"] == TASK_REJECTED:
+        return TaskRejectedError(f"Task {response['task_id']} is rejected: {response['result']}", response)
+    return TaskFailedError(f"Task {response['task_id']} failed: {response['result']}", response)
+
+
+async def wait_callback(start):
+    """Run `start(callback)` of a callback based pika call and return what the callback gets."""
+    future = asyncio.get_running_loop().create_future()
+
+    def callback(result):
+        if not future.done():
+            future.set_result(result)
+
+    start(callback)
+    return await future
+
+
+class Subscription:
+    """Real time messages of one subscription, unsubscribed when closed."""
+
+    def __init__(self, client, method, stock_code, parameters):
+        self.client = client
+        self.method = method
+        self.stock_code = stock_code
+        self.parameters = parameters
+        self.task_id = client.generate_task_id()
+        self.messages = asyncio.Queue()
+        self.subscribed = None
+        self.unsubscribed = None
+
+    def on_response(self, response):
+        if response["status"] != TASK_SUCCEED:
+            error = get_response_error(response)
+            for future in (self.subscribed, self.unsubscribed):
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            self.messages.put_nowait(error)
+        elif not self.subscribed.done():
+            self.subscribed.set_result(response["result"])
+        elif self.unsubscribed is not None and isinstance(response["result"], str):
+            # Real time messages still on the way are dicts, the confirmation is a message
+            self.unsubscribed.set_result(response["result"])
+            self.messages.put_nowait(None)
+        else:
+            self.messages.put_nowait(response["result"])
+
+    def on_close(self, error):
+        for future in (self.subscribed, self.unsubscribed):
+            if future is not None and not future.done():
+                future.set_exception(error)
+        self.messages.put_nowait(error)
+
+    async def open(self):
+        await self.client.connect()
+        self.subscribed = asyncio.get_running_loop().create_future()
+        self.client.handlers[self.task_id] = self
+        try:
+            self.client.publish(self.task_id, self.method, {**self.parameters, "stock_code": self.stock_code})
+            await self.subscribed
+        except BaseException:
+            # Nothing is subscribed, nothing is left to close
+            self.client.handlers.pop(self.task_id, None)
+            raise
+        return self
+
+    async def close(self):
+        if self.unsubscribed is not None or self.task_id not in self.client.handlers:
+            return
+        self.unsubscribed = asyncio.get_running_loop().create_future()
+        self.client.publish(self.task_id, UNSUBSCRIBE_METHODS[self.method], {"stock_code": self.stock_code})
+        try:
+            await self.unsubscribed
+        finally:
+            self.client.handlers.pop(self.task_id, None)
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.messages.get()
+        if message is None:
+            raise StopAsyncIteration
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+class RequestHandler:
+
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.accepted = None  # estimate of a request sent with "estimate": true
+
+    def on_response(self, response):
+        if response["status"] == TASK_ACCEPTED:
+            self.accepted = response["result"]
+        elif response["status"] == TASK_SUCCEED:
+            if not self.future.done():
+                self.future.set_result(response["result"])
+        elif not self.future.done():
+            self.future.set_exception(get_response_error(response))
+
+    def on_close(self, error):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class StreamHandler:
+
+    def __init__(self):
+        self.pages = asyncio.Queue()
+
+    def on_response(self, response):
+        if response["status"] == TASK_PARTIAL:
+            self.pages.put_nowait(response["result"])
+        elif response["status"] == TASK_SUCCEED:
+            self.pages.put_nowait(response["result"])
+            self.pages.put_nowait(None)
+        elif response["status"] != TASK_ACCEPTED:
+            self.pages.put_nowait(get_response_error(response))
+
+    def on_close(self, error):
+        self.pages.put_nowait(error)
+
+
+class KiwoomClient:
+
+    def __init__(
+            self,
+            broker_url,
+            request_queue=DEFAULT_REQUEST_QUEUE_NAME,
+            app_id=None,
+            accept_encoding=None,
+            max_in_flight=DEFAULT_MAX_IN_FLIGHT
+        ):
+        # pylint: disable=too-many-arguments
+        self.broker_url = broker_url
+        self.request_queue = request_queue
+        self.app_id = app_id  # identifies the client for the server's page budgets
+        # Codecs this client decodes, every installed one by default
+        self.accept_encoding = accept_encoding if accept_encoding is not None else get_accept_encoding()
+        self.max_in_flight = max_in_flight
+        self.in_flight = None
+        self.connecting = None
+        self.connection = None
+        self.channel = None
+        self.reply_queue = None
+        self.handlers = {}  # {task_id: handler of its replies,}
+        self.prefix = uuid.uuid4().hex[:12]
+        self.task_ids = itertools.count()
+
+    @property
+    def is_connected(self):
+        return self.reply_queue is not None and self.connection is not None and self.connection.is_open
+
+    async def connect(self):
+        """Open the shared connection once, however many requests wait for it."""
+        if self.is_connected:
+            return self
+        if self.connecting is None:
+            self.connecting = asyncio.ensure_future(self.open_connection())
+        try:
+            await asyncio.shield(self.connecting)
+        finally:
+            if self.connecting is not None and self.connecting.done():
+                self.connecting = None
+        return self
+
+    async def open_connection(self):
+        self.reply_queue = None
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+
+        def on_open_error(connection, error):
+            # pylint: disable=unused-argument
+            if not opened.done():
+                opened.set_exception(KiwoomClientError(f"Could not connect to {self.broker_url}: {error}"))
+
+        self.connection = AsyncioConnection(
+            pika.URLParameters(self.broker_url),
+            on_open_callback=lambda connection: opened.done() or opened.set_result(connection),
+            on_open_error_callback=on_open_error,
+            on_close_callback=self.on_connection_closed,
+            custom_ioloop=loop,
+        )
+        await opened
+        self.channel = await wait_callback(lambda callback: self.connection.channel(on_open_callback=callback))
+        frame = await wait_callback(
+            lambda callback: self.channel.queue_declare("", exclusive=True, auto_delete=True, callback=callback)
+        )
+        self.channel.basic_consume(frame.method.queue, self.on_reply, auto_ack=True)
+        if self.in_flight is None:
+            self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.reply_queue = frame.method.queue
+
+    async def close(self):
+        if self.connection is not None and self.connection.is_open:
+            self.connection.close()
+        self.connection = None
+        self.channel = None
+        self.reply_queue = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def generate_task_id(self):
+        return f"{self.prefix}-{next(self.task_ids)}"
+
+    def publish(self, task_id, method, parameters):
+        if not self.is_connected:
+            raise KiwoomClientError("Client is not connected")
+        body = serialize({
+            "task_id": task_id,
+            "method": method,
+            "parameters": parameters,
+            "request_time": datetime.now(),
+        })
+        properties = pika.BasicProperties(
+            reply_to=self.reply_queue,
+            correlation_id=task_id,
+            app_id=self.app_id,
+            headers={ACCEPT_ENCODING_HEADER: self.accept_encoding} if self.accept_encoding else None,
+        )
+        self.channel.basic_publish(exchange="", routing_key=self.request_queue, body=body, properties=properties)
+
+    def on_reply(self, channel, method, properties, body):
+        # pylint: disable=unused-argument
+        response = deserialize(decode_body(body, properties))
+        handler = self.handlers.get(properties.correlation_id or response["task_id"])
+        if handler is not None:
+            handler.on_response(response)
+
+    def on_connection_closed(self, connection, reason):
+        # pylint: disable=unused-argument
+        self.reply_queue = None
+        error = KiwoomClientError(f"Connection to {self.broker_url} is closed: {reason}")
+        handlers, self.handlers = self.handlers, {}
+        for handler in handlers.values():
+            handler.on_close(error)
+
+    async def request(self, method, parameters=None, task_id=None, timeout=None):
+        """Send a request and return its result, raising `TaskFailedError` or `TaskRejectedError`."""
+        # Without a reply in `timeout` seconds, asyncio.TimeoutError is raised
+        await self.connect()
+        task_id = task_id or self.generate_task_id()
+        async with self.in_flight:
+            handler = RequestHandler()
+            self.handlers[task_id] = handler
+            try:
+                self.publish(task_id, method, parameters or {})
+                return await asyncio.wait_for(handler.future, timeout)
+            finally:
+                self.handlers.pop(task_id, None)
+
+    async def stream(self, method, parameters=None, task_id=None):
+        """Yield the rows of a transaction request page by page as the server receives them."""
+        await self.connect()
+        task_id = task_id or self.generate_task_id()
+        async with self.in_flight:
+            handler = StreamHandler()
+            self.handlers[task_id] = handler
+            try:
+                self.publish(task_id, method, {**(parameters or {}), "stream": True})
+                while True:
+                    page = await handler.pages.get()
+                    if page is None:
+                        return
+                    if isinstance(page, Exception):
+                        raise page
+                    yield page
+            finally:
+                self.handlers.pop(task_id, None)
+
+    def subscribe(self, stock_code, method=SUBSCRIBE_REALTIME, parameters=None):
+        """Subscription to real time data of a stock, to use with `async with`."""
+        # A subscribe-screen takes `stock_codes` and `when` in `parameters`, `stock_code` is left None
+        if method not in UNSUBSCRIBE_METHODS:
+            raise ValueError(f"Method '{method}' should be one of {list(UNSUBSCRIBE_METHODS)}")
+        return Subscription(self, method, stock_code, parameters or {})
@@ -0,0 +1,148 @@
+"""Compression of message bodies negotiated by the `accept-encoding` header."""
+import zlib
+from abc import ABC, abstractmethod
+
+
+# Codec Name
+ZLIB = "zlib"
+ZSTD = "zstd"
+LZ4 = "lz4"
+
+CODECS = (ZSTD, LZ4, ZLIB)
+ACCEPT_ENCODING_HEADER = "accept-encoding"
+DEFAULT_THRESHOLD = 64 * 1024  # bytes
+
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+
+class CompressionError(Exception):
+    pass
+
+
+class Codec(ABC):
+
+    name = None
+
+    @abstractmethod
+    def compress(self, body):
+        pass
+
+    @abstractmethod
+    def decompress(self, body):
+        pass
+
+
+class ZlibCodec(Codec):
+
+    name = ZLIB
+
+    def compress(self, body):
+        return zlib.compress(body, ZLIB_LEVEL)
+
+    def decompress(self, body):
+        return zlib.decompress(body)
+
+
+class ZstdCodec(Codec):
+
+    name = ZSTD
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        import zstandard
+
+        self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, body):
+        return self.compressor.compress(body)
+
+    def decompress(self, body):
+        # Frames written by compress() carry their size, others are streamed
+        return self.decompressor.decompressobj().decompress(body)
+
+
+class Lz4Codec(Codec):
+
+    name = LZ4
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        import lz4.frame
+
+        self.frame = lz4.frame
+
+    def compress(self, body):
+        return self.frame.compress(body)
+
+    def decompress(self, body):
+        return self.frame.decompress(body)
+
+
+CODEC_CLASSES = {ZLIB: ZlibCodec, ZSTD: ZstdCodec, LZ4: Lz4Codec}
+LOADED_CODECS = {}
+
+
+def get_codec(name):
+    if name in LOADED_CODECS:
+        return LOADED_CODECS[name]
+    if name not in CODEC_CLASSES:
+        raise CompressionError(f"Codec '{name}' is not supported, use one of {CODECS}")
+    try:
+        codec = CODEC_CLASSES[name]()
+    except ImportError as error:
+        raise CompressionError(f"Codec '{name}' is not installed") from error
+    LOADED_CODECS[name] = codec
+    return codec
+
+
+def is_codec_available(name):
+    try:
+        get_codec(name)
+    except CompressionError:
+        return False
+    return True
+
+
+def get_available_codecs():
+    return [each for each in CODECS if is_codec_available(each)]
+
+
+def parse_accept_encoding(value):
+    if not value:
+        return []
+    if isinstance(value, bytes):
+        value = value.decode("ascii")
+    return [each.strip().lower() for each in value.split(",") if each.strip()]
+
+
+def negotiate_codec(headers):
+    """The first codec of the request's accept-encoding header available here, or None."""
+    for name in parse_accept_encoding((headers or {}).get(ACCEPT_ENCODING_HEADER)):
+        if is_codec_available(name):
+            return name
+    return None
+
+
+def get_accept_encoding(codecs=None):
+    """Header value for a client accepting `codecs`, by default every codec installed here."""
+    return ", ".join(codecs or get_available_codecs())
+
+
+def compress_body(body, codec_name, threshold=DEFAULT_THRESHOLD):
+    """Return (body, content_encoding), compressed when it is worth it."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if codec_name is None or threshold is None or len(body) < threshold:
+        return body, None
+    compressed = get_codec(codec_name).compress(body)
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, codec_name
+
+
+def decompress_body(body, content_encoding):
+    if not content_encoding:
+        return body
+    return get_codec(content_encoding).decompress(body)
@@ -30,3 +30,24 @@ def wait_until_request_available(request_timestamps, minimum_log_second=1):
             log_wait(seconds_to_wait, minimum_log_second)
             sleep(seconds_to_wait)
     sleep(INTERVAL)
+
+
+def get_dispatch_seconds(request_timestamps, count, spacing=None, now=None):
+    """Seconds from now until `count` more requests have been sent under the request limit."""
+    now = now or datetime.today()
+    spacing = INTERVAL if spacing is None else spacing
+    # Only the last TIMES requests constrain the next one
+    window = [(each - now).total_seconds() for each in request_timestamps[-TIMES:]]
+    dispatched = window[-1] if window else None
+    for _ in range(count):
+        due = 0.0 if dispatched is None else max(dispatched + spacing, 0.0)
+        if len(window) >= TIMES:
+            due = max(due, window[-TIMES] + WAITS)
+        window.append(due)
+        dispatched = due
+    return max(dispatched or 0.0, 0.0)
+
+
+def is_request_available(request_timestamps, now=None):
+    """Whether a request can be sent now without waiting for the request limit."""
+    return get_dispatch_seconds(request_timestamps, 1, now=now) == 0
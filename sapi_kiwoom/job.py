@@ -0,0 +1,354 @@
+"""Checkpointed download jobs of a transaction over many stock codes, one file per code."""
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+from time import monotonic
+
+from . import delay
+from .admission import DEFAULT_RESPONSE_SECONDS
+from .kiwoom.cost import estimate_pages
+from .kiwoom.schema import get_schema, get_requested_fields
+from .kiwoom.transaction import get_transaction_code
+
+
+# Job Status
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+CANCELLED = "CANCELLED"
+
+# Output Format
+CSV = "csv"
+PARQUET = "parquet"
+
+FORMATS = (CSV, PARQUET)
+
+JOB_VERSION = 1
+JOB_FILE_NAME = "job.json"
+PARTIAL_EXTENSION = ".part"
+JOB_DISPATCH_INTERVAL = 100  # ms
+
+
+class DownloadJobError(Exception):
+    pass
+
+
+class CsvWriter:
+
+    def __init__(self, path, field_names):
+        self.file = open(path, "w", encoding="utf-8", newline="")  # pylint: disable=consider-using-with
+        self.writer = csv.DictWriter(self.file, fieldnames=field_names, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+
+    def __init__(self, path, field_names):
+        try:
+            # pylint: disable=import-outside-toplevel
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise DownloadJobError("Parquet output needs pyarrow (pip install pyarrow)") from error
+        self.pyarrow = pyarrow
+        self.path = path
+        self.field_names = field_names
+        self.writer = None
+        self.parquet = pyarrow.parquet
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = {name: [each.get(name) for each in rows] for name in self.field_names}
+        if self.writer is None:
+            table = self.pyarrow.table(columns)
+            self.writer = self.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            table = self.pyarrow.table(columns, schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            # A code without rows still gets a file with its columns
+            empty = self.pyarrow.array([], self.pyarrow.string())
+            table = self.pyarrow.table({name: empty for name in self.field_names})
+            self.writer = self.parquet.ParquetWriter(self.path, table.schema)
+        self.writer.close()
+
+
+WRITERS = {CSV: CsvWriter, PARQUET: ParquetWriter}
+
+
+def check_format(output_format):
+    if output_format not in FORMATS:
+        raise ValueError(f"Job format '{output_format}' should be one of {FORMATS}")
+    if output_format == PARQUET:
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError as error:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow), or use format 'csv'") from error
+
+
+class DownloadJob:
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, job_id, method, parameters, stock_codes, directory, output_format=CSV):
+        # pylint: disable=too-many-arguments
+        self.job_id = job_id
+        self.method = method
+        self.parameters = parameters  # transaction parameters shared by every code
+        self.stock_codes = stock_codes
+        self.directory = directory
+        self.format = output_format
+        self.status = RUNNING
+        self.completed = {}  # {stock_code: rows,}
+        self.failed = {}  # {stock_code: reason,}
+        self.pages = 0
+        self.rows = 0
+        self.elapsed_seconds = 0.0  # of the previous runs
+        self.started = monotonic()
+        self.created_time = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+        self.current_code = None
+        self.current_rows = 0
+        self.writer = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, JOB_FILE_NAME)
+
+    def get_output_path(self, stock_code):
+        return os.path.join(self.directory, f"{stock_code}.{self.format}")
+
+    @property
+    def is_running(self):
+        return self.status == RUNNING
+
+    @property
+    def is_cancelled(self):
+        return self.status == CANCELLED
+
+    def get_next_code(self):
+        for stock_code in self.stock_codes:
+            if stock_code not in self.completed and stock_code not in self.failed:
+                return stock_code
+        return None
+
+    def begin(self, stock_code):
+        """Start downloading `stock_code`, or finish the job if it is None."""
+        if stock_code is None:
+            self.finish(COMPLETED)
+            print(f"Download job {self.job_id} completed, {len(self.completed)} codes and {self.rows} rows")
+            return
+        self.current_code = stock_code
+        self.current_rows = 0
+        self.writer = WRITERS[self.format](self.get_output_path(stock_code) + PARTIAL_EXTENSION, self.field_names)
+
+    @property
+    def field_names(self):
+        return list(get_requested_fields(self.parameters) or get_schema(self.transaction_code).field_names)
+
+    @property
+    def transaction_code(self):
+        return get_transaction_code(self.method)
+
+    def on_page(self, rows):
+        if self.writer is None:
+            return
+        if self.is_cancelled:
+            self.discard_partial()
+            return
+        self.writer.write(rows)
+        self.pages += 1
+        self.rows += len(rows)
+        self.current_rows += len(rows)
+
+    def on_completed(self, rows):
+        self.on_page(rows)
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        partial_path = self.get_output_path(self.current_code) + PARTIAL_EXTENSION
+        os.replace(partial_path, self.get_output_path(self.current_code))
+        self.completed[self.current_code] = self.current_rows
+        self.current_code = None
+        self.save()
+
+    def on_failed(self, reason):
+        if self.current_code is None:
+            return
+        self.failed[self.current_code] = reason
+        self.discard_partial()
+        self.save()
+
+    def discard_partial(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.remove(self.get_output_path(self.current_code) + PARTIAL_EXTENSION)
+        self.current_code = None
+
+    def cancel(self):
+        # The partial file is discarded from the event loop with the next page of the code
+        if self.is_running:
+            self.finish(CANCELLED)
+
+    def finish(self, status):
+        self.elapsed_seconds = self.get_elapsed_seconds()
+        self.status = status
+        self.save()
+
+    def get_elapsed_seconds(self):
+        if not self.is_running:
+            return self.elapsed_seconds
+        return self.elapsed_seconds + monotonic() - self.started
+
+    def get_eta_seconds(self):
+        remaining = len(self.stock_codes) - len(self.completed) - len(self.failed)
+        if not self.is_running or remaining <= 0:
+            return 0.0
+        finished = len(self.completed) + len(self.failed)
+        if finished:
+            seconds_per_code = self.get_elapsed_seconds() / finished
+        else:
+            pages = estimate_pages(get_schema(self.transaction_code), self.parameters)
+            seconds_per_code = pages * (delay.INTERVAL + DEFAULT_RESPONSE_SECONDS)
+        return remaining * seconds_per_code
+
+    def get_progress(self):
+        eta_seconds = self.get_eta_seconds()
+        return {
+            "job_id": self.job_id,
+            "method": self.method,
+            "status": self.status,
+            "format": self.format,
+            "directory": self.directory,
+            "codes": len(self.stock_codes),
+            "completed_codes": len(self.completed),
+            "failed_codes": len(self.failed),
+            "current_code": self.current_code,
+            "pages": self.pages,
+            "rows": self.rows,
+            "elapsed_seconds": round(self.get_elapsed_seconds(), 1),
+            "eta_seconds": round(eta_seconds, 1),
+            "estimated_completion_time": f"{datetime.now() + timedelta(seconds=eta_seconds):%Y-%m-%d %H:%M:%S}",
+            "failed": self.failed,
+        }
+
+    def to_dict(self):
+        return {
+            "version": JOB_VERSION,
+            "job_id": self.job_id,
+            "method": self.method,
+            "parameters": self.parameters,
+            "stock_codes": self.stock_codes,
+            "format": self.format,
+            "status": self.status,
+            "completed": self.completed,
+            "failed": self.failed,
+            "pages": self.pages,
+            "rows": self.rows,
+            "elapsed_seconds": self.get_elapsed_seconds(),
+            "created_time": self.created_time,
+        }
+
+    def save(self):
+        # Replaced atomically so a crash while saving keeps the previous checkpoint
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False)
+        os.replace(temporary_path, self.path)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, JOB_FILE_NAME), encoding="utf-8") as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("version") != JOB_VERSION:
+            raise DownloadJobError(f"Download job version {checkpoint.get('version')} is not supported")
+        job = cls(
+            checkpoint["job_id"],
+            checkpoint["method"],
+            checkpoint["parameters"],
+            checkpoint["stock_codes"],
+            directory,
+            checkpoint["format"],
+        )
+        job.status = checkpoint["status"]
+        job.completed = checkpoint["completed"]
+        job.failed = checkpoint["failed"]
+        job.pages = checkpoint["pages"]
+        job.rows = checkpoint["rows"]
+        job.elapsed_seconds = checkpoint["elapsed_seconds"]
+        job.created_time = checkpoint["created_time"]
+        return job
+
+
+class DownloadJobManager:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.jobs = {}  # {job_id: DownloadJob,}
+
+    def get_job_directory(self, job_id):
+        if not job_id or os.path.basename(job_id) != job_id or job_id.startswith("."):
+            raise ValueError(f"Job id '{job_id}' should be usable as a directory name")
+        return os.path.join(self.directory, job_id)
+
+    def start(self, job_id, method, parameters, stock_codes, output_format=CSV):
+        # pylint: disable=too-many-arguments
+        check_format(output_format)
+        job_directory = self.get_job_directory(job_id)
+        if job_id in self.jobs or os.path.exists(os.path.join(job_directory, JOB_FILE_NAME)):
+            raise ValueError(f"Download job '{job_id}' already exists")
+        if not stock_codes:
+            raise ValueError("Download job should have at least one stock code")
+        os.makedirs(job_directory, exist_ok=True)
+        job = DownloadJob(job_id, method, parameters, stock_codes, job_directory, output_format)
+        job.save()
+        # Replaced instead of mutated as it is iterated from the Qt event loop
+        self.jobs = {**self.jobs, job_id: job}
+        return job
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Download job '{job_id}' does not exist")
+        return job
+
+    def resume(self):
+        """Load the jobs of the job directory, running ones continue from their checkpoint."""
+        if not os.path.isdir(self.directory):
+            return
+        jobs = dict(self.jobs)
+        for name in sorted(os.listdir(self.directory)):
+            if name in jobs or not os.path.exists(os.path.join(self.directory, name, JOB_FILE_NAME)):
+                continue
+            try:
+                job = DownloadJob.load(os.path.join(self.directory, name))
+            except (OSError, ValueError, KeyError, DownloadJobError) as error:
+                print(f"Download job '{name}' is ignored: {error}")
+                continue
+            jobs[job.job_id] = job
+            if job.is_running:
+                print(f"Download job {job.job_id} resumes with {len(job.completed)} of {len(job.stock_codes)} codes")
+        self.jobs = jobs
+
+    def get_dispatches(self, limit=None):
+        """[(job, stock_code),] to request now, one code at a time for each running job."""
+        dispatches = []
+        for job in self.jobs.values():
+            if limit is not None and len(dispatches) >= limit:
+                break
+            if not job.is_running or job.current_code is not None:
+                continue
+            stock_code = job.get_next_code()
+            job.begin(stock_code)
+            if stock_code is not None:
+                dispatches.append((job, stock_code))
+        return dispatches
@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from .rt import STOCK_TRADE, get_real_time_field_index, to_number
+
+
+@dataclass
+class KiwoomBarParameter:
+    name: str
+    description: str
+    default: str
+
+
+# Bar Type
+MINUTE_BAR = "minute"
+TICK_BAR = "tick"
+VOLUME_BAR = "volume"
+
+BAR_TYPES = (MINUTE_BAR, TICK_BAR, VOLUME_BAR)
+
+BAR_PARAMETERS = [
+    KiwoomBarParameter("bar_type", "minute:분봉, tick:틱봉, volume:거래량봉", MINUTE_BAR),
+    KiwoomBarParameter("size", "봉 크기, 분봉은 분(1, 3, 5, ...), 틱봉은 체결횟수, 거래량봉은 거래량", 1),
+]
+
+# Minute bars are aligned to the market opening (09:00) like OPT10080 candles
+SESSION_OPENING_MINUTE = 9 * 60
+
+TIMESTAMP_INDEX = get_real_time_field_index(STOCK_TRADE, "timestamp")
+CLOSING_INDEX = get_real_time_field_index(STOCK_TRADE, "closing")
+VOLUME_INDEX = get_real_time_field_index(STOCK_TRADE, "volume")
+
+
+def get_bar_parameters(parameters):
+    bar_parameters = {each.name: parameters.get(each.name, each.default) for each in BAR_PARAMETERS}
+    if bar_parameters["bar_type"] not in BAR_TYPES:
+        raise ValueError(f"Bar parameter 'bar_type' should be one of {BAR_TYPES}")
+    try:
+        bar_parameters["size"] = int(bar_parameters["size"])
+    except (TypeError, ValueError) as error:
+        raise ValueError("Bar parameter 'size' should be a positive integer") from error
+    if bar_parameters["size"] <= 0:
+        raise ValueError("Bar parameter 'size' should be a positive integer")
+    return bar_parameters
+
+
+def get_minute_of_day(timestamp):
+    # timestamp: HHMMSS
+    return int(timestamp[:2]) * 60 + int(timestamp[2:4])
+
+
+def format_minute_of_day(minute):
+    return f"{minute // 60:02d}{minute % 60:02d}00"
+
+
+def get_feed_timestamp(real_time_data):
+    """HHMMSS of a 주식체결 or 주식호가잔량 tick, both lead with it."""
+    timestamp = real_time_data.split("\t", 1)[0]
+    return timestamp if len(timestamp) == 6 and timestamp.isdigit() else None
+
+
+def get_expiry_timestamp(feed_timestamp, grace):
+    # Ticks of other stocks may still be on the way for the grace period
+    return f"{datetime.strptime(feed_timestamp, '%H%M%S') - grace:%H%M%S}"
+
+
+class BarAggregator:
+    """Builds OHLCV bars from trade ticks, updating the open bar in place."""
+
+    __slots__ = (
+        "stock_code", "bar_type", "size",
+        "bucket", "opening", "high", "low", "closing", "volume", "ticks", "timestamp",
+    )
+
+    def __init__(self, stock_code, bar_type, size):
+        self.stock_code = stock_code
+        self.bar_type = bar_type
+        self.size = size
+        self.bucket = None
+        self.opening = self.high = self.low = self.closing = 0
+        self.volume = 0
+        self.ticks = 0
+        self.timestamp = None
+
+    def get_bucket(self, timestamp):
+        return (get_minute_of_day(timestamp) - SESSION_OPENING_MINUTE) // self.size
+
+    def update(self, timestamp, price, volume):
+        """Add a trade and return the bar it closed, if any."""
+        closed = None
+        if self.bar_type == MINUTE_BAR:
+            bucket = self.get_bucket(timestamp)
+            if self.ticks and bucket != self.bucket:
+                closed = self.close()
+            self.bucket = bucket
+
+        if self.ticks == 0:
+            self.opening = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.closing = price
+        self.volume += volume
+        self.ticks += 1
+        self.timestamp = timestamp
+
+        if (
+                (self.bar_type == TICK_BAR and self.ticks >= self.size)
+                or (self.bar_type == VOLUME_BAR and self.volume >= self.size)
+            ):
+            closed = self.close()
+        return closed
+
+    def update_real_time_data(self, fields):
+        return self.update(
+            fields[TIMESTAMP_INDEX],
+            to_number(fields[CLOSING_INDEX]),
+            to_number(fields[VOLUME_INDEX]),
+        )
+
+    def expire(self, timestamp):
+        """Close an open minute bar whose period ended before `timestamp` (HHMMSS)."""
+        if self.bar_type != MINUTE_BAR or not self.ticks or self.get_bucket(timestamp) == self.bucket:
+            return None
+        return self.close()
+
+    def close(self):
+        if self.bar_type == MINUTE_BAR:
+            # Stamped with the closing minute like OPT10080 candles
+            timestamp = format_minute_of_day(SESSION_OPENING_MINUTE + (self.bucket + 1) * self.size)
+        else:
+            timestamp = self.timestamp
+        bar = {
+            "stock_code": self.stock_code,
+            "bar_type": self.bar_type,
+            "size": self.size,
+            "timestamp": timestamp,
+            "opening": self.opening,
+            "high": self.high,
+            "low": self.low,
+            "closing": self.closing,
+            "volume": self.volume,
+            "ticks": self.ticks,
+        }
+        self.volume = 0
+        self.ticks = 0
+        return bar
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from math import ceil
+
+
+DATE_FORMAT = "%Y%m%d"
+
+
+def count_weekdays(start, end):
+    """Weekdays from `start` to `end` (YYYYMMDD) inclusive, holidays are not known."""
+    start = datetime.strptime(start[:8], DATE_FORMAT)
+    end = datetime.strptime(end[:8], DATE_FORMAT)
+    if end < start:
+        return 0
+    days = (end - start).days + 1
+    weeks, remainder = divmod(days, 7)
+    weekdays = weeks * 5
+    for offset in range(remainder):
+        if (start + timedelta(days=weeks * 7 + offset)).weekday() < 5:
+            weekdays += 1
+    return weekdays
+
+
+def get_range_end(schema, parameters, today):
+    # Paging starts from `to` when the TR takes it, otherwise from the latest data
+    sends_to = any(each.changed_name == "to" for each in schema.parameters)
+    return parameters["to"] if sends_to else today
+
+
+def estimate_rows(schema, parameters, today=None):
+    cost = schema.cost
+    today = today or f"{datetime.now():{DATE_FORMAT}}"
+    end = min(get_range_end(schema, parameters, today)[:8], today)
+    rows_per_day = cost.rows_per_day
+    if cost.interval is not None:
+        rows_per_day = ceil(rows_per_day / max(int(parameters.get(cost.interval) or 1), 1))
+    return count_weekdays(parameters["from"], end) * rows_per_day
+
+
+def estimate_pages(schema, parameters, today=None):
+    """Continuation pages a transaction request needs, at least one."""
+    if schema.multi_code is not None:
+        try:
+            return max(len(schema.get_stock_code_chunks(parameters)), 1)
+        except ValueError:
+            return 1
+    if schema.cost is None or "from" not in parameters:
+        return 1
+    try:
+        rows = estimate_rows(schema, parameters, today)
+    except (KeyError, TypeError, ValueError):
+        return 1
+    return max(ceil(rows / schema.cost.rows_per_page), 1)
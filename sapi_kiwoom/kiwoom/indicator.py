@@ -0,0 +1,220 @@
+"""Indicators computed on the candles of a transaction response. Needs numpy."""
+import re
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class KiwoomIndicator:
+    name: str
+    window: int
+
+    @property
+    def column(self):
+        return self.name if self.window is None else f"{self.name}_{self.window}"
+
+
+# Indicator: default window, None when it has none
+INDICATOR_WINDOWS = {
+    "sma": 20,
+    "ema": 20,
+    "vwap": None,
+    "atr": 14,
+    "volatility": 20,
+    "return": None,
+}
+OPTIONAL_WINDOWS = ("vwap",)  # take a window without a default one
+
+CANDLE_FIELDS = ("closing", "high", "low", "volume")
+MAX_INDICATORS = 20
+INDICATOR_PATTERN = re.compile(r"^\s*([a-z]+)\s*(?:\(\s*(\d+)\s*\))?\s*$")
+SMOOTHING_BLOCK_EXPONENT = 100  # decay ** -length of a block stays below e ** 100
+
+
+def get_numpy():
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ValueError("Indicators need numpy (pip install numpy)") from error
+    return numpy
+
+
+def parse_indicator(text):
+    match = INDICATOR_PATTERN.match(str(text).lower())
+    if match is None or match.group(1) not in INDICATOR_WINDOWS:
+        raise ValueError(f"Indicator '{text}' should be one of {list(INDICATOR_WINDOWS)}, ex: sma(20)")
+    name, window = match.group(1), match.group(2)
+    if window is None:
+        return KiwoomIndicator(name, INDICATOR_WINDOWS[name])
+    if INDICATOR_WINDOWS[name] is None and name not in OPTIONAL_WINDOWS:
+        raise ValueError(f"Indicator '{name}' does not take a window")
+    if int(window) <= 0:
+        raise ValueError(f"Window of indicator '{name}' should be a positive integer")
+    return KiwoomIndicator(name, int(window))
+
+
+def get_indicators(parameters):
+    """Indicators requested in `parameters`, an empty list when there is none."""
+    indicators = parameters.get("indicators") if isinstance(parameters, dict) else None
+    if not indicators:
+        return []
+    if isinstance(indicators, str):
+        # Commas inside a window are not expected, "sma(20),ema(12)"
+        indicators = indicators.split(",")
+    if not isinstance(indicators, list):
+        raise ValueError("Task parameter 'indicators' should be a list, ex: [\"sma(20)\", \"vwap\"]")
+    if len(indicators) > MAX_INDICATORS:
+        raise ValueError(f"Task parameter 'indicators' should have at most {MAX_INDICATORS} indicators")
+    return list(dict.fromkeys(parse_indicator(each) for each in indicators))
+
+
+def validate_indicator_parameters(schema, parameters):
+    if not get_indicators(parameters):
+        return
+    missing = [each for each in CANDLE_FIELDS if each not in schema.field_names]
+    if missing or schema.filter_key is None:
+        raise ValueError(f"Method '{schema.method}' has no candles to compute indicators on")
+    if parameters.get("stream"):
+        raise ValueError("Indicators need every candle, they can not be streamed")
+    get_numpy()
+
+
+def to_prices(numpy, rows, name):
+    # Prices are signed by their change against the previous closing
+    return numpy.abs(numpy.asarray([each[name] for each in rows], dtype=float))
+
+
+def get_rolling_sum(numpy, values, window):
+    sums = numpy.full(len(values), numpy.nan)
+    if len(values) >= window:
+        cumulative = numpy.concatenate(([0.0], numpy.cumsum(values)))
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def get_sma(numpy, closings, window):
+    return get_rolling_sum(numpy, closings, window) / window
+
+
+def get_smoothed(numpy, values, alpha, window):
+    # Seeded with the simple average of the first window, as charting tools do
+    smoothed = numpy.full(len(values), numpy.nan)
+    if len(values) < window:
+        return smoothed
+    current = values[:window].mean()
+    smoothed[window - 1] = current
+    decay = 1 - alpha
+    if decay <= 0:
+        smoothed[window:] = values[window:]
+        return smoothed
+    # s[i] = decay ** (i + 1) * s[-1] + alpha * sum(decay ** (i - j) * x[j]) with cumulative sums,
+    # in blocks short enough for decay ** -j not to overflow
+    block = max(1, int(SMOOTHING_BLOCK_EXPONENT / -numpy.log(decay)))
+    for start in range(window, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** numpy.arange(len(chunk))
+        smoothed[start:start + len(chunk)] = powers * (decay * current + alpha * numpy.cumsum(chunk / powers))
+        current = smoothed[start + len(chunk) - 1]
+    return smoothed
+
+
+def get_ema(numpy, closings, window):
+    return get_smoothed(numpy, closings, 2 / (window + 1), window)
+
+
+def get_atr(numpy, highs, lows, closings, window):
+    previous = numpy.concatenate(([closings[0]], closings[:-1]))
+    true_ranges = numpy.maximum.reduce([highs - lows, numpy.abs(highs - previous), numpy.abs(lows - previous)])
+    return get_smoothed(numpy, true_ranges, 1 / window, window)
+
+
+def get_vwap(numpy, highs, lows, closings, volumes, window, sessions):
+    typical = (highs + lows + closings) / 3
+    if window is not None:
+        volume_sums = get_rolling_sum(numpy, volumes, window)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            return get_rolling_sum(numpy, typical * volumes, window) / volume_sums
+    # Cumulated from the first candle of each session
+    is_start = numpy.concatenate(([True], sessions[1:] != sessions[:-1]))
+    starts = numpy.flatnonzero(is_start)
+    session_indexes = numpy.cumsum(is_start) - 1
+    traded = numpy.cumsum(typical * volumes)
+    volume_sums = numpy.cumsum(volumes)
+    traded -= numpy.concatenate(([0.0], traded))[starts][session_indexes]
+    volume_sums -= numpy.concatenate(([0.0], volume_sums))[starts][session_indexes]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return traded / volume_sums
+
+
+def get_returns(numpy, closings):
+    returns = numpy.full(len(closings), numpy.nan)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = closings[1:] / closings[:-1] - 1
+    return returns
+
+
+def get_volatility(numpy, closings, window):
+    volatility = numpy.full(len(closings), numpy.nan)
+    if len(closings) <= window:
+        return volatility
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        log_returns = numpy.diff(numpy.log(closings))
+    windows = numpy.lib.stride_tricks.sliding_window_view(log_returns, window)
+    volatility[window:] = windows.std(axis=1, ddof=1)
+    return volatility
+
+
+def compute_indicators(numpy, indicators, rows, time_key):
+    """{column: values in the order of `rows`,}"""
+    order = numpy.argsort(numpy.asarray([each[time_key] for each in rows], dtype=str), kind="stable")
+    candles = [rows[each] for each in order]
+    closings = to_prices(numpy, candles, "closing")
+    highs = to_prices(numpy, candles, "high")
+    lows = to_prices(numpy, candles, "low")
+    volumes = numpy.abs(numpy.asarray([each["volume"] for each in candles], dtype=float))
+    # Minute candles are keyed by YYYYMMDDHHMMSS and their VWAP restarts every day,
+    # day candles (YYYYMMDD) are one session
+    sessions = numpy.asarray([str(each[time_key])[:8] if len(str(each[time_key])) > 8 else "" for each in candles])
+
+    columns = {}
+    for indicator in indicators:
+        name, window = indicator.name, indicator.window
+        if name == "sma":
+            values = get_sma(numpy, closings, window)
+        elif name == "ema":
+            values = get_ema(numpy, closings, window)
+        elif name == "vwap":
+            values = get_vwap(numpy, highs, lows, closings, volumes, window, sessions)
+        elif name == "atr":
+            values = get_atr(numpy, highs, lows, closings, window)
+        elif name == "volatility":
+            values = get_volatility(numpy, closings, window)
+        else:
+            values = get_returns(numpy, closings)
+        # Back to the order of the response, newest first as received
+        ordered = numpy.empty(len(values))
+        ordered[order] = values
+        columns[indicator.column] = ordered
+    return columns
+
+
+def apply_indicators(schema, rows, parameters):
+    """`rows` with the requested indicators, or only them with "indicators_only": true."""
+    indicators = get_indicators(parameters)
+    if not indicators or not rows:
+        return rows
+    numpy = get_numpy()
+    time_key = schema.filter_key
+    columns = compute_indicators(numpy, indicators, rows, time_key)
+    values = {}
+    for column, array in columns.items():
+        rounded = array.round(6).astype(object)
+        rounded[numpy.isnan(array)] = None
+        values[column] = rounded.tolist()
+    indicators_only = bool(parameters.get("indicators_only"))
+    results = []
+    for index, row in enumerate(rows):
+        result = {time_key: row[time_key]} if indicators_only else dict(row)
+        for column, each in values.items():
+            result[column] = each[index]
+        results.append(result)
+    return results
@@ -1,6 +1,15 @@
+from .schema import get_method_transaction_codes
+
+
 # Method
 SUBSCRIBE_REALTIME = "subscribe-realtime"
 UNSUBSCRIBE_REALTIME = "unsubscribe-realtime"
+SUBSCRIBE_BAR = "subscribe-bar"
+UNSUBSCRIBE_BAR = "unsubscribe-bar"
+SUBSCRIBE_ORDERBOOK = "subscribe-orderbook"
+UNSUBSCRIBE_ORDERBOOK = "unsubscribe-orderbook"
+SUBSCRIBE_SCREEN = "subscribe-screen"
+UNSUBSCRIBE_SCREEN = "unsubscribe-screen"
 GET_STOCK_NAME = "get-stock-name"
 GET_STOCK_CODES = "get-stock-codes"
 GET_STOCK_STATES = "get-stock-states"
@@ -10,17 +19,32 @@ REQUEST_UPPER_AND_LOW = "request-upper-and-low"
 REQUEST_OFFER_PRICE_INFO = "request-offer-price-info"
 REQUEST_OFFHOUR_SINGLE_TRADE_INFO = "request-offhour-single-trade-info"
 REQUEST_SHORT_TREND = "request-short-trend"
+REQUEST_MULTI_QUOTE = "request-multi-quote"
+ADMIN_PROFILE = "admin-profile"
+GET_TASK_RESULT = "get-task-result"
+START_DOWNLOAD_JOB = "start-download-job"
+GET_DOWNLOAD_JOB = "get-download-job"
+CANCEL_DOWNLOAD_JOB = "cancel-download-job"
 
 
 # Method type
 TRANSACTION = "TRANSACTION"
 REALTIME = "REALTIME"
 LOOKUP = "LOOKUP"
+ADMIN = "ADMIN"
+RESULT = "RESULT"
+JOB = "JOB"
 
 
 METHOD_TYPE_MAP = {
     SUBSCRIBE_REALTIME: REALTIME,
     UNSUBSCRIBE_REALTIME: REALTIME,
+    SUBSCRIBE_BAR: REALTIME,
+    UNSUBSCRIBE_BAR: REALTIME,
+    SUBSCRIBE_ORDERBOOK: REALTIME,
+    UNSUBSCRIBE_ORDERBOOK: REALTIME,
+    SUBSCRIBE_SCREEN: REALTIME,
+    UNSUBSCRIBE_SCREEN: REALTIME,
     GET_STOCK_NAME: LOOKUP,
     GET_STOCK_CODES: LOOKUP,
     GET_STOCK_STATES: LOOKUP,
@@ -30,11 +54,20 @@ METHOD_TYPE_MAP = {
     REQUEST_OFFER_PRICE_INFO: TRANSACTION,
     REQUEST_OFFHOUR_SINGLE_TRADE_INFO: TRANSACTION,
     REQUEST_SHORT_TREND: TRANSACTION,
+    REQUEST_MULTI_QUOTE: TRANSACTION,
+    ADMIN_PROFILE: ADMIN,
+    GET_TASK_RESULT: RESULT,
+    START_DOWNLOAD_JOB: JOB,
+    GET_DOWNLOAD_JOB: JOB,
+    CANCEL_DOWNLOAD_JOB: JOB,
 }
 
 
 def get_method_type(method):
     if method in METHOD_TYPE_MAP:
         return METHOD_TYPE_MAP[method]
+    elif method in get_method_transaction_codes():
+        # TRs registered only as a schema file
+        return TRANSACTION
     else:
         raise KeyError(f"Method '{method}' is not exists in method map")
@@ -0,0 +1,150 @@
+"""Order book streams sending the changed levels between snapshots."""
+from dataclasses import dataclass
+from time import monotonic
+
+from .rt import STOCK_OFFER, get_real_time_field_index, to_number
+
+
+@dataclass
+class KiwoomOrderBookParameter:
+    name: str
+    description: str
+    default: float
+
+
+# Order Book Message Type
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+ORDER_BOOK_LEVELS = 10
+MAX_DELTA_LEVELS = ORDER_BOOK_LEVELS  # of both sides, more are sent as a snapshot
+ORDER_BOOK_PARAMETERS = [
+    KiwoomOrderBookParameter("snapshot_interval", "전체 호가를 다시 보낼 주기(초)", 5.0),
+]
+
+TIMESTAMP_INDEX = get_real_time_field_index(STOCK_OFFER, "timestamp")
+# [(price index, volume index),] of levels 1..10
+SELL_INDEXES = [
+    (
+        get_real_time_field_index(STOCK_OFFER, f"sell_price_{level}"),
+        get_real_time_field_index(STOCK_OFFER, f"sell_remaining_volume_{level}"),
+    )
+    for level in range(1, ORDER_BOOK_LEVELS + 1)
+]
+BUY_INDEXES = [
+    (
+        get_real_time_field_index(STOCK_OFFER, f"buy_price_{level}"),
+        get_real_time_field_index(STOCK_OFFER, f"buy_remaining_volume_{level}"),
+    )
+    for level in range(1, ORDER_BOOK_LEVELS + 1)
+]
+TOTAL_SELL_INDEX = get_real_time_field_index(STOCK_OFFER, "total_sell_remaining_volume")
+TOTAL_BUY_INDEX = get_real_time_field_index(STOCK_OFFER, "total_buy_remaining_volume")
+
+
+def get_order_book_parameters(parameters):
+    order_book_parameters = {each.name: parameters.get(each.name, each.default) for each in ORDER_BOOK_PARAMETERS}
+    try:
+        order_book_parameters["snapshot_interval"] = float(order_book_parameters["snapshot_interval"])
+    except (TypeError, ValueError) as error:
+        raise ValueError("Order book parameter 'snapshot_interval' should be a positive number") from error
+    if order_book_parameters["snapshot_interval"] <= 0:
+        raise ValueError("Order book parameter 'snapshot_interval' should be a positive number")
+    return order_book_parameters
+
+
+def get_levels(fields, indexes):
+    return [(to_number(fields[price]), to_number(fields[volume])) for price, volume in indexes]
+
+
+def get_changed_levels(previous, current):
+    return {
+        str(level): list(each)
+        for level, (before, each) in enumerate(zip(previous, current), start=1)
+        if before != each
+    }
+
+
+class OrderBook:
+    """Latest book of a stock and the delta of its last update."""
+
+    __slots__ = ("stock_code", "sequence", "timestamp", "sell", "buy", "total_sell", "total_buy", "delta")
+
+    def __init__(self, stock_code):
+        self.stock_code = stock_code
+        self.sequence = 0
+        self.timestamp = None
+        self.sell = self.buy = None
+        self.total_sell = self.total_buy = 0
+        self.delta = None
+
+    @property
+    def is_empty(self):
+        return self.sell is None
+
+    def update(self, fields):
+        """Apply a 주식호가잔량 update, returning False when nothing changed."""
+        sell, buy = get_levels(fields, SELL_INDEXES), get_levels(fields, BUY_INDEXES)
+        total_sell, total_buy = to_number(fields[TOTAL_SELL_INDEX]), to_number(fields[TOTAL_BUY_INDEX])
+        self.timestamp = fields[TIMESTAMP_INDEX]
+        if self.is_empty:
+            self.delta = None
+        else:
+            if (sell, buy, total_sell, total_buy) == (self.sell, self.buy, self.total_sell, self.total_buy):
+                return False
+            changed_sell, changed_buy = get_changed_levels(self.sell, sell), get_changed_levels(self.buy, buy)
+            if len(changed_sell) + len(changed_buy) > MAX_DELTA_LEVELS:
+                self.delta = None
+            else:
+                self.delta = {
+                    "stock_code": self.stock_code,
+                    "type": DELTA,
+                    "sequence": self.sequence + 1,
+                    "timestamp": self.timestamp,
+                    "sell": changed_sell,
+                    "buy": changed_buy,
+                }
+                if total_sell != self.total_sell:
+                    self.delta["total_sell_volume"] = total_sell
+                if total_buy != self.total_buy:
+                    self.delta["total_buy_volume"] = total_buy
+        self.sequence += 1
+        self.sell, self.buy = sell, buy
+        self.total_sell, self.total_buy = total_sell, total_buy
+        return True
+
+    def get_snapshot(self):
+        return {
+            "stock_code": self.stock_code,
+            "type": SNAPSHOT,
+            "sequence": self.sequence,
+            "timestamp": self.timestamp,
+            "sell": [list(each) for each in self.sell],
+            "buy": [list(each) for each in self.buy],
+            "total_sell_volume": self.total_sell,
+            "total_buy_volume": self.total_buy,
+        }
+
+
+class OrderBookStream:
+    """Messages of one subscriber, a snapshot first and every `snapshot_interval` seconds."""
+
+    __slots__ = ("snapshot_interval", "snapshot_time")
+
+    def __init__(self, snapshot_interval):
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_time = None  # of the last snapshot sent
+
+    def get_message(self, book, now=None):
+        now = monotonic() if now is None else now
+        if (
+                book.delta is None
+                or self.snapshot_time is None
+                or now - self.snapshot_time >= self.snapshot_interval
+            ):
+            return self.get_snapshot(book, now)
+        return book.delta
+
+    def get_snapshot(self, book, now=None):
+        self.snapshot_time = monotonic() if now is None else now
+        return book.get_snapshot()
@@ -0,0 +1,69 @@
+"""Recent ticks of a subscribed stock, numbered by sequence for catch-up."""
+from threading import Lock
+
+
+TICK_BUFFER_SIZE = 1024  # ticks per stock
+TICK_RING_RETENTION = 300  # seconds a ring keeps numbering ticks after its last listener
+RING_RELEASE_INTERVAL = 1000  # ms
+
+
+def get_catch_up_parameters(parameters):
+    """{"latest": bool, "from_sequence": int or None}, None when no catch-up is requested."""
+    latest = bool(parameters.get("latest"))
+    from_sequence = parameters.get("from_sequence")
+    if from_sequence is not None:
+        try:
+            from_sequence = int(from_sequence)
+        except (TypeError, ValueError) as error:
+            raise ValueError("Real time parameter 'from_sequence' should be a non negative integer") from error
+        if from_sequence < 0:
+            raise ValueError("Real time parameter 'from_sequence' should be a non negative integer")
+    if not latest and from_sequence is None:
+        return None
+    return {"latest": latest, "from_sequence": from_sequence}
+
+
+class TickRing:
+    """Preallocated ring of the last `capacity` ticks of a stock."""
+
+    __slots__ = ("capacity", "sequence", "real_data_types", "real_time_data", "latest", "lock")
+
+    def __init__(self, capacity=TICK_BUFFER_SIZE):
+        self.capacity = capacity
+        self.sequence = 0  # of the last tick
+        self.real_data_types = [None] * capacity
+        self.real_time_data = [None] * capacity
+        self.latest = {}  # {real_data_type: (sequence, real_data_type, real_time_data),}, kept when overwritten
+        # Ticks are added from the Qt event loop and read by subscribers from the consumer thread
+        self.lock = Lock()
+
+    @property
+    def first_sequence(self):
+        return max(1, self.sequence - self.capacity + 1)
+
+    def append(self, real_data_type, real_time_data):
+        with self.lock:
+            self.sequence += 1
+            index = self.sequence % self.capacity
+            self.real_data_types[index] = real_data_type
+            self.real_time_data[index] = real_time_data
+            self.latest[real_data_type] = (self.sequence, real_data_type, real_time_data)
+            return self.sequence
+
+    def get(self, sequence):
+        index = sequence % self.capacity
+        return sequence, self.real_data_types[index], self.real_time_data[index]
+
+    def since(self, sequence):
+        """(first sequence, last sequence, [(sequence, real_data_type, real_time_data),]) after `sequence`."""
+        with self.lock:
+            if sequence > self.sequence:
+                # Numbered by a previous server
+                sequence = 0
+            first = max(sequence + 1, self.first_sequence)
+            return first, self.sequence, [self.get(each) for each in range(first, self.sequence + 1)]
+
+    def get_latest(self):
+        """[(sequence, real_data_type, real_time_data),] of the latest tick of each type, oldest first."""
+        with self.lock:
+            return sorted(self.latest.values())
@@ -1,6 +1,15 @@
 from dataclasses import dataclass
 
-from .method import SUBSCRIBE_REALTIME, UNSUBSCRIBE_REALTIME
+from .method import (
+    SUBSCRIBE_REALTIME,
+    UNSUBSCRIBE_REALTIME,
+    SUBSCRIBE_BAR,
+    UNSUBSCRIBE_BAR,
+    SUBSCRIBE_ORDERBOOK,
+    UNSUBSCRIBE_ORDERBOOK,
+    SUBSCRIBE_SCREEN,
+    UNSUBSCRIBE_SCREEN,
+)
 
 
 @dataclass
@@ -9,6 +18,68 @@ class KiwoomRealTimeParameter:
     description: str
 
 
+@dataclass
+class KiwoomRealTimeField:
+    fid: int
+    changed_name: str
+
+
+# Real Time Data Type
+STOCK_TRADE = "주식체결"
+STOCK_OFFER = "주식호가잔량"
+
+
+def get_stock_offer_fields():
+    fields = [KiwoomRealTimeField(21, "timestamp")]
+    for line_number in range(1, 11):
+        fields.extend([
+            KiwoomRealTimeField(40 + line_number, f"sell_price_{line_number}"),
+            KiwoomRealTimeField(60 + line_number, f"sell_remaining_volume_{line_number}"),
+            KiwoomRealTimeField(80 + line_number, f"sell_contrast_remaining_{line_number}"),
+            KiwoomRealTimeField(50 + line_number, f"buy_price_{line_number}"),
+            KiwoomRealTimeField(70 + line_number, f"buy_remaining_volume_{line_number}"),
+            KiwoomRealTimeField(90 + line_number, f"buy_contrast_remaining_{line_number}"),
+        ])
+    fields.extend([
+        KiwoomRealTimeField(121, "total_sell_remaining_volume"),
+        KiwoomRealTimeField(122, "total_sell_remaining_volume_contrast_previous"),
+        KiwoomRealTimeField(125, "total_buy_remaining_volume"),
+        KiwoomRealTimeField(126, "total_buy_remaining_volume_contrast_previous"),
+    ])
+    return fields
+
+
+# Fields in the order OnReceiveRealData delivers them, tab separated.
+# Only the leading fields that are used are listed.
+KIWOOM_REAL_TIME_FIELD_MAP = {
+    STOCK_TRADE: [
+        KiwoomRealTimeField(20, "timestamp"),
+        KiwoomRealTimeField(10, "closing"),
+        KiwoomRealTimeField(11, "contrast_previous"),
+        KiwoomRealTimeField(12, "fluctuation_rate"),
+        KiwoomRealTimeField(27, "sell_top_priority_price"),
+        KiwoomRealTimeField(28, "buy_top_priority_price"),
+        KiwoomRealTimeField(15, "volume"),
+        KiwoomRealTimeField(13, "cumulative_volume"),
+        KiwoomRealTimeField(14, "cumulative_amount"),
+        KiwoomRealTimeField(16, "opening"),
+        KiwoomRealTimeField(17, "high"),
+        KiwoomRealTimeField(18, "low"),
+    ],
+    STOCK_OFFER: get_stock_offer_fields(),
+}
+
+
+def get_real_time_field_index(real_data_type, changed_name):
+    fields = KIWOOM_REAL_TIME_FIELD_MAP[real_data_type]
+    return [each.changed_name for each in fields].index(changed_name)
+
+
+def to_number(value):
+    # Prices come signed by their direction against the previous close
+    return abs(int(value)) if value else 0
+
+
 REAL_TIME_PARAMETERS = [
     KiwoomRealTimeParameter("stock_code", "6자리 종목코드"),
 ]
@@ -30,9 +101,36 @@ def is_unsubscribe(method):
     return method == UNSUBSCRIBE_REALTIME
 
 
-def generate_real_time_response(stock_code, real_data_type, real_time_data):
-    return {
+def is_subscribe_bar(method):
+    return method == SUBSCRIBE_BAR
+
+
+def is_unsubscribe_bar(method):
+    return method == UNSUBSCRIBE_BAR
+
+
+def is_subscribe_order_book(method):
+    return method == SUBSCRIBE_ORDERBOOK
+
+
+def is_unsubscribe_order_book(method):
+    return method == UNSUBSCRIBE_ORDERBOOK
+
+
+def is_subscribe_screen(method):
+    return method == SUBSCRIBE_SCREEN
+
+
+def is_unsubscribe_screen(method):
+    return method == UNSUBSCRIBE_SCREEN
+
+
+def generate_real_time_response(stock_code, real_data_type, real_time_data, sequence=None):
+    response = {
         "stock_code": stock_code,
         "real_data_type": real_data_type,
         "real_time_data": real_time_data,
     }
+    if sequence is not None:
+        response["sequence"] = sequence
+    return response
@@ -0,0 +1,188 @@
+"""Registry of transaction (TR) schemas, compiled from `schemas/<transaction code>.json` on first use."""
+import json
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import itemgetter
+
+
+SCHEMA_DIRECTORY = os.path.join(os.path.dirname(__file__), "schemas")
+SCHEMA_EXTENSION = ".json"
+
+
+@dataclass
+class KiwoomTransactionParameter:
+    origin_name: str
+    changed_name: str
+    description: str
+
+
+@dataclass
+class KiwoomTransactionResultField:
+    origin_name: str
+    changed_name: str
+
+
+@dataclass
+class KiwoomTransactionCost:
+    rows_per_page: int
+    rows_per_day: int
+    interval: str = None
+
+
+@dataclass
+class KiwoomMultiCodeRequest:
+    parameter: str
+    chunk_size: int
+    type_flag: int = 0  # 0:주식, 3:선물옵션
+
+
+@dataclass
+class KiwoomTaskParameter:
+    name: str
+    description: str
+
+
+class KiwoomSchemaError(Exception):
+    pass
+
+
+def decode_rows(rows, field_names):
+    return [dict(zip(field_names, row)) for row in rows]
+
+
+def get_single_column(index):
+    # itemgetter of one index returns the value itself, not a tuple
+    def get_column(row):
+        return (row[index],)
+    return get_column
+
+
+@dataclass(frozen=True)
+class KiwoomFieldProjection:
+    field_names: tuple  # decoded columns, the requested ones then the ones the server needs
+    hidden: frozenset  # decoded for paging, filtering or indicators but not requested
+    get_columns: object = field(compare=False, repr=False)
+
+    def decode(self, rows):
+        get_columns = self.get_columns
+        return decode_rows(map(get_columns, rows), self.field_names)
+
+    def hide(self, rows):
+        if not self.hidden:
+            return rows
+        hidden = self.hidden
+        return [{key: value for key, value in each.items() if key not in hidden} for each in rows]
+
+
+@dataclass(frozen=True)
+class KiwoomTransactionSchema:
+    # pylint: disable=too-many-instance-attributes
+    transaction_code: str
+    method: str
+    parameters: tuple
+    multi_code: KiwoomMultiCodeRequest
+    task_parameters: tuple
+    complete_key: str
+    filter_key: str
+    cost: KiwoomTransactionCost
+    fields: tuple
+    field_names: tuple
+
+    def decode(self, rows):
+        return decode_rows(rows, self.field_names)
+
+    def project(self, names, required=()):
+        """Projection decoding only the `names` columns, and the `required` ones kept hidden."""
+        unknown = [each for each in names if each not in self.field_names]
+        if unknown:
+            raise ValueError(f"Fields {unknown} are not in the response of '{self.method}'")
+        keys = (self.complete_key, self.filter_key, *required)
+        hidden = tuple(each for each in dict.fromkeys(keys) if each is not None and each not in names)
+        field_names = (*dict.fromkeys(names), *hidden)
+        indexes = tuple(self.field_names.index(each) for each in field_names)
+        get_columns = itemgetter(*indexes) if len(indexes) > 1 else get_single_column(indexes[0])
+        return KiwoomFieldProjection(field_names, frozenset(hidden), get_columns)
+
+    def get_transaction_parameters(self, parameters):
+        transaction_parameters = {}
+        for each in self.parameters:
+            if each.changed_name not in parameters:
+                raise ValueError(f"{each.origin_name}({each.changed_name}) is essential")
+            transaction_parameters.update({each.origin_name: parameters[each.changed_name]})
+        return transaction_parameters
+
+    def get_stock_code_chunks(self, parameters):
+        multi_code = self.multi_code
+        if multi_code is None:
+            return []
+        stock_codes = parameters.get(multi_code.parameter)
+        if isinstance(stock_codes, str):
+            stock_codes = stock_codes.replace(",", ";").split(";")
+        if not isinstance(stock_codes, list):
+            raise ValueError(f"'{multi_code.parameter}' should be a list of stock codes")
+        stock_codes = list(dict.fromkeys(filter(None, (str(each).strip() for each in stock_codes))))
+        if not stock_codes:
+            raise ValueError(f"'{multi_code.parameter}' should have at least one stock code")
+        size = multi_code.chunk_size
+        return [stock_codes[start:start + size] for start in range(0, len(stock_codes), size)]
+
+
+def get_schema_path(transaction_code):
+    return os.path.join(SCHEMA_DIRECTORY, f"{transaction_code}{SCHEMA_EXTENSION}")
+
+
+def compile_schema(definition):
+    fields = tuple(KiwoomTransactionResultField(**each) for each in definition["fields"])
+    task = definition.get("task", {})
+    return KiwoomTransactionSchema(
+        transaction_code=definition["transaction_code"],
+        method=definition["method"],
+        parameters=tuple(KiwoomTransactionParameter(**each) for each in definition["parameters"]),
+        multi_code=KiwoomMultiCodeRequest(**definition["multi_code"]) if "multi_code" in definition else None,
+        task_parameters=tuple(KiwoomTaskParameter(**each) for each in task.get("parameters", [])),
+        complete_key=task.get("complete_key"),
+        filter_key=task.get("filter_key"),
+        cost=KiwoomTransactionCost(**definition["cost"]) if "cost" in definition else None,
+        fields=fields,
+        field_names=tuple(each.changed_name for each in fields),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_schema(transaction_code):
+    path = get_schema_path(transaction_code)
+    if not os.path.exists(path):
+        raise KiwoomSchemaError(f"Transaction schema '{transaction_code}' is not registered")
+    with open(path, encoding="utf-8") as file:
+        return compile_schema(json.load(file))
+
+
+def get_requested_fields(parameters):
+    """Field names of the `fields` request parameter, None to return every field."""
+    names = parameters.get("fields") if isinstance(parameters, dict) else None
+    if not names:
+        return None
+    if isinstance(names, str):
+        names = names.split(",")
+    if not isinstance(names, list):
+        raise ValueError("Task parameter 'fields' should be a list of field names")
+    return tuple(dict.fromkeys(str(each).strip() for each in names))
+
+
+@lru_cache(maxsize=256)
+def get_field_projection(transaction_code, names, required=()):
+    return get_schema(transaction_code).project(names, required)
+
+
+@lru_cache(maxsize=None)
+def get_transaction_codes():
+    return tuple(sorted(
+        name[:-len(SCHEMA_EXTENSION)] for name in os.listdir(SCHEMA_DIRECTORY)
+        if name.endswith(SCHEMA_EXTENSION)
+    ))
+
+
+@lru_cache(maxsize=None)
+def get_method_transaction_codes():
+    return {get_schema(each).method: each for each in get_transaction_codes()}
@@ -0,0 +1,298 @@
+"""Screens of many stocks publishing the events matching a predicate. Needs numpy."""
+import math
+import operator
+from threading import Lock
+
+from .rt import STOCK_TRADE, STOCK_OFFER, get_real_time_field_index, to_number
+
+
+SCREEN_INTERVAL = 100  # ms
+VOLUME_AVERAGE_INTERVALS = 600  # of the moving average of the volume per interval
+INITIAL_CAPACITY = 256
+MAX_SCREEN_CODES = 2000
+MAX_CONDITIONS = 32
+
+# State kept as received, and the previous interval of the ones a crossing is checked on
+STATE_FIELDS = ("price", "change_rate", "ask", "bid", "volume", "average_volume", "cumulative_volume")
+CROSSING_FIELDS = ("price", "change_rate", "ask", "bid", "spread", "spread_rate")
+SCREEN_FIELDS = (
+    "price", "change_rate", "ask", "bid", "spread", "spread_rate", "volume", "volume_ratio", "cumulative_volume",
+)
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+CROSSES_ABOVE = "crosses_above"
+CROSSES_BELOW = "crosses_below"
+OPERATORS = (*COMPARISONS, CROSSES_ABOVE, CROSSES_BELOW)
+
+TRADE_INDEXES = {
+    "timestamp": get_real_time_field_index(STOCK_TRADE, "timestamp"),
+    "price": get_real_time_field_index(STOCK_TRADE, "closing"),
+    "change_rate": get_real_time_field_index(STOCK_TRADE, "fluctuation_rate"),
+    "ask": get_real_time_field_index(STOCK_TRADE, "sell_top_priority_price"),
+    "bid": get_real_time_field_index(STOCK_TRADE, "buy_top_priority_price"),
+    "volume": get_real_time_field_index(STOCK_TRADE, "volume"),
+    "cumulative_volume": get_real_time_field_index(STOCK_TRADE, "cumulative_volume"),
+}
+OFFER_INDEXES = {
+    "timestamp": get_real_time_field_index(STOCK_OFFER, "timestamp"),
+    "ask": get_real_time_field_index(STOCK_OFFER, "sell_price_1"),
+    "bid": get_real_time_field_index(STOCK_OFFER, "buy_price_1"),
+}
+
+
+def get_numpy():
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ValueError("Screens need numpy (pip install numpy)") from error
+    return numpy
+
+
+def to_rate(value):
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def get_screen_codes(parameters):
+    stock_codes = parameters.get("stock_codes")
+    if isinstance(stock_codes, str):
+        stock_codes = stock_codes.replace(",", ";").split(";")
+    stock_codes = list(dict.fromkeys(filter(None, (str(each).strip() for each in stock_codes or []))))
+    if not stock_codes:
+        raise ValueError("Screen parameter 'stock_codes'(감시할 종목코드 리스트) is missed")
+    if len(stock_codes) > MAX_SCREEN_CODES:
+        raise ValueError(f"Screen parameter 'stock_codes' should have at most {MAX_SCREEN_CODES} codes")
+    return stock_codes
+
+
+def compile_predicate(numpy, expression, counter=None):
+    """Function of (columns, previous columns) to the boolean array of the matching stocks."""
+    counter = counter if counter is not None else [0]
+    counter[0] += 1
+    if counter[0] > MAX_CONDITIONS:
+        raise ValueError(f"Screen predicate should have at most {MAX_CONDITIONS} conditions")
+    if not isinstance(expression, dict):
+        raise ValueError("Screen predicate should be an object, ex: {\"field\": \"volume_ratio\", \"op\": \">=\", \"value\": 5}")
+    if "all" in expression or "any" in expression:
+        combine = numpy.logical_and if "all" in expression else numpy.logical_or
+        conditions = expression.get("all", expression.get("any"))
+        if not isinstance(conditions, list) or not conditions:
+            raise ValueError("Screen predicate 'all' and 'any' should be a list of conditions")
+        predicates = [compile_predicate(numpy, each, counter) for each in conditions]
+        return lambda columns, previous: combine.reduce([each(columns, previous) for each in predicates])
+    if "not" in expression:
+        predicate = compile_predicate(numpy, expression["not"], counter)
+        return lambda columns, previous: numpy.logical_not(predicate(columns, previous))
+    return compile_condition(expression)
+
+
+def compile_condition(condition):
+    name, op, value = condition.get("field"), condition.get("op"), condition.get("value")
+    if name not in SCREEN_FIELDS:
+        raise ValueError(f"Screen field '{name}' should be one of {list(SCREEN_FIELDS)}")
+    if op not in OPERATORS:
+        raise ValueError(f"Screen operator '{op}' should be one of {list(OPERATORS)}")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Screen value of '{name}' should be a number")
+    if op in COMPARISONS:
+        compare = COMPARISONS[op]
+        return lambda columns, previous: compare(columns[name], value)
+    if name not in CROSSING_FIELDS:
+        raise ValueError(f"Screen operator '{op}' takes one of {list(CROSSING_FIELDS)}")
+    if op == CROSSES_ABOVE:
+        return lambda columns, previous: (previous[name] < value) & (columns[name] >= value) & previous["has_trade"]
+    return lambda columns, previous: (previous[name] > value) & (columns[name] <= value) & previous["has_trade"]
+
+
+def get_columns(numpy, state, has_trade):
+    price, ask, bid = state["price"], state["ask"], state["bid"]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        spread = ask - bid
+        average_volume = state.get("average_volume")
+        columns = {
+            **state,
+            "spread": spread,
+            "spread_rate": numpy.where(price > 0, spread / price * 100, numpy.nan),
+            "has_trade": has_trade,
+        }
+        if average_volume is not None:
+            columns["volume_ratio"] = numpy.where(average_volume > 0, state["volume"] / average_volume, numpy.nan)
+    return columns
+
+
+class Screen:
+
+    __slots__ = ("task_id", "stock_codes", "rows", "predicate", "matched")
+
+    def __init__(self, task_id, stock_codes, rows, predicate):
+        self.task_id = task_id
+        self.stock_codes = stock_codes
+        self.rows = rows
+        self.predicate = predicate
+        self.matched = None  # of the rows at the previous interval
+
+
+class Screener:
+    """State of the screened stocks in arrays, a row per stock."""
+
+    def __init__(self, numpy, capacity=INITIAL_CAPACITY):
+        self.numpy = numpy
+        self.initial_capacity = capacity
+        self.screened = {}  # {stock_code: screens,}
+        self.screens = {}  # {task_id: Screen,}
+        self.alpha = 2 / (VOLUME_AVERAGE_INTERVALS + 1)
+        # Updated from the Qt event loop and subscribed from the consumer thread
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        numpy, capacity = self.numpy, self.initial_capacity
+        self.rows = {}  # {stock_code: row,}
+        self.stock_codes = []  # of the rows, None for a free one
+        self.timestamps = []  # of the last update of the rows
+        self.free_rows = []  # of the stocks no longer screened, reused by the next ones
+        self.state = {name: numpy.zeros(capacity) for name in STATE_FIELDS}
+        self.previous = {name: numpy.zeros(capacity) for name in STATE_FIELDS}
+        self.has_trade = numpy.zeros(capacity, dtype=bool)
+        self.had_trade = numpy.zeros(capacity, dtype=bool)  # before the interval
+        self.updated = numpy.zeros(capacity, dtype=bool)  # during the interval
+
+    @property
+    def capacity(self):
+        return len(self.has_trade)
+
+    def is_screened(self, stock_code):
+        return self.screened.get(stock_code, 0) > 0
+
+    def grow(self, capacity):
+        numpy = self.numpy
+        extra = capacity - self.capacity
+        for arrays in (self.state, self.previous):
+            for name, array in arrays.items():
+                arrays[name] = numpy.concatenate((array, numpy.zeros(extra)))
+        self.has_trade = numpy.concatenate((self.has_trade, numpy.zeros(extra, dtype=bool)))
+        self.had_trade = numpy.concatenate((self.had_trade, numpy.zeros(extra, dtype=bool)))
+        self.updated = numpy.concatenate((self.updated, numpy.zeros(extra, dtype=bool)))
+
+    def get_predicate(self, task_id, expression):
+        """Predicate of a new screen of `task_id`, raising ValueError before anything is changed."""
+        if task_id in self.screens:
+            raise ValueError(f"{task_id} already screens {len(self.screens[task_id].stock_codes)} codes")
+        return compile_predicate(self.numpy, expression)
+
+    def add_screen(self, task_id, stock_codes, predicate):
+        with self.lock:
+            for stock_code in stock_codes:
+                if stock_code not in self.rows:
+                    self.add_row(stock_code)
+                self.screened[stock_code] = self.screened.get(stock_code, 0) + 1
+            if len(self.stock_codes) > self.capacity:
+                self.grow(max(len(self.stock_codes), self.capacity * 2))
+            rows = self.numpy.asarray([self.rows[each] for each in stock_codes], dtype=int)
+            self.screens = {**self.screens, task_id: Screen(task_id, stock_codes, rows, predicate)}
+
+    def remove_screen(self, task_id):
+        """Stock codes of the removed screen."""
+        if task_id not in self.screens:
+            raise ValueError(f"{task_id} did not subscribe a screen yet")
+        with self.lock:
+            screen = self.screens[task_id]
+            self.screens = {key: value for key, value in self.screens.items() if key != task_id}
+            for stock_code in screen.stock_codes:
+                self.screened[stock_code] -= 1
+                if self.screened[stock_code] == 0:
+                    self.screened.pop(stock_code)
+                    self.free_row(stock_code)
+            if not self.screens:
+                self.reset()
+        return screen.stock_codes
+
+    def add_row(self, stock_code):
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.stock_codes[row] = stock_code
+        else:
+            row = len(self.stock_codes)
+            self.stock_codes.append(stock_code)
+            self.timestamps.append(None)
+        self.rows[stock_code] = row
+
+    def free_row(self, stock_code):
+        row = self.rows.pop(stock_code)
+        for arrays in (self.state, self.previous):
+            for array in arrays.values():
+                array[row] = 0
+        for array in (self.has_trade, self.had_trade, self.updated):
+            array[row] = False
+        self.stock_codes[row] = None
+        self.timestamps[row] = None
+        self.free_rows.append(row)
+
+    def update(self, stock_code, real_data_type, fields):
+        if real_data_type == STOCK_TRADE:
+            indexes = TRADE_INDEXES
+        elif real_data_type == STOCK_OFFER:
+            indexes = OFFER_INDEXES
+        else:
+            return
+        with self.lock:
+            row = self.rows.get(stock_code)
+            if row is None:
+                return
+            state = self.state
+            state["ask"][row] = to_number(fields[indexes["ask"]])
+            state["bid"][row] = to_number(fields[indexes["bid"]])
+            if real_data_type == STOCK_TRADE:
+                state["price"][row] = to_number(fields[indexes["price"]])
+                state["change_rate"][row] = to_rate(fields[indexes["change_rate"]])
+                state["volume"][row] += to_number(fields[indexes["volume"]])
+                state["cumulative_volume"][row] = to_number(fields[indexes["cumulative_volume"]])
+                self.has_trade[row] = True
+            self.timestamps[row] = fields[indexes["timestamp"]]
+            self.updated[row] = True
+
+    def evaluate(self):
+        """[(task_id, event),] of the stocks starting to match a screen in the interval."""
+        numpy = self.numpy
+        with self.lock:
+            state, previous = self.state, self.previous
+            columns = get_columns(numpy, state, self.has_trade)
+            previous_columns = get_columns(numpy, {name: previous[name] for name in STATE_FIELDS}, self.had_trade)
+            events = []
+            for screen in self.screens.values():
+                rows = screen.rows
+                matched = screen.predicate(columns, previous_columns)[rows] & self.has_trade[rows]
+                fired = matched & self.updated[rows]
+                if screen.matched is not None:
+                    fired &= ~screen.matched
+                screen.matched = matched
+                for index in numpy.flatnonzero(fired):
+                    events.append((screen.task_id, self.get_event(columns, rows[index])))
+
+            # Seeded with the first traded interval, then averaged over every interval
+            volume, average_volume = state["volume"], state["average_volume"]
+            is_seeded = average_volume > 0
+            average_volume[:] = numpy.where(
+                is_seeded, average_volume + self.alpha * (volume - average_volume), volume
+            )
+            for name in STATE_FIELDS:
+                previous[name][:] = state[name]
+            volume[:] = 0
+            self.had_trade[:] = self.has_trade
+            self.updated[:] = False
+        return events
+
+    def get_event(self, columns, row):
+        event = {"stock_code": self.stock_codes[row], "timestamp": self.timestamps[row]}
+        for name in SCREEN_FIELDS:
+            value = float(columns[name][row])
+            event[name] = None if math.isnan(value) else round(value, 4)
+        return event
@@ -1,42 +1,17 @@
-from dataclasses import dataclass
-
-from .method import (
-    REQUEST_DAY_CANDLE,
-    REQUEST_MINUTE_CANDLE,
-    REQUEST_UPPER_AND_LOW,
-    REQUEST_OFFER_PRICE_INFO,
-    REQUEST_OFFHOUR_SINGLE_TRADE_INFO,
-    REQUEST_SHORT_TREND,
+from .schema import (  # pylint: disable=unused-import
+    KiwoomTaskParameter,
+    get_schema,
+    get_method_transaction_codes,
+    get_requested_fields,
+    get_field_projection,
 )
-from .transaction import (
-    REQUEST_DAY_CANDLE_CODE,
-    REQUEST_MINUTE_CANDLE_CODE,
-    REQUEST_UPPER_AND_LOW_CODE,
-    REQUEST_OFFER_PRICE_INFO_CODE,
-    REQUEST_OFFHOUR_SINGLE_TRADE_INFO_CODE,
-    REQUEST_SHORT_TREND_CODE,
-)
-
+from ..timing import Timeline
+from .indicator import validate_indicator_parameters, apply_indicators, get_indicators, CANDLE_FIELDS
 
-@dataclass
-class KiwoomTaskParameter:
-    name: str
-    description: str
 
-
-# Kiwoom Task Parameter
+# Kiwoom Task Parameter, a view of the schema registry (schemas/*.json)
 KIWOOM_TASK_PARAMETER_MAP = {
-    REQUEST_MINUTE_CANDLE: [
-        KiwoomTaskParameter("from", "조회를 시작할 기간(YYYYMMDD)"),
-        KiwoomTaskParameter("to", "조회할 마지막 기간(YYYYMMDD)"),
-    ],
-    REQUEST_DAY_CANDLE: [
-        KiwoomTaskParameter("from", "조회를 시작할 기간(YYYYMMDD)"),
-    ],
-    REQUEST_UPPER_AND_LOW: [],
-    REQUEST_OFFER_PRICE_INFO: [],
-    REQUEST_OFFHOUR_SINGLE_TRADE_INFO: [],
-    REQUEST_SHORT_TREND: [],
+    method: list(get_schema(code).task_parameters) for method, code in get_method_transaction_codes().items()
 }
 
 
@@ -46,6 +21,18 @@ def validate_task_parameters(method, parameters):
     for each in kiwoom_task_parameters:
         if each.name not in parameters:
             raise ValueError(f"Task parameter '{each.name}'({each.description}) is missed")
+    transaction_code = get_method_transaction_codes()[method]
+    validate_indicator_parameters(get_schema(transaction_code), parameters)
+    get_projection(transaction_code, parameters)
+
+
+def get_projection(transaction_code, parameters):
+    """Projection of the requested `fields`, None when every field is returned."""
+    names = get_requested_fields(parameters)
+    if names is None:
+        return None
+    required = CANDLE_FIELDS if get_indicators(parameters) else ()
+    return get_field_projection(transaction_code, names, required)
 
 
 # Task Status
@@ -56,74 +43,102 @@ FAILED = "FAILED"
 
 
 class KiwoomTask:
-    def __init__(self, message):
+    def __init__(self, message, timeline=None, sink=None):
         self.task_id = message.task_id
         self.method = message.method
         self.parameters = message.parameters
         self.request_time = message.request_time
         self.response_time = None
         self.transaction_code = None
+        self.projection = None  # resolved with the transaction code, see `get_projection`
         self.status = PENDING
         self.transaction_request = None
         self.transaction_responses = []
+        self.pages = 0
+        self.rows = 0
+        self.last_page_response = None  # last row of the pages already sent when streamed
+        self.timeline = timeline if timeline is not None else Timeline()
+        self.sink = sink  # receives the pages instead of the reply queue, ex: a download job
+        self.cached_from = None  # rows older than this are answered from `cached_responses`
+        self.cached_responses = []
+
+    def mark(self, stage):
+        self.timeline.mark(stage)
+
+    @property
+    def is_streamed(self):
+        if self.sink is not None:
+            return True
+        return isinstance(self.parameters, dict) and bool(self.parameters.get("stream"))
+
+    @property
+    def is_cancelled(self):
+        return self.sink is not None and self.sink.is_cancelled
 
     @property
     def last_response(self):
-        return self.transaction_responses[-1]
+        if self.transaction_responses:
+            return self.transaction_responses[-1]
+        return self.last_page_response
 
     @property
     def has_result(self):
-        return self.transaction_responses
+        return self.transaction_responses or self.last_page_response is not None
 
     @property
     def is_completed(self):
-        transaction_code = self.transaction_code
-        parameters = self.parameters
-        last_response = self.last_response
-
-        if transaction_code == REQUEST_DAY_CANDLE_CODE:
-            return last_response["day"] <= parameters["from"]
-        elif transaction_code == REQUEST_MINUTE_CANDLE_CODE:
-            return last_response["timestamp"] <= parameters["from"]
-        elif transaction_code == REQUEST_UPPER_AND_LOW_CODE:
-            return True
-        elif transaction_code == REQUEST_OFFER_PRICE_INFO_CODE:
-            return True
-        elif transaction_code == REQUEST_OFFHOUR_SINGLE_TRADE_INFO_CODE:
-            return True
-        elif transaction_code == REQUEST_SHORT_TREND_CODE:
+        complete_key = get_schema(self.transaction_code).complete_key
+        if complete_key is None:
             return True
+        if self.cached_from is not None:
+            return self.last_response[complete_key] < self.cached_from
+        return self.last_response[complete_key] <= self.parameters["from"]
+
+    @property
+    def responses(self):
+        if self.cached_from is None:
+            return self.transaction_responses
+        complete_key = get_schema(self.transaction_code).complete_key
+        received = [each for each in self.transaction_responses if each[complete_key] >= self.cached_from]
+        return received + self.cached_responses
 
     @property
     def filtered_responses(self):
-        transaction_code = self.transaction_code
-        parameters = self.parameters
-        transaction_responses = self.transaction_responses
-
-        if transaction_code == REQUEST_DAY_CANDLE_CODE:
-            return list(
-                filter(
-                    lambda x: parameters["from"] <= x["day"] <= parameters["to"],
-                    transaction_responses
-                )
-            )
-        elif transaction_code == REQUEST_MINUTE_CANDLE_CODE:
-            return list(
-                filter(
-                    lambda x: parameters["from"] <= x["timestamp"] <= parameters["to"],
-                    transaction_responses
-                )
-            )
-        elif transaction_code == REQUEST_UPPER_AND_LOW_CODE:
-            return transaction_responses
-        elif transaction_code == REQUEST_OFFER_PRICE_INFO_CODE:
-            return transaction_responses
-        elif transaction_code == REQUEST_OFFHOUR_SINGLE_TRADE_INFO_CODE:
-            return transaction_responses
-        elif transaction_code == REQUEST_SHORT_TREND_CODE:
-            return list(
-                filter(
-                    lambda x: parameters["from"] <= x["day"] <= parameters["to"],
-                    transaction_responses
-                )
-            )
+        filter_key = get_schema(self.transaction_code).filter_key
+        if filter_key is None:
+            return self.responses
+        start, end = self.parameters["from"], self.parameters["to"]
+        return [each for each in self.responses if start <= each[filter_key] <= end]
+
+    def add_page(self, responses):
+        self.transaction_responses.extend(responses)
+        self.pages += 1
+        self.rows += len(responses)
+
+    def get_progress(self):
+        return {
+            "task_id": self.task_id,
+            "method": self.method,
+            "status": self.status,
+            "pages": self.pages,
+            "rows": self.rows,
+        }
+
+    def get_result(self):
+        """Rows of the finished task, the last page when streamed."""
+        if self.is_streamed:
+            return self.take_page()
+        result = apply_indicators(get_schema(self.transaction_code), self.filtered_responses, self.parameters)
+        if self.projection is None or self.parameters.get("indicators_only"):
+            return result
+        return self.projection.hide(result)
+
+    def take_page(self):
+        """Filtered responses received since the last page taken, releasing them."""
+        page = self.filtered_responses
+        if self.projection is not None:
+            page = self.projection.hide(page)
+        if self.transaction_responses:
+            self.last_page_response = self.transaction_responses[-1]
+            self.transaction_responses = []
+        return page
@@ -2,10 +2,18 @@ import sys
 import argparse
 import ctypes
 
-from PyQt5.Qt import QApplication
+from .admission import parse_budgets
+from .compression import DEFAULT_THRESHOLD
+from .watchdog import STALL_THRESHOLD
+from .result import RESULT_TTL, MAX_RESULT_ROWS
+from .candle import MAX_CACHED_ROWS
+from .kiwoom.ring import TICK_BUFFER_SIZE
+from .startup import StartupTimer, StartupSnapshot, IMPORTED, QT_INITIALIZED, MODULE_CREATED
 
-from .messenger import Messenger
-from .module import KiwoomModule
+
+# Created before Qt and the server modules are imported, which are deferred
+# to main() so that argument errors and --help do not wait for them
+STARTUP_TIMER = StartupTimer()
 
 
 class KiwoomPrivilegeError(Exception):
@@ -18,7 +26,103 @@ def parse_args():
         "broker_url",
         help="Type your message queue url (ex: amqp://localhost:5672)"
     )
+    parser.add_argument(
+        "--record-dir",
+        help="Record every real time tick to daily binary logs in this directory"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="YYYYMMDD",
+        help="Serve real time subscribers from the recorded day in --record-dir instead of the live feed"
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay speed as a multiple of the recorded pace, 0 for maximum speed (default: 1)"
+    )
+    parser.add_argument(
+        "--zmq-endpoint",
+        help="Serve subscriptions with transport 'zmq' from this ZeroMQ endpoint (ex: tcp://127.0.0.1:5557)"
+    )
+    parser.add_argument(
+        "--quote-board",
+        help="Keep the latest quote of each stock in this memory-mapped file for local readers"
+    )
+    parser.add_argument(
+        "--quote-board-codes",
+        default="",
+        help="Comma separated stock codes kept on the quote board without any subscriber"
+    )
+    parser.add_argument(
+        "--snapshot",
+        help="Keep looked up master data and real time subscriptions in this file and restore them on restart"
+    )
+    parser.add_argument(
+        "--compression-threshold",
+        type=int,
+        default=DEFAULT_THRESHOLD,
+        help=f"Compress replies of at least this many bytes for clients accepting it (default: {DEFAULT_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--client-budget",
+        type=int,
+        help="Transaction pages each client can request per hour, unlimited by default"
+    )
+    parser.add_argument(
+        "--client-budgets",
+        type=parse_budgets,
+        default={},
+        help="Comma separated budgets of specific clients (app_id or reply queue), ex: backfill=2000,screener=100"
+    )
+    parser.add_argument(
+        "--watchdog-threshold",
+        type=int,
+        default=STALL_THRESHOLD,
+        help="Log event loop stalls and callbacks of at least this many ms with their stack, "
+             f"0 to disable the watchdog and admin-profile (default: {STALL_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--result-ttl",
+        type=float,
+        default=RESULT_TTL,
+        help=f"Seconds a finished transaction result can be fetched again with get-task-result (default: {RESULT_TTL})"
+    )
+    parser.add_argument(
+        "--result-max-rows",
+        type=int,
+        default=MAX_RESULT_ROWS,
+        help=f"Rows of stored results kept before the oldest are evicted (default: {MAX_RESULT_ROWS})"
+    )
+    parser.add_argument(
+        "--job-dir",
+        help="Run download jobs (start-download-job) with their checkpoints and files in this directory"
+    )
+    parser.add_argument(
+        "--minute-cache-rows",
+        type=int,
+        default=MAX_CACHED_ROWS,
+        help="1 minute candles kept to answer request-minute-candle of any tick, 0 to disable "
+             f"(default: {MAX_CACHED_ROWS})"
+    )
+    parser.add_argument(
+        "--prefetch-schedule",
+        help="JSON file of histories to prefetch in off-hours windows and serve locally until the next opening"
+    )
+    parser.add_argument(
+        "--tick-buffer-size",
+        type=int,
+        default=TICK_BUFFER_SIZE,
+        help="Recent ticks of each subscribed stock kept for subscribers catching up by sequence, 0 to disable "
+             f"(default: {TICK_BUFFER_SIZE})"
+    )
+    parser.add_argument(
+        "--capture",
+        help="Append every request received on the tasks queue to this file, replayed by benchmarks.replay"
+    )
     parsed_args, unparsed_args = parser.parse_known_args()
+    if parsed_args.replay and not parsed_args.record_dir:
+        parser.error("--replay needs --record-dir to read the recorded day from")
     return parsed_args, unparsed_args
 
 
@@ -26,18 +130,90 @@ def check_run_as_admin():
     return ctypes.windll.shell32.IsUserAnAdmin() == 1
 
 
+def get_transports(parsed_args):
+    if not parsed_args.zmq_endpoint:
+        return []
+    from .transport import ZmqTransport  # pylint: disable=import-outside-toplevel
+    return [ZmqTransport(parsed_args.zmq_endpoint)]
+
+
+def get_quote_board(parsed_args):
+    if not parsed_args.quote_board:
+        return None
+    from .quote import QuoteBoard  # pylint: disable=import-outside-toplevel
+    return QuoteBoard(parsed_args.quote_board)
+
+
 def main():
     if not check_run_as_admin():
         raise KiwoomPrivilegeError("키움 OpenAPI 모듈은 관리자권한에서만 정상실행 됩니다")
 
     parsed_args, unparsed_args = parse_args()
 
+    # pylint: disable=import-outside-toplevel
+    from PyQt5.Qt import QApplication
+
+    from .messenger import Messenger
+    from .module import KiwoomModule
+    from .recorder import TickRecorder, TickReplayer
+    from .admission import AdmissionController
+    from .watchdog import EventLoopWatchdog
+    from .result import ResultStore
+    from .job import DownloadJobManager
+    from .candle import MinuteCandleCache
+    from .prefetch import PrefetchScheduler
+    from .capture import WorkloadCapture
+    STARTUP_TIMER.mark(IMPORTED)
+
     # QApplication expects the first argument to be the program name
     qt_args = sys.argv[:1] + unparsed_args
     app = QApplication(qt_args)
+    STARTUP_TIMER.mark(QT_INITIALIZED)
 
     broker_url = parsed_args.broker_url
-    kiwoom_module = KiwoomModule(Messenger(broker_url))
+    record_dir = parsed_args.record_dir
+    snapshot = StartupSnapshot(parsed_args.snapshot) if parsed_args.snapshot else None
+    if snapshot is not None:
+        snapshot.load()
+    replayer = (
+        TickReplayer(record_dir, parsed_args.replay, parsed_args.replay_speed) if parsed_args.replay
+        else None
+    )
+    recorder = TickRecorder(record_dir) if record_dir and not replayer else None
+    transports = get_transports(parsed_args)
+    quote_board = get_quote_board(parsed_args)
+    watchdog = (
+        EventLoopWatchdog(parsed_args.watchdog_threshold).start() if parsed_args.watchdog_threshold > 0
+        else None
+    )
+    capture = WorkloadCapture(parsed_args.capture) if parsed_args.capture else None
+    kiwoom_module = KiwoomModule(
+        Messenger(broker_url, transports, parsed_args.compression_threshold),
+        recorder=recorder,
+        replayer=replayer,
+        quote_board=quote_board,
+        snapshot=snapshot,
+        startup_timer=STARTUP_TIMER,
+        admission=AdmissionController(parsed_args.client_budget, parsed_args.client_budgets),
+        watchdog=watchdog,
+        result_store=ResultStore(parsed_args.result_ttl, parsed_args.result_max_rows),
+        jobs=DownloadJobManager(parsed_args.job_dir) if parsed_args.job_dir else None,
+        candle_cache=MinuteCandleCache(parsed_args.minute_cache_rows) if parsed_args.minute_cache_rows > 0 else None,
+        prefetch=PrefetchScheduler.load(parsed_args.prefetch_schedule) if parsed_args.prefetch_schedule else None,
+        tick_buffer_size=parsed_args.tick_buffer_size,
+        capture=capture
+    )
+    kiwoom_module.pinned_stock_codes.update(filter(None, parsed_args.quote_board_codes.split(",")))
+    STARTUP_TIMER.mark(MODULE_CREATED)
     kiwoom_module.connect()
 
     app.exec()
+
+    kiwoom_module.save_snapshot()
+
+    if recorder is not None:
+        recorder.close()
+    if quote_board is not None:
+        quote_board.close()
+    if capture is not None:
+        capture.close()
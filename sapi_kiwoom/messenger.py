@@ -1,12 +1,34 @@
 from datetime import datetime
 from dataclasses import dataclass
-
-from .mq import publish, serialize, deserialize, generate_queue, get_connection, get_channel
+from threading import Thread
+from time import sleep
+
+from pika.exceptions import AMQPChannelError, AMQPError
+
+from .mq import (
+    publish,
+    serialize,
+    deserialize,
+    generate_queue,
+    get_connection,
+    get_channel,
+    get_queue_arguments,
+    get_queue_depth,
+    get_reply_properties,
+    decode_body,
+)
+from .compression import DEFAULT_THRESHOLD, negotiate_codec
 from .utils import get_task_response
+from .timing import SERIALIZED, PUBLISHED
+from .transport import AmqpTransport, AMQP
+from .backpressure import BackpressureMonitor, BACKPRESSURE_CHECK_INTERVAL, get_backpressure_parameters
 
 
 TASK_SUCCEED = "TASK_SUCCEED"
 TASK_FAILED = "TASK_FAILED"
+TASK_ACCEPTED = "TASK_ACCEPTED"
+TASK_REJECTED = "TASK_REJECTED"
+TASK_PARTIAL = "TASK_PARTIAL"
 DEFAULT_REQUEST_QUEUE_NAME = "tasks"
 DEFAULT_RESPONSE_QUEUE_NAME = "sapi-kiwoom"
 
@@ -24,27 +46,52 @@ class Message:
     request_time: str
 
 
-def get_success_message(task_id, message):
+def get_success_message(task_id, message, timing=None):
     return get_task_response(
         task_id,
         message,
         datetime.now(),
-        TASK_SUCCEED
+        TASK_SUCCEED,
+        timing
     )
 
 
-def get_fail_message(task_id, message):
+def get_fail_message(task_id, message, timing=None):
     return get_task_response(
         task_id,
         message,
         datetime.now(),
-        TASK_FAILED
+        TASK_FAILED,
+        timing
     )
 
 
-def get_message(body):
+def get_accepted_message(task_id, message):
+    return get_task_response(task_id, message, datetime.now(), TASK_ACCEPTED)
+
+
+def get_rejected_message(task_id, message):
+    return get_task_response(task_id, message, datetime.now(), TASK_REJECTED)
+
+
+def get_partial_message(task_id, message):
+    return get_task_response(task_id, message, datetime.now(), TASK_PARTIAL)
+
+
+def serialize_task_response(task_response):
+    timeline = task_response.get("timing")
+    if timeline is None:
+        return serialize(task_response)
+    timeline.mark(SERIALIZED)
+    response = {key: value for key, value in task_response.items() if key != "timing"}
+    if timeline.is_reported:
+        response["timing"] = timeline.to_dict()
+    return serialize(response)
+
+
+def get_message(body, properties=None):
     try:
-        deserialized = deserialize(body)
+        deserialized = deserialize(decode_body(body, properties))
         return Message(
             task_id=deserialized["task_id"],
             method=deserialized["method"],
@@ -55,25 +102,68 @@ def get_message(body):
         raise MessageParsingError("Error occurred in parsing message") from error
 
 
+def get_task_id(body, properties=None):
+    # Of a message failed to parse, so its reply is still correlated when the id is found
+    correlation_id = getattr(properties, "correlation_id", None)
+    if correlation_id:
+        return correlation_id
+    try:
+        return deserialize(decode_body(body, properties))["task_id"]
+    except Exception:  # pylint: disable=broad-except
+        return "unknown"
+
+
 class Messenger:
 
-    def __init__(self, broker_url):
+    def __init__(self, broker_url, transports=None, compression_threshold=DEFAULT_THRESHOLD):
         self.broker_url = broker_url
+        self.compression_threshold = compression_threshold
         self.delivery_tags = {}
         self.reply_queues = {}
+        self.clients = {}  # {task_id: client,}
+        self.codecs = {}  # {task_id: codec accepted by the client,}
         self.channel = None
+        self.publish_channel = None
+        self.monitor_channel = None
+        self.declare_connection = None
+        self.declare_channel = None
+        self.unmonitored_queues = set()
+        self.queue_depths = {}  # {reply_queue: depth,}, polled off the Qt event loop
+        self.depth_thread = None
+        self.backpressure = BackpressureMonitor()
+        self.transports = {AMQP: AmqpTransport(broker_url)}
+        for transport in transports or []:
+            self.transports[transport.name] = transport
+        self.task_transports = {}  # {task_id: transport_name,}
         self.setup_default_queue()
 
     def setup_default_queue(self):
-        connection = get_connection(self.broker_url)
-        channel = get_channel(connection)
-        generate_queue(channel, DEFAULT_RESPONSE_QUEUE_NAME)
+        generate_queue(self.get_publish_channel(), DEFAULT_RESPONSE_QUEUE_NAME)
+
+    def get_publish_channel(self):
+        # Real time messages can be sent before the consumer receives its
+        # first request, ex: subscriptions restored at startup
+        if self.publish_channel is None:
+            self.publish_channel = get_channel(get_connection(self.broker_url))
+        return self.publish_channel
 
     def get_broker_url(self):
         return self.broker_url
 
     def send(self, task_response, reply_queue, channel):
-        publish(self.broker_url, serialize(task_response), reply_queue, channel=channel)
+        publish(
+            self.broker_url,
+            serialize_task_response(task_response),
+            reply_queue,
+            properties=get_reply_properties(task_response["task_id"]),
+            channel=channel,
+            codec=self.codecs.get(task_response["task_id"]),
+            threshold=self.compression_threshold
+        )
+        timeline = task_response.get("timing")
+        if timeline is not None:
+            # After the reply is sent, so it is seen by get-task-result only
+            timeline.mark(PUBLISHED)
 
     def acknowledge(self, channel, delivery_tag):
         channel.basic_ack(delivery_tag=delivery_tag)
@@ -85,27 +175,187 @@ class Messenger:
         return properties.reply_to if properties.reply_to else DEFAULT_RESPONSE_QUEUE_NAME
 
     def parse_message(self, channel, method, properties, body):
-        message = get_message(body)
+        message = get_message(body, properties)
         self._set_message_properties(message.task_id, channel, method, properties)
         return message
 
     def acknowledge_message(self, task_id):
         self.acknowledge(self.channel, self._pop_delivery_tag(task_id))
 
-    def send_success_message(self, task_id, message, pop_reply_queue=True, ack=True):
-        task_response = get_success_message(task_id, message)
+    def send_success_message(self, task_id, message, pop_reply_queue=True, ack=True, timeline=None):
+        task_response = get_success_message(task_id, message, timeline)
         self._send_message(task_response, pop_reply_queue, ack)
 
-    def send_fail_message(self, task_id, message, pop_reply_queue=True, ack=True):
-        task_response = get_fail_message(task_id, message)
+    def send_fail_message(self, task_id, message, pop_reply_queue=True, ack=True, timeline=None):
+        task_response = get_fail_message(task_id, message, timeline)
         self._send_message(task_response, pop_reply_queue, ack)
 
+    def send_accepted_message(self, task_id, message):
+        # The result follows, so the request stays unacknowledged
+        self._send_message(get_accepted_message(task_id, message), pop_reply_queue=False, ack=False)
+
+    def send_partial_message(self, task_id, message):
+        # A page of a streamed request, the rest of the pages follow
+        self._send_message(get_partial_message(task_id, message), pop_reply_queue=False, ack=False)
+
+    def send_rejected_message(self, task_id, message):
+        self._send_message(get_rejected_message(task_id, message), pop_reply_queue=True, ack=True)
+
+    def get_client(self, task_id):
+        return self.clients.get(task_id)
+
+    def set_task_transport(self, task_id, transport_name):
+        transport_name = transport_name or AMQP
+        if transport_name not in self.transports:
+            raise ValueError(
+                f"Transport '{transport_name}' is not available, use one of {list(self.transports)}"
+            )
+        if transport_name == AMQP:
+            self.task_transports.pop(task_id, None)
+            return
+        self.task_transports[task_id] = transport_name
+
+    def remove_task_transport(self, task_id):
+        self.task_transports.pop(task_id, None)
+
+    def set_task_backpressure(self, task_id, parameters, is_degradable=True):
+        """Bound the reply queue of a subscription and watch it for a slow subscriber."""
+        if self.task_transports.get(task_id, AMQP) != AMQP:
+            return
+        backpressure_parameters = get_backpressure_parameters(parameters)
+        if not is_degradable and backpressure_parameters["degrade"] is not None:
+            raise ValueError("Messages of this subscription can not be skipped, 'degrade' is not available")
+        reply_queue = self._get_reply_queue(task_id)
+        arguments = get_queue_arguments(
+            backpressure_parameters["max_length"],
+            backpressure_parameters["message_ttl"],
+            backpressure_parameters["overflow"],
+        )
+        if arguments is not None:
+            self.declare_reply_queue(reply_queue, arguments)
+        if backpressure_parameters["degrade"] is not None:
+            self.check_reply_queue(reply_queue)
+            self.backpressure.add(task_id, reply_queue, backpressure_parameters)
+
+    def remove_task_backpressure(self, task_id):
+        self.backpressure.remove(task_id)
+
+    def set_subscriber(self, task_id, parameters, is_degradable=True):
+        previous_transport = self.task_transports.get(task_id)
+        self.set_task_transport(task_id, parameters.get("transport"))
+        try:
+            self.set_task_backpressure(task_id, parameters, is_degradable)
+        except ValueError:
+            # Nothing is kept of a subscription failed to set up
+            self.set_task_transport(task_id, previous_transport)
+            raise
+
+    def remove_subscriber(self, task_id):
+        # The reply queue stays for the reply to the unsubscription
+        self.remove_task_transport(task_id)
+        self.remove_task_backpressure(task_id)
+        self.clients.pop(task_id, None)
+        self.codecs.pop(task_id, None)
+
+    def get_declare_channel(self):
+        if self.declare_connection is None or not self.declare_connection.is_open:
+            self.declare_connection = get_connection(self.broker_url)
+            self.declare_channel = None
+        if self.declare_channel is None or not self.declare_channel.is_open:
+            self.declare_channel = get_channel(self.declare_connection)
+        return self.declare_channel
+
+    def declare(self, declaration):
+        # Declarations block and a failed one closes its channel, so they run on a channel of their own
+        try:
+            return declaration(self.get_declare_channel())
+        except AMQPChannelError:
+            raise
+        except AMQPError:
+            # The connection idle since the last declaration may be dropped by the broker
+            self.declare_connection = None
+            return declaration(self.get_declare_channel())
+
+    def declare_reply_queue(self, reply_queue, arguments):
+        try:
+            self.declare(lambda channel: generate_queue(channel, reply_queue, arguments))
+        except AMQPError as error:
+            raise ValueError(
+                f"Reply queue '{reply_queue}' could not be declared with {arguments}, "
+                f"declare it with the same arguments and without exclusive: {error}"
+            ) from error
+
+    def check_reply_queue(self, reply_queue):
+        # An exclusive queue is locked to the subscriber's connection, its depth can not be polled
+        try:
+            self.declare(lambda channel: get_queue_depth(channel, reply_queue))
+        except AMQPError as error:
+            raise ValueError(
+                f"Reply queue '{reply_queue}' can not be watched for 'degrade', "
+                f"declare it without exclusive: {error}"
+            ) from error
+
+    def get_queue_depth(self, queue):
+        if queue in self.unmonitored_queues:
+            return None
+        try:
+            if self.monitor_channel is None:
+                self.monitor_channel = get_channel(get_connection(self.broker_url))
+            return get_queue_depth(self.monitor_channel, queue)
+        except AMQPError as error:
+            # The reply queue is deleted after the subscription, exclusive ones are rejected at it
+            print(f"Reply queue '{queue}' is not monitored for backpressure: {error}")
+            self.unmonitored_queues.add(queue)
+            self.monitor_channel = None
+            return None
+
+    def poll_queue_depths(self):
+        # A passive declaration per queue blocks, so it never runs on the Qt event loop
+        while True:
+            reply_queues = {state.reply_queue for state in self.backpressure.subscribers.values()}
+            self.queue_depths = {queue: self.get_queue_depth(queue) for queue in reply_queues}
+            sleep(BACKPRESSURE_CHECK_INTERVAL / 1000)
+
+    def check_backpressure(self):
+        if not self.backpressure.subscribers:
+            return
+        if self.depth_thread is None:
+            self.depth_thread = Thread(target=self.poll_queue_depths, daemon=True)
+            self.depth_thread.start()
+        for task_id, message in self.backpressure.check(self.queue_depths.get):
+            self._send_real_time_message(task_id, message)
+
+    def send_real_time_message(self, task_id, message):
+        if self.task_transports.get(task_id, AMQP) == AMQP and not self.backpressure.admit(task_id, message):
+            return
+        self._send_real_time_message(task_id, message)
+
+    def _send_real_time_message(self, task_id, message):
+        task_response = get_success_message(task_id, message)
+        transport = self.transports[self.task_transports.get(task_id, AMQP)]
+        transport.send(
+            serialize(task_response),
+            self._get_reply_queue(task_id),
+            channel=self.channel or self.get_publish_channel()
+        )
+
+    def get_reply_queue(self, task_id):
+        return self._get_reply_queue(task_id)
+
+    def restore_reply_queue(self, task_id, reply_queue):
+        self.reply_queues[task_id] = reply_queue
+
     def _set_message_properties(self, task_id, channel, method, properties):
         delivery_tag = self.generate_delivery_tag(method)
         self.delivery_tags[task_id] = delivery_tag
 
         reply_queue = self.generate_reply_queue(properties)
         self.reply_queues[task_id] = reply_queue
+        self.clients[task_id] = getattr(properties, "app_id", None) or reply_queue
+
+        codec = negotiate_codec(getattr(properties, "headers", None))
+        if codec is not None:
+            self.codecs[task_id] = codec
 
         if not self.channel:
             self.channel = channel
@@ -121,10 +371,10 @@ class Messenger:
 
     def _send_message(self, task_response, pop_reply_queue, ack):
         task_id = task_response["task_id"]
-        reply_queue = (
-            self._pop_reply_queue(task_id) if pop_reply_queue
-            else self._get_reply_queue(task_id)
-        )
-        self.send(task_response, reply_queue, channel=self.channel)
+        self.send(task_response, self._get_reply_queue(task_id), channel=self.channel)
+        if pop_reply_queue:
+            self._pop_reply_queue(task_id)
+            self.clients.pop(task_id, None)
+            self.codecs.pop(task_id, None)
         if ack:
             self.acknowledge_message(task_id)
@@ -1,18 +1,38 @@
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
+from time import monotonic
 
 from PyQt5.QAxContainer import QAxWidget
+from PyQt5.QtCore import QTimer, pyqtSignal
 
-from .messenger import MessageParsingError, get_fail_message, Messenger, DEFAULT_REQUEST_QUEUE_NAME
+from .messenger import (
+    MessageParsingError,
+    Message,
+    get_fail_message,
+    get_task_id,
+    Messenger,
+    DEFAULT_REQUEST_QUEUE_NAME,
+)
 from .mq import get_consume_thread
-from .delay import wait_until_request_available
+from .delay import wait_until_request_available, is_request_available
 from .kiwoom.method import (
     get_method_type,
     REALTIME,
     LOOKUP,
     TRANSACTION,
+    ADMIN,
+    ADMIN_PROFILE,
+    RESULT,
+    JOB,
+    START_DOWNLOAD_JOB,
+    GET_DOWNLOAD_JOB,
+    CANCEL_DOWNLOAD_JOB,
     GET_STOCK_NAME,
     GET_STOCK_CODES,
     GET_STOCK_STATES,
+    SUBSCRIBE_REALTIME,
+    SUBSCRIBE_BAR,
+    SUBSCRIBE_ORDERBOOK,
 )
 from .kiwoom.lookup import get_lookup_parameters, KiwoomLookupError
 from .kiwoom.transaction import (
@@ -22,19 +42,66 @@ from .kiwoom.transaction import (
     KIWOOM_CONTINUE_REQUEST,
     REQUEST_SUCCEED,
     get_randomized_screen_number,
+    get_transaction_code,
+    REQUEST_MINUTE_CANDLE_CODE,
+)
+from .kiwoom.schema import get_schema
+from .kiwoom.cost import estimate_pages
+from .kiwoom.indicator import get_indicators
+from .kiwoom.task import validate_task_parameters, get_projection, KiwoomTask, REQUESTED, COMPLETED, FAILED
+from .timing import (
+    Timeline,
+    is_timing_requested,
+    RECEIVED,
+    PARSED,
+    ENQUEUED,
+    WAITING,
+    DISPATCHED,
+    DATA_RECEIVED,
 )
-from .kiwoom.task import validate_task_parameters, KiwoomTask, REQUESTED, FAILED
 from .kiwoom.rt import (
     validate_real_time_parameters,
     is_subscribe,
     is_unsubscribe,
+    is_subscribe_bar,
+    is_unsubscribe_bar,
+    is_subscribe_order_book,
+    is_unsubscribe_order_book,
+    is_subscribe_screen,
+    is_unsubscribe_screen,
     generate_real_time_response,
+    STOCK_TRADE,
+    STOCK_OFFER,
+)
+from .kiwoom.bar import BarAggregator, get_bar_parameters, get_feed_timestamp, get_expiry_timestamp
+from .kiwoom.orderbook import OrderBook, OrderBookStream, get_order_book_parameters
+from .kiwoom.ring import (
+    TickRing,
+    TICK_BUFFER_SIZE,
+    TICK_RING_RETENTION,
+    RING_RELEASE_INTERVAL,
+    get_catch_up_parameters,
 )
+from .kiwoom.screen import Screener, SCREEN_INTERVAL, get_numpy, get_screen_codes
+from .backpressure import BACKPRESSURE_CHECK_INTERVAL
+from .admission import AdmissionController, AdmissionRejected, is_estimate_requested
+from .startup import LOGGED_IN, RESTORED, CONSUMING, SNAPSHOT_SAVE_INTERVAL
+from .result import ResultStore
+from .job import JOB_DISPATCH_INTERVAL, CSV
+from .prefetch import PREFETCH_DISPATCH_INTERVAL
 
 
 # Kiwoom Connection Status
 CONNECTION_SUCCEED = 0
 
+# Kiwoom Real Time Registration Type
+REAL_TIME_REPLACE = "0"
+REAL_TIME_ADD = "1"
+MAX_REAL_TIME_CODES = 100  # per SetRealReg call and screen
+
+BAR_EXPIRE_INTERVAL = 1000  # ms
+BAR_EXPIRE_GRACE = timedelta(seconds=2)
+
 
 class KiwoomModuleUninstallError(Exception):
     pass
@@ -42,15 +109,70 @@ class KiwoomModuleUninstallError(Exception):
 
 class KiwoomModule(QAxWidget):
 
-    def __init__(self, messenger: Messenger):
+    # Emitted from the consumer thread, its slot runs on the Qt event loop
+    loop_call_requested = pyqtSignal()
+
+    def __init__(
+            self,
+            messenger: Messenger,
+            *,
+            recorder=None,
+            replayer=None,
+            quote_board=None,
+            snapshot=None,
+            startup_timer=None,
+            admission=None,
+            watchdog=None,
+            result_store=None,
+            jobs=None,
+            candle_cache=None,
+            prefetch=None,
+            tick_buffer_size=TICK_BUFFER_SIZE,
+            capture=None
+        ):
+        # pylint: disable=too-many-arguments
         super().__init__()
 
         self.tasks = {}
         self.screen_numbers = {}  # {stock_code: screen_number,}
         self.listeners = {}  # {stock_code: [task_id,],}
+        self.tick_rings = {}  # {stock_code: TickRing,}, while the stock has listeners
+        self.released_rings = {}  # {stock_code: release time,}, rings kept after the last listener
+        self.loop_calls = deque()  # [(callback, args),], of the consumer thread run on the Qt event loop
+        self.bar_aggregators = {}  # {stock_code: {task_id: BarAggregator,},}
+        self.order_book_streams = {}  # {stock_code: {task_id: OrderBookStream,},}
+        self.order_books = {}  # {stock_code: OrderBook,}, a new stream starts with a snapshot of it
+        self.screener = None  # Screener, of the first screen subscribed
+        self.feed_timestamp = None  # HHMMSS of the latest tick, the clock minute bars expire by
+        self.pinned_stock_codes = set()  # registered without listeners, for the quote board
+        self.subscriptions = {}  # {(method, stock_code, task_id): subscription,}, kept in the snapshot
+        self.master_data = {GET_STOCK_NAME: {}, GET_STOCK_CODES: {}, GET_STOCK_STATES: {}}  # {method: {key: result,},}
 
         self.messenger = messenger
-        self.consumer = get_consume_thread(self.messenger.get_broker_url(), DEFAULT_REQUEST_QUEUE_NAME, self.callback)
+        self.recorder = recorder
+        self.replayer = replayer
+        self.quote_board = quote_board
+        self.snapshot = snapshot
+        self.startup_timer = startup_timer
+        self.admission = admission or AdmissionController()
+        self.watchdog = watchdog
+        self.result_store = result_store if result_store is not None else ResultStore()
+        self.jobs = jobs
+        self.candle_cache = candle_cache
+        self.prefetch = prefetch
+        self.tick_buffer_size = tick_buffer_size
+        self.capture = capture
+        self.is_snapshot_changed = False
+        if snapshot is not None:
+            for method, results in snapshot.master_data.items():
+                if method in self.master_data:
+                    self.master_data[method] = dict(results)
+        self.consumer = get_consume_thread(
+            self.messenger.get_broker_url(),
+            DEFAULT_REQUEST_QUEUE_NAME,
+            self.callback,
+            self.on_consuming
+        )
 
         self.request_timestamps = []
 
@@ -59,15 +181,55 @@ class KiwoomModule(QAxWidget):
         try:
             self.OnEventConnect.connect(self.on_connect)
             self.OnReceiveMsg.connect(self.on_receive_message)
-            self.OnReceiveTrData.connect(self.on_receive_tr_data)
-            self.OnReceiveRealData.connect(self.on_receive_real_data)
+            self.OnReceiveTrData.connect(self.watch(self.on_receive_tr_data))
+            self.OnReceiveRealData.connect(self.watch(self.on_receive_real_data))
         except AttributeError as error:
             raise KiwoomModuleUninstallError("키움 OpenAPI 가 설치되지 않았습니다") from error
 
+        self.loop_call_requested.connect(self.run_loop_calls)
+
+        # Started on the first use of their feature, stopped once it is unused
+        self.bar_timer = QTimer()
+        self.bar_timer.timeout.connect(self.expire_bars)
+
+        self.backpressure_timer = QTimer()
+        self.backpressure_timer.timeout.connect(self.check_backpressure)
+
+        self.ring_timer = QTimer()
+        self.ring_timer.timeout.connect(self.release_tick_rings)
+
+        self.screen_timer = QTimer()
+        self.screen_timer.timeout.connect(self.evaluate_screens)
+
+        if snapshot is not None:
+            self.snapshot_timer = QTimer()
+            self.snapshot_timer.timeout.connect(self.save_snapshot)
+            self.snapshot_timer.start(SNAPSHOT_SAVE_INTERVAL)
+
+        if jobs is not None:
+            self.job_timer = QTimer()
+            self.job_timer.timeout.connect(self.dispatch_jobs)
+
+        if prefetch is not None:
+            self.prefetch_timer = QTimer()
+            self.prefetch_timer.timeout.connect(self.dispatch_prefetch)
+
+    @staticmethod
+    def start_timer(timer, interval):
+        if not timer.isActive():
+            timer.start(interval)
+
+    def watch(self, callback):
+        return callback if self.watchdog is None else self.watchdog.watch(callback)
+
     def add_listener(self, stock_code, task_id):
         existing_listeners = self.listeners.get(stock_code, [])
         listeners = [*existing_listeners, task_id]
         self.listeners.update({stock_code: listeners})
+        if self.tick_buffer_size > 0 and stock_code not in self.tick_rings:
+            self.tick_rings = {**self.tick_rings, stock_code: TickRing(self.tick_buffer_size)}
+        if stock_code in self.released_rings:
+            self.released_rings = {code: each for code, each in self.released_rings.items() if code != stock_code}
 
     def add_screen_number(self, stock_code, screen_number):
         if stock_code not in self.screen_numbers:
@@ -78,12 +240,17 @@ class KiwoomModule(QAxWidget):
         listeners = list(filter(lambda each: each != task_id, existing_listeners))
         if not listeners:
             self.listeners.pop(stock_code)
+            if stock_code in self.tick_rings:
+                # Kept numbering ticks for a subscriber reconnecting with `from_sequence`
+                self.released_rings = {
+                    **self.released_rings, stock_code: monotonic() + TICK_RING_RETENTION
+                }
+                self.call_on_loop(self.start_timer, self.ring_timer, RING_RELEASE_INTERVAL)
             return
         self.listeners.update({stock_code: listeners})
 
     def remove_screen_number(self, stock_code):
-        existing_listeners = self.listeners.get(stock_code, [])
-        if existing_listeners:
+        if self.has_listeners(stock_code):
             return
         self.screen_numbers.pop(stock_code)
 
@@ -96,15 +263,121 @@ class KiwoomModule(QAxWidget):
         listeners = self.listeners.get(stock_code, [])
         return task_id in listeners
 
+    def has_listeners(self, stock_code):
+        return bool(
+            self.listeners.get(stock_code)
+            or self.bar_aggregators.get(stock_code)
+            or self.order_book_streams.get(stock_code)
+            or (self.screener is not None and self.screener.is_screened(stock_code))
+            or stock_code in self.pinned_stock_codes
+            or stock_code in self.released_rings
+        )
+
+    def pin_stock_codes(self, stock_codes):
+        self.pinned_stock_codes.update(stock_codes)
+        self.register_real_time_codes(stock_codes)
+
+    def register_real_time(self, stock_code):
+        self.register_real_time_codes([stock_code])
+
+    def register_real_time_codes(self, stock_codes):
+        stock_codes = list(dict.fromkeys(each for each in stock_codes if each not in self.screen_numbers))
+        for start in range(0, len(stock_codes), MAX_REAL_TIME_CODES):
+            chunk = stock_codes[start:start + MAX_REAL_TIME_CODES]
+            screen_number = get_randomized_screen_number()
+            self.subscribe_real_time_data(screen_number, ";".join(chunk), "10", REAL_TIME_ADD)
+            for stock_code in chunk:
+                self.add_screen_number(stock_code, screen_number)
+
+    def unregister_real_time(self, stock_code):
+        if self.has_listeners(stock_code) or stock_code not in self.screen_numbers:
+            return
+        screen_number = self.get_screen_number(stock_code)
+        self.unsubscribe_real_time_date(screen_number, stock_code)
+        self.remove_screen_number(stock_code)
+
+    def add_subscription(self, method, stock_code, task_id, parameters):
+        self.subscriptions[(method, stock_code, task_id)] = {
+            "task_id": task_id,
+            "method": method,
+            "stock_code": stock_code,
+            "parameters": parameters,
+            "reply_queue": self.messenger.get_reply_queue(task_id),
+        }
+        self.is_snapshot_changed = True
+
+    def set_subscriber(self, task_id, parameters, is_degradable=True):
+        self.messenger.set_subscriber(task_id, parameters, is_degradable)
+        if task_id in self.messenger.backpressure.subscribers:
+            self.call_on_loop(self.start_timer, self.backpressure_timer, BACKPRESSURE_CHECK_INTERVAL)
+
+    def check_backpressure(self):
+        if not self.messenger.backpressure.subscribers:
+            self.backpressure_timer.stop()
+            return
+        self.messenger.check_backpressure()
+
+    def remove_subscription(self, method, stock_code, task_id):
+        if self.subscriptions.pop((method, stock_code, task_id), None) is not None:
+            self.is_snapshot_changed = True
+
+    def restore_subscriptions(self, subscriptions):
+        stock_codes = []
+        for each in subscriptions:
+            task_id, method, stock_code, parameters = (
+                each["task_id"], each["method"], each["stock_code"], each["parameters"]
+            )
+            self.messenger.restore_reply_queue(task_id, each["reply_queue"])
+            try:
+                self.set_subscriber(task_id, parameters, is_degradable=method != SUBSCRIBE_ORDERBOOK)
+                if method == SUBSCRIBE_BAR:
+                    self.add_bar_aggregator(stock_code, task_id, get_bar_parameters(parameters))
+                elif method == SUBSCRIBE_ORDERBOOK:
+                    self.add_order_book_stream(stock_code, task_id, get_order_book_parameters(parameters))
+                elif not self.has_subscribed(stock_code, task_id):
+                    self.add_listener(stock_code, task_id)
+            except ValueError as error:
+                print(f"Subscription of {task_id} to {stock_code} is not restored: {error}")
+                continue
+            self.add_subscription(method, stock_code, task_id, parameters)
+            stock_codes.append(stock_code)
+        self.register_real_time_codes(stock_codes)
+
+    def save_snapshot(self):
+        if self.snapshot is None or not self.is_snapshot_changed:
+            return
+        self.is_snapshot_changed = False
+        # Lookups and subscriptions are added from the consumer thread, and
+        # copying a dict does not let it run in between
+        self.snapshot.save(
+            {method: dict(results) for method, results in self.master_data.items()},
+            list(dict(self.subscriptions).values())
+        )
+
+    def mark_startup(self, phase):
+        if self.startup_timer is not None:
+            self.startup_timer.mark(phase)
+
     def start_consuming(self):
         return self.consumer.start()
 
+    def on_consuming(self):
+        self.mark_startup(CONSUMING)
+
     def callback(self, channel, method, properties, body):
+        timeline = Timeline()
+        timeline.mark(RECEIVED)
+        if self.capture is not None:
+            try:
+                self.capture.record(properties, body)
+            except OSError as error:
+                print(f"Request is not captured: {error}")
         try:
             message = self.messenger.parse_message(channel, method, properties, body)
-            self.handle_task_request(message)
+            timeline.mark(PARSED)
+            self.handle_task_request(message, timeline)
         except MessageParsingError as error:
-            task_response = get_fail_message("unknown", str(error))
+            task_response = get_fail_message(get_task_id(body, properties), str(error))
             delivery_tag = self.messenger.generate_delivery_tag(method)
             reply_queue = self.messenger.generate_reply_queue(properties)
             self.messenger.send(task_response, reply_queue, channel)
@@ -115,7 +388,7 @@ class KiwoomModule(QAxWidget):
             print(f"Unhandled excpetion: {error}")
             self.messenger.send_fail_message(message.task_id, "Unhandled excpetion occurred")
 
-    def handle_task_request(self, message):
+    def handle_task_request(self, message, timeline=None):
         task_id = message.task_id
         method = message.method
         parameters = message.parameters
@@ -123,45 +396,15 @@ class KiwoomModule(QAxWidget):
         method_type = get_method_type(method)
 
         if method_type == REALTIME:
-            validate_real_time_parameters(parameters)
-
-            stock_code = parameters["stock_code"]
-
-            if is_subscribe(method):
-                if not self.has_subscribed(stock_code, task_id):
-                    screen_number = get_randomized_screen_number()
-                    self.subscribe_real_time_data(screen_number, stock_code, "10", "0")
-                    self.add_listener(stock_code, task_id)
-                    self.add_screen_number(stock_code, screen_number)
-                self.messenger.send_success_message(
-                    task_id,
-                    f"{task_id} subscribes {stock_code} successfully",
-                    pop_reply_queue=False
-                )
-            elif is_unsubscribe(method):
-                if not self.has_subscribed(stock_code, task_id):
-                    self.messenger.send_fail_message(
-                        task_id,
-                        f"{task_id} did not subscribed {stock_code} yet"
-                    )
-                    return
-                screen_number = self.get_screen_number(stock_code)
-                self.unsubscribe_real_time_date(screen_number, stock_code)
-                self.remove_listener(stock_code, task_id)
-                self.remove_screen_number(stock_code)
-                self.messenger.send_success_message(
-                    task_id,
-                    f"{task_id} unsubscribes {stock_code} successfully"
-                )
-            else:
-                self.send_fail_message(task_id, f"Method '{method}' is not avaliable")
-                return
+            self.handle_real_time_request(message)
         elif method_type == LOOKUP:
             lookup_result = self.get_lookup_result(method, parameters)
             self.messenger.send_success_message(task_id, lookup_result)
         elif method_type == TRANSACTION:
             validate_task_parameters(method, parameters)
-            task = KiwoomTask(message)
+            if timeline is not None:
+                timeline.is_reported = is_timing_requested(parameters)
+            task = KiwoomTask(message, timeline)
 
             transaction_request = KiwoomTransactionRequest(
                 task_id,
@@ -170,9 +413,482 @@ class KiwoomModule(QAxWidget):
             )
 
             task.transaction_code = transaction_request.transaction_code
+            task.projection = get_projection(task.transaction_code, parameters)
             task.transaction_request = transaction_request
+            if self.serve_cached_task(task):
+                return
+            if self.prefetch is not None:
+                self.prefetch.on_client_request()
+            if not self.admit_task(task):
+                return
             self.tasks.update({task_id: task})
+            task.mark(ENQUEUED)
             self.request(transaction_request)
+        elif method_type == ADMIN:
+            self.handle_admin_request(message)
+        elif method_type == RESULT:
+            self.messenger.send_success_message(task_id, self.get_task_result(parameters))
+        elif method_type == JOB:
+            self.messenger.send_success_message(task_id, self.handle_job_request(message))
+
+    def get_task_result(self, parameters):
+        target_task_id = parameters.get("task_id") if isinstance(parameters, dict) else None
+        if not target_task_id:
+            raise ValueError("Task parameter 'task_id'(결과를 조회할 task_id) is missed")
+        running_task = self.tasks.get(target_task_id)
+        if running_task is not None:
+            return {
+                **running_task.get_progress(),
+                "estimated_pages": self.admission.get_estimated_pages(target_task_id),
+            }
+        stored = self.result_store.get(target_task_id)
+        if stored is None:
+            raise ValueError(f"Task '{target_task_id}' is neither running nor stored")
+        return stored.to_dict()
+
+    def serve_cached_task(self, task):
+        """Answer a transaction from prefetched or cached rows, True when it was."""
+        if task.is_streamed:
+            return False
+        rows = self.get_cached_rows(task)
+        if rows is None:
+            return False
+        task.add_page(self.project_cached_rows(task, rows))
+        result = task.get_result()
+        self.finish_task(task, COMPLETED, result)
+        self.messenger.send_success_message(task.task_id, result, timeline=task.timeline)
+        return True
+
+    def get_cached_rows(self, task):
+        parameters = task.parameters
+        if self.prefetch is not None:
+            rows = self.prefetch.get(task.transaction_code, parameters)
+            if rows is not None:
+                return rows
+        if self.candle_cache is None or task.transaction_code != REQUEST_MINUTE_CANDLE_CODE:
+            return None
+        try:
+            tick = int(parameters["tick"])
+        except (TypeError, ValueError):
+            return None
+        cached = self.candle_cache.get_oldest(
+            parameters["stock_code"], parameters["is_adjusted"], parameters["from"], parameters["to"], tick
+        )
+        if cached is None:
+            return None
+        missing, rows = cached
+        if missing is None:
+            return rows
+        # Only the newer days are requested, paging stops at the cached ones
+        task.cached_from = missing
+        task.cached_responses = self.project_cached_rows(task, rows)
+        return None
+
+    @staticmethod
+    def project_cached_rows(task, rows):
+        if task.projection is None:
+            return rows
+        field_names = task.projection.field_names
+        return [{name: each[name] for name in field_names} for each in rows]
+
+    def cache_minute_candles(self, task):
+        if (
+                self.candle_cache is None
+                or task.transaction_code != REQUEST_MINUTE_CANDLE_CODE
+                or task.is_streamed
+                or task.projection is not None
+                or str(task.parameters.get("tick")) != "1"
+            ):
+            return
+        self.candle_cache.add(task.parameters["stock_code"], task.parameters["is_adjusted"], task.transaction_responses)
+
+    def finish_task(self, task, status, result):
+        """Forget a finished task, keeping its result for get-task-result."""
+        task.status = status
+        self.tasks.pop(task.task_id, None)
+        self.admission.settle(task.task_id)
+        if not task.is_streamed:
+            self.result_store.put(task.task_id, task.method, status, result, task.timeline)
+
+    def fail_task(self, task, reason):
+        self.finish_task(task, FAILED, [])
+        if task.sink is not None:
+            task.sink.on_failed(reason)
+        else:
+            self.messenger.send_fail_message(task.task_id, reason, timeline=task.timeline)
+
+    def handle_job_request(self, message):
+        if self.jobs is None:
+            raise ValueError("Download jobs are not enabled, run the server with --job-dir")
+        parameters = message.parameters if isinstance(message.parameters, dict) else {}
+        if message.method == START_DOWNLOAD_JOB:
+            return self.start_download_job(message.task_id, parameters).get_progress()
+        job_id = parameters.get("job_id")
+        if not job_id:
+            raise ValueError("Job parameter 'job_id'(조회할 작업의 task_id) is missed")
+        job = self.jobs.get(job_id)
+        if message.method == CANCEL_DOWNLOAD_JOB:
+            job.cancel()
+        elif message.method != GET_DOWNLOAD_JOB:
+            raise KeyError(f"Method '{message.method}' is not avaliable")
+        return job.get_progress()
+
+    def start_download_job(self, job_id, parameters):
+        method = parameters.get("method")
+        if get_method_type(method) != TRANSACTION:
+            raise ValueError(f"Method '{method}' is not a transaction, it can not be a download job")
+        schema = get_schema(get_transaction_code(method))
+        if schema.multi_code is not None or "stock_code" not in (each.changed_name for each in schema.parameters):
+            raise ValueError(f"Method '{method}' does not request one stock code, it can not be a download job")
+        transaction_parameters = dict(parameters.get("parameters") or {})
+        if get_indicators(transaction_parameters):
+            raise ValueError("Download jobs write the candles as received, without indicators")
+        validate_task_parameters(method, transaction_parameters)
+        schema.get_transaction_parameters({**transaction_parameters, "stock_code": ""})
+        stock_codes = parameters.get("stock_codes")
+        if isinstance(stock_codes, str):
+            stock_codes = stock_codes.replace(",", ";").split(";")
+        if not stock_codes and parameters.get("market") is not None:
+            stock_codes = self.get_lookup_result(GET_STOCK_CODES, {"market": parameters["market"]}).split(";")
+        stock_codes = list(dict.fromkeys(filter(None, (str(each).strip() for each in stock_codes or []))))
+        return self.jobs.start(job_id, method, transaction_parameters, stock_codes, parameters.get("format", CSV))
+
+    def dispatch_jobs(self):
+        # Requested from the Qt event loop, which must not sleep on the request limit
+        if not is_request_available(self.request_timestamps):
+            return
+        for job, stock_code in self.jobs.get_dispatches(limit=1):
+            self.request_job_task(job, stock_code)
+
+    def dispatch_prefetch(self):
+        # Only the request limit left idle by clients and download jobs, without
+        # sleeping on it in the Qt event loop
+        if self.tasks or not is_request_available(self.request_timestamps):
+            return
+        for run, stock_code in self.prefetch.get_dispatches():
+            self.request_job_task(run, stock_code)
+
+    def request_job_task(self, job, stock_code):
+        message = Message(
+            f"{job.job_id}:{stock_code}",
+            job.method,
+            {**job.parameters, "stock_code": stock_code},
+            datetime.now()
+        )
+        try:
+            task = KiwoomTask(message, sink=job)
+            transaction_request = KiwoomTransactionRequest(message.task_id, message.method, message.parameters)
+        except (KeyError, ValueError) as error:
+            job.on_failed(str(error))
+            return
+        task.transaction_code = transaction_request.transaction_code
+        task.projection = get_projection(task.transaction_code, message.parameters)
+        task.transaction_request = transaction_request
+        self.admission.add_backlog(
+            task.task_id, estimate_pages(get_schema(task.transaction_code), message.parameters)
+        )
+        self.tasks.update({task.task_id: task})
+        self.request(transaction_request)
+
+    def handle_admin_request(self, message):
+        task_id = message.task_id
+        if message.method != ADMIN_PROFILE:
+            raise KeyError(f"Method '{message.method}' is not avaliable")
+        if self.watchdog is None:
+            raise ValueError("Watchdog is not enabled, run the server with --watchdog-threshold")
+        parameters = message.parameters if isinstance(message.parameters, dict) else {}
+        try:
+            seconds = float(parameters.get("seconds", 5))
+        except (TypeError, ValueError) as error:
+            raise ValueError("Profile parameter 'seconds' should be a number") from error
+
+        def on_profiled(profile):
+            self.messenger.send_success_message(
+                task_id,
+                {"profile": profile, "event_loop": self.watchdog.to_dict()},
+                ack=False
+            )
+
+        self.watchdog.start_profile(seconds, on_profiled)
+        # Acknowledged now so that other requests are consumed while profiling
+        self.messenger.acknowledge_message(task_id)
+
+    def admit_task(self, task):
+        pages = estimate_pages(get_schema(task.transaction_code), task.parameters)
+        estimate = self.admission.estimate(pages, self.request_timestamps)
+        try:
+            self.admission.admit(self.messenger.get_client(task.task_id), task.task_id, pages)
+        except AdmissionRejected as error:
+            self.messenger.send_rejected_message(task.task_id, error.to_dict())
+            return False
+        if is_estimate_requested(task.parameters):
+            self.messenger.send_accepted_message(task.task_id, estimate.to_dict())
+        return True
+
+    def handle_real_time_request(self, message):
+        task_id = message.task_id
+        method = message.method
+        parameters = message.parameters
+
+        # Screens watch many stocks, not the one of `stock_code`
+        if is_subscribe_screen(method):
+            self.subscribe_screen(task_id, parameters)
+            return
+        if is_unsubscribe_screen(method):
+            self.unsubscribe_screen(task_id)
+            return
+
+        validate_real_time_parameters(parameters)
+
+        stock_code = parameters["stock_code"]
+
+        if is_subscribe(method):
+            self.subscribe_ticks(task_id, stock_code, parameters)
+        elif is_unsubscribe(method):
+            self.unsubscribe_ticks(task_id, stock_code)
+        elif is_subscribe_bar(method):
+            self.subscribe_bars(task_id, stock_code, parameters)
+        elif is_unsubscribe_bar(method):
+            self.unsubscribe_bars(task_id, stock_code)
+        elif is_subscribe_order_book(method):
+            self.subscribe_order_book(task_id, stock_code, parameters)
+        elif is_unsubscribe_order_book(method):
+            self.unsubscribe_order_book(task_id, stock_code)
+        else:
+            self.messenger.send_fail_message(task_id, f"Method '{method}' is not avaliable")
+
+    def subscribe_ticks(self, task_id, stock_code, parameters):
+        catch_up = get_catch_up_parameters(parameters)
+        if catch_up is not None and self.tick_buffer_size <= 0:
+            raise ValueError("Ticks are not buffered, run the server with a positive --tick-buffer-size")
+        self.set_subscriber(task_id, parameters)
+        if not self.has_subscribed(stock_code, task_id):
+            self.register_real_time(stock_code)
+            self.add_subscription(SUBSCRIBE_REALTIME, stock_code, task_id, parameters)
+            if catch_up is None:
+                self.add_listener(stock_code, task_id)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} subscribes {stock_code} successfully",
+            pop_reply_queue=False
+        )
+        if catch_up is not None:
+            # Listened to once the catch-up is sent, so no live tick gets ahead of it
+            self.call_on_loop(self.start_catch_up, task_id, stock_code, catch_up)
+
+    def release_tick_rings(self):
+        if not self.released_rings:
+            self.ring_timer.stop()
+            return
+        now = monotonic()
+        released = [
+            code for code, release_time in self.released_rings.items()
+            if release_time <= now and not self.listeners.get(code)
+        ]
+        if not released:
+            return
+        self.tick_rings = {code: ring for code, ring in self.tick_rings.items() if code not in released}
+        self.released_rings = {code: each for code, each in self.released_rings.items() if code not in released}
+        for stock_code in released:
+            self.unregister_real_time(stock_code)
+
+    def call_on_loop(self, callback, *args):
+        # Real time messages are only sent from the Qt event loop, in order with the live ones
+        self.loop_calls.append((callback, args))
+        self.loop_call_requested.emit()
+
+    def run_loop_calls(self):
+        while self.loop_calls:
+            callback, args = self.loop_calls.popleft()
+            callback(*args)
+
+    def start_catch_up(self, task_id, stock_code, catch_up):
+        if (SUBSCRIBE_REALTIME, stock_code, task_id) not in self.subscriptions:
+            # Unsubscribed in the meantime
+            return
+        if not self.has_subscribed(stock_code, task_id):
+            self.add_listener(stock_code, task_id)
+        self.send_catch_up(task_id, stock_code, catch_up)
+
+    def send_catch_up(self, task_id, stock_code, catch_up):
+        ring = self.tick_rings[stock_code]
+        if catch_up["from_sequence"] is None:
+            ticks = ring.get_latest()
+        else:
+            first_sequence, last_sequence, ticks = ring.since(catch_up["from_sequence"])
+            self.messenger.send_real_time_message(task_id, {
+                "stock_code": stock_code,
+                "catch_up": {
+                    "requested_sequence": catch_up["from_sequence"] + 1,
+                    "first_sequence": first_sequence,
+                    "last_sequence": last_sequence,
+                },
+            })
+        for sequence, real_data_type, real_time_data in ticks:
+            self.messenger.send_real_time_message(
+                task_id,
+                generate_real_time_response(stock_code, real_data_type, real_time_data, sequence)
+            )
+
+    def unsubscribe_ticks(self, task_id, stock_code):
+        is_catching_up = (SUBSCRIBE_REALTIME, stock_code, task_id) in self.subscriptions
+        if not self.has_subscribed(stock_code, task_id) and not is_catching_up:
+            self.messenger.send_fail_message(
+                task_id,
+                f"{task_id} did not subscribed {stock_code} yet"
+            )
+            return
+        if self.has_subscribed(stock_code, task_id):
+            self.remove_listener(stock_code, task_id)
+        self.remove_subscription(SUBSCRIBE_REALTIME, stock_code, task_id)
+        self.messenger.remove_subscriber(task_id)
+        self.unregister_real_time(stock_code)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} unsubscribes {stock_code} successfully"
+        )
+
+    def subscribe_bars(self, task_id, stock_code, parameters):
+        bar_parameters = get_bar_parameters(parameters)
+        self.set_subscriber(task_id, parameters)
+        if task_id not in self.bar_aggregators.get(stock_code, {}):
+            self.register_real_time(stock_code)
+            self.add_bar_aggregator(stock_code, task_id, bar_parameters)
+            self.add_subscription(SUBSCRIBE_BAR, stock_code, task_id, parameters)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} subscribes {bar_parameters['size']} {bar_parameters['bar_type']} bars "
+            f"of {stock_code} successfully",
+            pop_reply_queue=False
+        )
+
+    def add_bar_aggregator(self, stock_code, task_id, bar_parameters):
+        aggregators = self.bar_aggregators.get(stock_code, {})
+        aggregator = BarAggregator(stock_code, bar_parameters["bar_type"], bar_parameters["size"])
+        self.bar_aggregators.update({stock_code: {**aggregators, task_id: aggregator}})
+        self.call_on_loop(self.start_timer, self.bar_timer, BAR_EXPIRE_INTERVAL)
+
+    def unsubscribe_bars(self, task_id, stock_code):
+        aggregators = self.bar_aggregators.get(stock_code, {})
+        if task_id not in aggregators:
+            self.messenger.send_fail_message(
+                task_id,
+                f"{task_id} did not subscribed bars of {stock_code} yet"
+            )
+            return
+        aggregators = {key: value for key, value in aggregators.items() if key != task_id}
+        if aggregators:
+            self.bar_aggregators.update({stock_code: aggregators})
+        else:
+            self.bar_aggregators.pop(stock_code)
+        self.remove_subscription(SUBSCRIBE_BAR, stock_code, task_id)
+        self.messenger.remove_subscriber(task_id)
+        self.unregister_real_time(stock_code)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} unsubscribes bars of {stock_code} successfully"
+        )
+
+    def subscribe_order_book(self, task_id, stock_code, parameters):
+        order_book_parameters = get_order_book_parameters(parameters)
+        self.set_subscriber(task_id, parameters, is_degradable=False)
+        if task_id not in self.order_book_streams.get(stock_code, {}):
+            self.register_real_time(stock_code)
+            self.add_order_book_stream(stock_code, task_id, order_book_parameters)
+            self.add_subscription(SUBSCRIBE_ORDERBOOK, stock_code, task_id, parameters)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} subscribes the order book of {stock_code} successfully",
+            pop_reply_queue=False
+        )
+        self.call_on_loop(self.send_order_book_snapshot, task_id, stock_code)
+
+    def send_order_book_snapshot(self, task_id, stock_code):
+        # The book already received is sent at once, not on its next update
+        stream = self.order_book_streams.get(stock_code, {}).get(task_id)
+        book = self.order_books.get(stock_code)
+        if stream is None or book is None or stream.snapshot_time is not None:
+            return
+        self.messenger.send_real_time_message(task_id, stream.get_snapshot(book))
+
+    def add_order_book_stream(self, stock_code, task_id, order_book_parameters):
+        streams = self.order_book_streams.get(stock_code, {})
+        stream = OrderBookStream(order_book_parameters["snapshot_interval"])
+        self.order_book_streams.update({stock_code: {**streams, task_id: stream}})
+
+    def unsubscribe_order_book(self, task_id, stock_code):
+        streams = self.order_book_streams.get(stock_code, {})
+        if task_id not in streams:
+            self.messenger.send_fail_message(
+                task_id,
+                f"{task_id} did not subscribed the order book of {stock_code} yet"
+            )
+            return
+        streams = {key: value for key, value in streams.items() if key != task_id}
+        if streams:
+            self.order_book_streams.update({stock_code: streams})
+        else:
+            self.order_book_streams.pop(stock_code)
+            self.order_books.pop(stock_code, None)
+        self.remove_subscription(SUBSCRIBE_ORDERBOOK, stock_code, task_id)
+        self.messenger.remove_subscriber(task_id)
+        self.unregister_real_time(stock_code)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} unsubscribes the order book of {stock_code} successfully"
+        )
+
+    def subscribe_screen(self, task_id, parameters):
+        stock_codes = get_screen_codes(parameters)
+        if self.screener is None:
+            self.screener = Screener(get_numpy())
+        predicate = self.screener.get_predicate(task_id, parameters.get("when"))
+        self.set_subscriber(task_id, parameters, is_degradable=False)
+        self.screener.add_screen(task_id, stock_codes, predicate)
+        self.call_on_loop(self.start_timer, self.screen_timer, SCREEN_INTERVAL)
+        self.register_real_time_codes(stock_codes)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} subscribes a screen of {len(stock_codes)} codes successfully",
+            pop_reply_queue=False
+        )
+
+    def unsubscribe_screen(self, task_id):
+        if self.screener is None or task_id not in self.screener.screens:
+            self.messenger.send_fail_message(
+                task_id,
+                f"{task_id} did not subscribed a screen yet"
+            )
+            return
+        stock_codes = self.screener.remove_screen(task_id)
+        self.messenger.remove_subscriber(task_id)
+        for stock_code in stock_codes:
+            self.unregister_real_time(stock_code)
+        self.messenger.send_success_message(
+            task_id,
+            f"{task_id} unsubscribes a screen of {len(stock_codes)} codes successfully"
+        )
+
+    def evaluate_screens(self):
+        if self.screener is None or not self.screener.screens:
+            self.screen_timer.stop()
+            return
+        for task_id, event in self.screener.evaluate():
+            self.messenger.send_real_time_message(task_id, event)
+
+    def expire_bars(self):
+        if not self.bar_aggregators:
+            self.bar_timer.stop()
+            return
+        # By the time of the feed, not of this PC, so replayed and skewed feeds close the same bars
+        if self.feed_timestamp is None:
+            return
+        timestamp = get_expiry_timestamp(self.feed_timestamp, BAR_EXPIRE_GRACE)
+        for aggregators in list(self.bar_aggregators.values()):
+            for task_id, aggregator in aggregators.items():
+                bar = aggregator.expire(timestamp)
+                if bar is not None:
+                    self.messenger.send_real_time_message(task_id, bar)
 
     def get_task(self, task_id):
         return self.tasks[task_id]
@@ -183,7 +899,22 @@ class KiwoomModule(QAxWidget):
     def on_connect(self, error_code):
         if error_code == CONNECTION_SUCCEED:
             print("Connection Success")
+            self.mark_startup(LOGGED_IN)
+            # Restored before consuming so requests about them find them
+            if self.snapshot is not None and self.snapshot.subscriptions:
+                self.restore_subscriptions(self.snapshot.subscriptions)
+            if self.pinned_stock_codes:
+                self.pin_stock_codes(self.pinned_stock_codes)
+            if self.jobs is not None:
+                # Running jobs continue from their checkpoint
+                self.jobs.resume()
+                self.job_timer.start(JOB_DISPATCH_INTERVAL)
+            if self.prefetch is not None:
+                self.prefetch_timer.start(PREFETCH_DISPATCH_INTERVAL)
+            self.mark_startup(RESTORED)
             self.start_consuming()
+            if self.replayer is not None:
+                self.replayer.start(self.publish_real_data)
         else:
             print("Connection Failed")
 
@@ -205,29 +936,95 @@ class KiwoomModule(QAxWidget):
             *deprecated
         ):
         # pylint: disable=unused-argument
-        transaction_data = self.get_transaction_data(transaction_code, task_id)
-        transaction_response = get_transaction_response(transaction_code, transaction_data)
         current_task = self.get_task(task_id)
-        current_task.transaction_responses.extend(transaction_response)
-        if (
+        current_task.mark(DATA_RECEIVED)
+        self.admission.received(task_id)
+        transaction_data = self.get_transaction_data(transaction_code, task_id)
+        transaction_response = get_transaction_response(transaction_code, transaction_data, current_task.projection)
+        current_task.add_page(transaction_response)
+        transaction_request = current_task.transaction_request
+        if transaction_request.has_next_chunk:
+            # Each chunk of a multi code request is a separate CommKwRqData call
+            self.send_page(current_task)
+            transaction_request.next_chunk()
+            self.request(transaction_request)
+        elif (
                 not current_task.has_result
                 or current_task.is_completed
+                or current_task.is_cancelled
                 or is_last_transaction_data(has_next)
             ):
-            self.messenger.send_success_message(task_id, current_task.filtered_responses)
+            try:
+                result = current_task.get_result()
+            except (KeyError, ValueError) as error:
+                # e.g. an empty price, the indicators can not be computed from the rows
+                self.fail_task(current_task, f"Indicators are not computed: {error}")
+                return
+            self.cache_minute_candles(current_task)
+            self.finish_task(current_task, COMPLETED, result)
+            if current_task.sink is not None:
+                current_task.sink.on_completed(result)
+            else:
+                self.messenger.send_success_message(task_id, result, timeline=current_task.timeline)
         else:
+            self.send_page(current_task)
             current_task.transaction_request.continuous = KIWOOM_CONTINUE_REQUEST
             self.request(current_task.transaction_request)
 
+    def send_page(self, task):
+        if task.sink is not None:
+            task.sink.on_page(task.take_page())
+        elif task.is_streamed:
+            self.messenger.send_partial_message(task.task_id, task.take_page())
+
     def on_receive_real_data(self, stock_code, real_data_type, real_time_data):
-        # pylint: disable=unused-argument
+        if self.recorder is not None:
+            self.recorder.record(stock_code, real_data_type, real_time_data)
+        if self.replayer is not None:
+            # Subscribers are served from the recording while replaying
+            return
+        self.publish_real_data(stock_code, real_data_type, real_time_data)
+
+    def publish_real_data(self, stock_code, real_data_type, real_time_data):
+        if self.bar_aggregators and real_data_type in (STOCK_TRADE, STOCK_OFFER):
+            timestamp = get_feed_timestamp(real_time_data)
+            if timestamp is not None and (self.feed_timestamp is None or timestamp > self.feed_timestamp):
+                self.feed_timestamp = timestamp
         listeners = self.listeners.get(stock_code)
-        if not listeners:
+        ring = self.tick_rings.get(stock_code)
+        sequence = ring.append(real_data_type, real_time_data) if ring is not None else None
+        if listeners:
+            real_time_response = generate_real_time_response(stock_code, real_data_type, real_time_data, sequence)
+            for listener in listeners:
+                self.messenger.send_real_time_message(listener, real_time_response)
+
+        aggregators = self.bar_aggregators.get(stock_code)
+        streams = self.order_book_streams.get(stock_code) if real_data_type == STOCK_OFFER else None
+        is_screened = self.screener is not None and self.screener.is_screened(stock_code)
+        if self.quote_board is None and not aggregators and not streams and not is_screened:
             return
 
-        real_time_response = generate_real_time_response(stock_code, real_data_type, real_time_data)
-        for listener in listeners:
-            self.messenger.send_success_message(listener, real_time_response, False, False)
+        fields = real_time_data.split("\t")
+        if self.quote_board is not None:
+            self.quote_board.update(stock_code, real_data_type, fields)
+        if aggregators and real_data_type == STOCK_TRADE:
+            for task_id, aggregator in aggregators.items():
+                bar = aggregator.update_real_time_data(fields)
+                if bar is not None:
+                    self.messenger.send_real_time_message(task_id, bar)
+        if streams:
+            self.publish_order_book(stock_code, streams, fields)
+        if is_screened:
+            self.screener.update(stock_code, real_data_type, fields)
+
+    def publish_order_book(self, stock_code, streams, fields):
+        book = self.order_books.get(stock_code)
+        if book is None:
+            book = self.order_books[stock_code] = OrderBook(stock_code)
+        if not book.update(fields):
+            return
+        for task_id, stream in streams.items():
+            self.messenger.send_real_time_message(task_id, stream.get_message(book))
 
     def connect(self):
         self.dynamicCall("CommConnect()")
@@ -240,22 +1037,47 @@ class KiwoomModule(QAxWidget):
             self.set_transaction_parameter(key, value)
 
     def request(self, transaction_request):
+        current_task = self.get_task(transaction_request.transaction_id)
+        current_task.mark(WAITING)
         wait_until_request_available(self.request_timestamps)
         self.append_request_timestamps(datetime.now())
         self.set_transaction_parameters(transaction_request.transaction_parameters)
-        return_code = self.dynamicCall(
-            "CommRqData(QString, QString, int, QString)",
-            transaction_request.transaction_id,
-            transaction_request.transaction_code,
-            transaction_request.continuous,
-            transaction_request.screen_number,
-        )
-        current_task = self.get_task(transaction_request.transaction_id)
+        current_task.mark(DISPATCHED)
+        self.admission.dispatched(transaction_request.transaction_id)
+        if transaction_request.is_multi_code:
+            return_code = self.request_multi_code(transaction_request)
+        else:
+            return_code = self.dynamicCall(
+                "CommRqData(QString, QString, int, QString)",
+                transaction_request.transaction_id,
+                transaction_request.transaction_code,
+                transaction_request.continuous,
+                transaction_request.screen_number,
+            )
         if return_code == REQUEST_SUCCEED:
             current_task.status = REQUESTED
         else:
-            current_task.status = FAILED
-            self.messenger.send_fail_message(transaction_request.transaction_id, [])
+            self.finish_task(current_task, FAILED, [])
+            if current_task.sink is not None:
+                current_task.sink.on_failed(f"CommRqData returned {return_code}")
+                return
+            self.messenger.send_fail_message(
+                transaction_request.transaction_id,
+                [],
+                timeline=current_task.timeline
+            )
+
+    def request_multi_code(self, transaction_request):
+        stock_codes = transaction_request.stock_codes
+        return self.dynamicCall(
+            "CommKwRqData(QString, bool, int, int, QString, QString)",
+            ";".join(stock_codes),
+            False,
+            len(stock_codes),
+            transaction_request.type_flag,
+            transaction_request.transaction_id,
+            transaction_request.screen_number,
+        )
 
     def get_transaction_data(self, transcation_code, task_id):
         return self.dynamicCall("GetCommDataEx(QString, QString)", transcation_code, task_id)
@@ -274,6 +1096,18 @@ class KiwoomModule(QAxWidget):
 
     def get_lookup_result(self, method, parameters):
         lookup_paramters = get_lookup_parameters(method, parameters)
+        # Master data does not change until the next login
+        key = ";".join(map(str, lookup_paramters))
+        results = self.master_data[method]
+        if key in results:
+            return results[key]
+        result = self.lookup(method, lookup_paramters)
+        if result:
+            results[key] = result
+            self.is_snapshot_changed = True
+        return result
+
+    def lookup(self, method, lookup_paramters):
         if method == GET_STOCK_NAME:
             return self.get_stock_name(lookup_paramters)
         if method == GET_STOCK_CODES:
@@ -3,6 +3,8 @@ from threading import Thread
 
 import pika
 
+from .compression import DEFAULT_THRESHOLD, compress_body, decompress_body
+
 
 def get_connection(broker_url):
     return pika.BlockingConnection(pika.URLParameters(broker_url))
@@ -12,17 +14,40 @@ def get_channel(connection):
     return connection.channel()
 
 
-def consume(broker_url, queue, callback):
+def consume(broker_url, queue, callback, on_consuming=None):
     connection = get_connection(broker_url)
     channel = get_channel(connection)
     channel.basic_qos(prefetch_count=1)
     generate_queue(channel, queue)
     channel.basic_consume(queue=queue, on_message_callback=callback, auto_ack=False)
+    if on_consuming is not None:
+        on_consuming()
     channel.start_consuming()
 
 
-def generate_queue(channel, queue):
-    channel.queue_declare(queue=queue)
+def generate_queue(channel, queue, arguments=None):
+    channel.queue_declare(queue=queue, arguments=arguments)
+
+
+def get_queue_arguments(max_length=None, message_ttl=None, overflow=None):
+    """Arguments bounding a queue, to declare a reply queue the same way as the server does."""
+    arguments = {}
+    if max_length is not None:
+        arguments["x-max-length"] = max_length
+    if message_ttl is not None:
+        arguments["x-message-ttl"] = message_ttl
+    if overflow is not None:
+        arguments["x-overflow"] = overflow
+    return arguments or None
+
+
+def get_reply_properties(correlation_id):
+    """Properties of a reply, correlated to its request by the task id."""
+    return pika.BasicProperties(correlation_id=str(correlation_id))
+
+
+def get_queue_depth(channel, queue):
+    return channel.queue_declare(queue=queue, passive=True).method.message_count
 
 
 def publish(
@@ -33,8 +58,11 @@ def publish(
         exchange="",
         routing_key="",
         channel=None,
-        is_queue_exist=True
+        is_queue_exist=True,
+        codec=None,
+        threshold=DEFAULT_THRESHOLD
     ):
+    """Publish `body`, compressed with `codec` from `threshold` bytes, and return its content encoding."""
 
     if not channel:
         connection = get_connection(broker_url)
@@ -45,6 +73,13 @@ def publish(
 
     routing_key = routing_key if routing_key != "" else queue
 
+    content_encoding = None
+    if codec is not None:
+        body, content_encoding = compress_body(body, codec, threshold)
+    if content_encoding is not None:
+        properties = properties or pika.BasicProperties()
+        properties.content_encoding = content_encoding
+
     channel.basic_publish(
         exchange=exchange,
         routing_key=routing_key,
@@ -55,9 +90,11 @@ def publish(
     if not channel:
         connection.close()
 
+    return content_encoding
+
 
-def get_consume_thread(broker_url, queue, callback):
-    return Thread(target=consume, args=(broker_url, queue, callback))
+def get_consume_thread(broker_url, queue, callback, on_consuming=None):
+    return Thread(target=consume, args=(broker_url, queue, callback, on_consuming))
 
 
 def serialize(message):
@@ -66,3 +103,8 @@ def serialize(message):
 
 def deserialize(message):
     return json.loads(message)
+
+
+def decode_body(body, properties=None):
+    """Body of a consumed message, decompressed by its content encoding."""
+    return decompress_body(body, getattr(properties, "content_encoding", None))
@@ -0,0 +1,285 @@
+"""Prefetch of declared histories in idle off-hours time, served locally until the next opening."""
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from threading import Lock
+from time import monotonic
+
+from .kiwoom.method import get_method_type, TRANSACTION
+from .kiwoom.schema import get_schema, get_requested_fields
+from .kiwoom.indicator import get_indicators
+from .kiwoom.task import validate_task_parameters
+from .kiwoom.transaction import get_transaction_code
+
+
+IDLE_SECONDS = 30.0
+PREFETCH_DISPATCH_INTERVAL = 1000  # ms
+DEFAULT_WINDOW = ("16:00", "08:00")
+SESSION_OPENING = time(9, 0)
+SESSION_CLOSING = time(15, 30)
+RANGE_PARAMETERS = ("from", "to")
+TIME_FORMAT = "%H:%M"
+DATE_FORMAT = "%Y%m%d"
+
+
+def parse_window(window):
+    try:
+        start, end = window
+        return (
+            datetime.strptime(start, TIME_FORMAT).time(),
+            datetime.strptime(end, TIME_FORMAT).time(),
+        )
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Prefetch window {window} should be [start, end] as HH:MM, ex: [\"16:00\", \"08:00\"]") from error
+
+
+def get_window_day(now, window):
+    """Day the window containing `now` started, None out of the window."""
+    start, end = window
+    current = now.time()
+    if start == end:
+        return now.date()
+    if start < end:
+        return now.date() if start <= current < end else None
+    # Overnight, a window started yesterday evening still runs before `end`
+    if current >= start:
+        return now.date()
+    if current < end:
+        return now.date() - timedelta(days=1)
+    return None
+
+
+def is_market_open(now):
+    return now.weekday() < 5 and SESSION_OPENING <= now.time() < SESSION_CLOSING
+
+
+def get_next_opening(now):
+    opening = datetime.combine(now.date(), SESSION_OPENING)
+    if now.weekday() < 5 and now < opening:
+        return opening
+    opening += timedelta(days=1)
+    while opening.weekday() >= 5:
+        opening += timedelta(days=1)
+    return opening
+
+
+def get_inputs(transaction_code, parameters):
+    """Transaction inputs of `parameters` but the requested range."""
+    return tuple(
+        str(parameters.get(each.changed_name))
+        for each in get_schema(transaction_code).parameters
+        if each.changed_name not in RANGE_PARAMETERS
+    )
+
+
+@dataclass
+class PrefetchedResult:
+    rows: list
+    start: str
+    end: str
+    valid_until: datetime
+
+    def covers(self, parameters, now):
+        return now < self.valid_until and self.start <= parameters["from"] and parameters["to"] <= self.end
+
+
+class PrefetchStore:
+
+    def __init__(self):
+        self.results = {}  # {(transaction_code, inputs): PrefetchedResult,}
+        # Results are stored from the Qt event loop and read from the consumer thread
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.results)
+
+    def put(self, transaction_code, parameters, rows, fetched_at):
+        if is_market_open(fetched_at):
+            # Candles of the session keep changing until the closing
+            return
+        result = PrefetchedResult(rows, parameters["from"], parameters["to"], get_next_opening(fetched_at))
+        with self.lock:
+            self.results[(transaction_code, get_inputs(transaction_code, parameters))] = result
+
+    def get(self, transaction_code, parameters, now):
+        """Prefetched rows covering the range of `parameters`, None if there are none."""
+        key = (transaction_code, get_inputs(transaction_code, parameters))
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None and now >= result.valid_until:
+                self.results.pop(key)
+                return None
+        if result is None or not result.covers(parameters, now):
+            return None
+        return result.rows
+
+
+@dataclass
+class PrefetchJob:
+    name: str
+    method: str
+    stock_codes: list
+    parameters: dict
+    window: tuple
+    days: int = None
+    last_day: object = field(default=None, compare=False)  # the job ran in the window started that day
+
+    def get_parameters(self, day):
+        if self.days is None:
+            return dict(self.parameters)
+        return {**self.parameters, "from": f"{day - timedelta(days=self.days):{DATE_FORMAT}}"}
+
+    @classmethod
+    def from_dict(cls, declared, window=DEFAULT_WINDOW):
+        name = declared.get("name")
+        if not name:
+            raise ValueError("Prefetch job should have a 'name'")
+        method = declared.get("method")
+        if get_method_type(method) != TRANSACTION:
+            raise ValueError(f"Prefetch job '{name}': method '{method}' is not a transaction")
+        schema = get_schema(get_transaction_code(method))
+        if (
+                schema.multi_code is not None
+                or schema.filter_key is None
+                or "stock_code" not in (each.changed_name for each in schema.parameters)
+            ):
+            raise ValueError(f"Prefetch job '{name}': method '{method}' is not a history of one stock code")
+        stock_codes = declared.get("stock_codes")
+        if not stock_codes or not isinstance(stock_codes, list):
+            raise ValueError(f"Prefetch job '{name}' should have a list of 'stock_codes'")
+        days = declared.get("days")
+        if days is not None and (not isinstance(days, int) or days <= 0):
+            raise ValueError(f"Prefetch job '{name}': 'days' should be a positive integer")
+        parameters = dict(declared.get("parameters") or {})
+        if get_requested_fields(parameters) is not None or get_indicators(parameters):
+            raise ValueError(f"Prefetch job '{name}' keeps the rows as received, without 'fields' or 'indicators'")
+        if days is not None:
+            parameters.pop("from", None)
+        sample = {**parameters, "from": "19000101"} if days is not None else parameters
+        validate_task_parameters(method, sample)
+        schema.get_transaction_parameters({**sample, "stock_code": ""})
+        return cls(
+            name,
+            method,
+            [str(each) for each in stock_codes],
+            parameters,
+            parse_window(declared.get("window", window)),
+            days,
+        )
+
+
+class PrefetchRun:
+    """Codes of a job requested in one window, a sink of their tasks."""
+
+    def __init__(self, scheduler, job, day):
+        self.scheduler = scheduler
+        self.job = job
+        self.job_id = f"prefetch-{job.name}"
+        self.method = job.method
+        self.transaction_code = get_transaction_code(job.method)
+        self.parameters = job.get_parameters(day)
+        self.pending = list(job.stock_codes)
+        self.fetched = []
+        self.failed = {}  # {stock_code: reason,}
+        self.current_code = None
+        self.rows = []
+
+    @property
+    def is_cancelled(self):
+        # Yields to clients after the page in flight
+        return self.scheduler.is_yielding()
+
+    def get_next_code(self):
+        if self.current_code is None and self.pending:
+            self.current_code = self.pending.pop(0)
+            self.rows = []
+            return self.current_code
+        return None
+
+    def on_page(self, rows):
+        if self.current_code is not None:
+            self.rows.extend(rows)
+
+    def on_completed(self, rows):
+        self.on_page(rows)
+        if self.current_code is None:
+            return
+        if self.is_cancelled:
+            # Requested again from the first page once the clients are idle
+            self.pending.insert(0, self.current_code)
+        else:
+            parameters = {**self.parameters, "stock_code": self.current_code}
+            self.scheduler.store.put(self.transaction_code, parameters, self.rows, self.scheduler.clock())
+            self.fetched.append(self.current_code)
+        self.current_code = None
+        self.rows = []
+
+    def on_failed(self, reason):
+        if self.current_code is None:
+            return
+        self.failed[self.current_code] = reason
+        self.current_code = None
+        self.rows = []
+
+
+class PrefetchScheduler:
+
+    def __init__(self, jobs, idle_seconds=IDLE_SECONDS, clock=datetime.now):
+        self.jobs = jobs
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.store = PrefetchStore()
+        self.run = None
+        self.last_client_time = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as file:
+            schedule = json.load(file)
+        window = schedule.get("window", DEFAULT_WINDOW)
+        jobs = [PrefetchJob.from_dict(each, window) for each in schedule.get("jobs", [])]
+        names = [each.name for each in jobs]
+        if len(set(names)) != len(names):
+            raise ValueError("Prefetch jobs should have different names")
+        return cls(jobs, float(schedule.get("idle_seconds", IDLE_SECONDS)))
+
+    def on_client_request(self):
+        self.last_client_time = monotonic()
+
+    def is_yielding(self):
+        return self.last_client_time is not None and monotonic() - self.last_client_time < self.idle_seconds
+
+    def get(self, transaction_code, parameters):
+        return self.store.get(transaction_code, parameters, self.clock())
+
+    def get_dispatches(self):
+        """[(run, stock_code),] to request now, at most one code while the clients are idle."""
+        if self.is_yielding():
+            return []
+        now = self.clock()
+        if self.run is not None:
+            if self.run.current_code is not None:
+                return []
+            if get_window_day(now, self.run.job.window) is None:
+                print(f"Prefetch {self.run.job.name} stopped at the end of its window, {len(self.run.pending)} codes left")
+                self.run = None
+            else:
+                stock_code = self.run.get_next_code()
+                if stock_code is not None:
+                    return [(self.run, stock_code)]
+                self.finish()
+        for job in self.jobs:
+            day = get_window_day(now, job.window)
+            if day is None or job.last_day == day:
+                continue
+            job.last_day = day
+            self.run = PrefetchRun(self, job, day)
+            stock_code = self.run.get_next_code()
+            if stock_code is not None:
+                return [(self.run, stock_code)]
+        return []
+
+    def finish(self):
+        run = self.run
+        print(f"Prefetch {run.job.name} completed, {len(run.fetched)} codes fetched and {len(run.failed)} failed")
+        self.run = None
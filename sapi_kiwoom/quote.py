@@ -0,0 +1,164 @@
+"""Memory-mapped board of the latest quote of each stock, each slot guarded by a seqlock."""
+import mmap
+import struct
+import zlib
+from time import time_ns
+
+from .kiwoom.rt import STOCK_TRADE, STOCK_OFFER, get_real_time_field_index, to_number
+
+
+MAGIC = b"SKQB"
+VERSION = 1
+DEFAULT_CAPACITY = 4096
+
+HEADER = struct.Struct("<4sIII")
+SEQUENCE = struct.Struct("<I")
+# sequence, stock code, then QUOTE_FIELDS, found by open addressing on crc32 of the code
+SLOT = struct.Struct("<I6s2xqqqqqqq")
+SLOT_CODE = struct.Struct("<6s")
+SLOT_FIELDS = struct.Struct("<qqqqqqq")
+CODE_OFFSET = SEQUENCE.size
+FIELDS_OFFSET = SEQUENCE.size + 8
+
+QUOTE_FIELDS = ("timestamp_ns", "price", "ask", "bid", "ask_volume", "bid_volume", "cumulative_volume")
+MAX_READ_RETRIES = 1000
+
+EMPTY_CODE = bytes(6)
+
+TRADE_INDEXES = {
+    "price": get_real_time_field_index(STOCK_TRADE, "closing"),
+    "ask": get_real_time_field_index(STOCK_TRADE, "sell_top_priority_price"),
+    "bid": get_real_time_field_index(STOCK_TRADE, "buy_top_priority_price"),
+    "cumulative_volume": get_real_time_field_index(STOCK_TRADE, "cumulative_volume"),
+}
+OFFER_INDEXES = {
+    "ask": get_real_time_field_index(STOCK_OFFER, "sell_price_1"),
+    "bid": get_real_time_field_index(STOCK_OFFER, "buy_price_1"),
+    "ask_volume": get_real_time_field_index(STOCK_OFFER, "sell_remaining_volume_1"),
+    "bid_volume": get_real_time_field_index(STOCK_OFFER, "buy_remaining_volume_1"),
+}
+REAL_TIME_INDEXES = {STOCK_TRADE: TRADE_INDEXES, STOCK_OFFER: OFFER_INDEXES}
+
+
+class QuoteBoardError(Exception):
+    pass
+
+
+def get_slot_offset(index):
+    return HEADER.size + index * SLOT.size
+
+
+def encode_stock_code(stock_code):
+    return stock_code.encode("ascii")[:6].ljust(6, b" ")
+
+
+def probe(capacity, encoded_code):
+    start = zlib.crc32(encoded_code) % capacity
+    for step in range(capacity):
+        yield (start + step) % capacity
+
+
+class QuoteBoard:
+    """Writer side, owned by the server."""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = get_slot_offset(capacity)
+        with open(path, "wb") as file:
+            file.truncate(size)
+        self.file = open(path, "r+b")  # pylint: disable=consider-using-with
+        self.buffer = mmap.mmap(self.file.fileno(), size)
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, capacity, SLOT.size)
+        self.slots = {}  # {stock_code: slot_offset,}
+        self.values = {}  # {stock_code: [field values in QUOTE_FIELDS order],}
+        self.overflowed = set()  # stock codes not on the board as it is full
+
+    def get_slot(self, stock_code):
+        if stock_code in self.slots:
+            return self.slots[stock_code]
+        encoded_code = encode_stock_code(stock_code)
+        for index in probe(self.capacity, encoded_code):
+            offset = get_slot_offset(index)
+            if SLOT_CODE.unpack_from(self.buffer, offset + CODE_OFFSET)[0] == EMPTY_CODE:
+                SLOT_CODE.pack_into(self.buffer, offset + CODE_OFFSET, encoded_code)
+                self.slots[stock_code] = offset
+                self.values[stock_code] = [0] * len(QUOTE_FIELDS)
+                return offset
+        raise QuoteBoardError(f"Quote board is full ({self.capacity} stocks)")
+
+    def update(self, stock_code, real_data_type, fields):
+        indexes = REAL_TIME_INDEXES.get(real_data_type)
+        if indexes is None:
+            return
+        if stock_code in self.overflowed:
+            return
+        try:
+            offset = self.get_slot(stock_code)
+        except QuoteBoardError as error:
+            # Updated from the Qt event loop, the other subscribers of the tick still get it
+            if not self.overflowed:
+                print(f"{error}, the stocks past it are not kept on the board")
+            self.overflowed.add(stock_code)
+            return
+        values = self.values[stock_code]
+        values[0] = time_ns()
+        for position, name in enumerate(QUOTE_FIELDS[1:], 1):
+            index = indexes.get(name)
+            if index is not None and index < len(fields):
+                values[position] = to_number(fields[index])
+
+        # Odd while the slot is written, readers retry until the same even sequence is around their copy
+        sequence = SEQUENCE.unpack_from(self.buffer, offset)[0]
+        SEQUENCE.pack_into(self.buffer, offset, (sequence + 1) & 0xFFFFFFFF)
+        SLOT_FIELDS.pack_into(self.buffer, offset + FIELDS_OFFSET, *values)
+        SEQUENCE.pack_into(self.buffer, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+
+class QuoteBoardReader:
+    """Reader side, usable from any local process."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")  # pylint: disable=consider-using-with
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.capacity, slot_size = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+            raise QuoteBoardError(f"'{path}' is not a quote board")
+        self.slots = {}
+
+    def find_slot(self, stock_code):
+        if stock_code in self.slots:
+            return self.slots[stock_code]
+        encoded_code = encode_stock_code(stock_code)
+        for index in probe(self.capacity, encoded_code):
+            offset = get_slot_offset(index)
+            code = SLOT_CODE.unpack_from(self.buffer, offset + CODE_OFFSET)[0]
+            if code == EMPTY_CODE:
+                return None
+            if code == encoded_code:
+                self.slots[stock_code] = offset
+                return offset
+        return None
+
+    def get(self, stock_code):
+        offset = self.find_slot(stock_code)
+        if offset is None:
+            return None
+        for _ in range(MAX_READ_RETRIES):
+            before = SEQUENCE.unpack_from(self.buffer, offset)[0]
+            if before & 1:
+                continue
+            values = SLOT_FIELDS.unpack_from(self.buffer, offset + FIELDS_OFFSET)
+            if SEQUENCE.unpack_from(self.buffer, offset)[0] == before:
+                if before == 0:
+                    return None
+                return dict(zip(QUOTE_FIELDS, values), stock_code=stock_code, sequence=before)
+        raise QuoteBoardError(f"Could not read a consistent quote of {stock_code}")
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
@@ -0,0 +1,309 @@
+"""Append-only binary recording of the real time feed, one tick log and index per day."""
+import os
+import struct
+from datetime import datetime
+from time import time_ns, monotonic
+
+
+MAGIC = b"SKTK"
+VERSION = 1
+FILE_HEADER = MAGIC + bytes([VERSION])
+
+# timestamp_ns, stock code, REAL_TYPES index, data length, then the data,
+# a custom real type index is followed by the length and name of the type
+RECORD_HEADER = struct.Struct("<q6sBI")
+# stock code, timestamp_ns, offset of the record in the tick log
+INDEX_ENTRY = struct.Struct("<6sqQ")
+INDEX_INTERVAL_NS = 1_000_000_000
+
+TICK_EXTENSION = ".ticks"
+INDEX_EXTENSION = ".idx"
+
+CUSTOM_REAL_TYPE = 0
+REAL_TYPES = [
+    None,
+    "주식체결",
+    "주식호가잔량",
+    "주식시세",
+    "주식우선호가",
+    "주식예상체결",
+    "주식시간외호가",
+    "주식당일거래원",
+    "ETF NAV",
+    "업종지수",
+    "업종등락",
+    "장시작시간",
+]
+REAL_TYPE_IDS = {name: index for index, name in enumerate(REAL_TYPES) if name}
+
+REPLAY_BATCH_SIZE = 1000
+
+
+class TickLogError(Exception):
+    pass
+
+
+def get_day(timestamp_ns):
+    return f"{datetime.fromtimestamp(timestamp_ns / 1e9):%Y%m%d}"
+
+
+def get_tick_path(directory, day):
+    return os.path.join(directory, f"{day}{TICK_EXTENSION}")
+
+
+def get_index_path(directory, day):
+    return os.path.join(directory, f"{day}{INDEX_EXTENSION}")
+
+
+def encode_stock_code(stock_code):
+    return stock_code.encode("ascii")[:6].ljust(6, b" ")
+
+
+def decode_stock_code(encoded):
+    return encoded.decode("ascii").rstrip()
+
+
+class TickRecorder:
+
+    def __init__(self, directory, flush_every=1000):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.day = None
+        self.file = None
+        self.index_file = None
+        self.last_indexed = {}  # {stock_code: timestamp_ns,}
+        self.unflushed = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, stock_code, real_type, data, timestamp_ns=None):
+        if timestamp_ns is None:
+            timestamp_ns = time_ns()
+        day = get_day(timestamp_ns)
+        if day != self.day:
+            self.rotate(day)
+
+        offset = self.file.tell()
+        encoded_code = encode_stock_code(stock_code)
+        encoded_data = data.encode("utf-8")
+        real_type_id = REAL_TYPE_IDS.get(real_type, CUSTOM_REAL_TYPE)
+        self.file.write(RECORD_HEADER.pack(timestamp_ns, encoded_code, real_type_id, len(encoded_data)))
+        if real_type_id == CUSTOM_REAL_TYPE:
+            encoded_type = real_type.encode("utf-8")[:255]
+            self.file.write(bytes([len(encoded_type)]) + encoded_type)
+        self.file.write(encoded_data)
+
+        last_indexed = self.last_indexed.get(stock_code)
+        if last_indexed is None or timestamp_ns - last_indexed >= INDEX_INTERVAL_NS:
+            self.index_file.write(INDEX_ENTRY.pack(encoded_code, timestamp_ns, offset))
+            self.last_indexed[stock_code] = timestamp_ns
+
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+
+    def rotate(self, day):
+        self.close()
+        self.day = day
+        tick_path = get_tick_path(self.directory, day)
+        # A crash may leave a record half written, new ones must not follow it
+        is_new = not os.path.exists(tick_path) or truncate_incomplete_record(self.directory, day) == 0
+        self.file = open(tick_path, "ab")  # pylint: disable=consider-using-with
+        self.index_file = open(get_index_path(self.directory, day), "ab")  # pylint: disable=consider-using-with
+        if is_new:
+            self.file.write(FILE_HEADER)
+        self.last_indexed = {}
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+            self.index_file.flush()
+        self.unflushed = 0
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.index_file.close()
+        self.file = None
+        self.index_file = None
+
+
+def get_complete_length(file):
+    """Offset after the last complete record of an open tick log."""
+    end = file.seek(len(FILE_HEADER))
+    size = os.fstat(file.fileno()).st_size
+    while True:
+        header = file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return end
+        _, _, real_type_id, data_length = RECORD_HEADER.unpack(header)
+        if real_type_id == CUSTOM_REAL_TYPE:
+            type_length = file.read(1)
+            if not type_length:
+                return end
+            file.seek(type_length[0], os.SEEK_CUR)
+        if file.seek(data_length, os.SEEK_CUR) > size:
+            return end
+        end = file.tell()
+
+
+def truncate_incomplete_record(directory, day):
+    """Cut both logs of a day back to their last complete record, the length of the tick log."""
+    tick_path = get_tick_path(directory, day)
+    with open(tick_path, "r+b") as file:
+        header = file.read(len(FILE_HEADER))
+        if header != FILE_HEADER:
+            if not FILE_HEADER.startswith(header):
+                raise TickLogError(f"'{tick_path}' is not a tick log")
+            # Not even the header was written
+            end = 0
+        else:
+            end = get_complete_length(file)
+        if end < os.path.getsize(tick_path):
+            print(f"Incomplete record at the end of '{tick_path}' is truncated")
+            file.truncate(end)
+
+    index_path = get_index_path(directory, day)
+    if not os.path.exists(index_path):
+        return end
+    with open(index_path, "r+b") as file:
+        content = file.read()
+        usable = len(content) - len(content) % INDEX_ENTRY.size
+        # Entries are appended in offset order, the ones past the kept records go
+        for position in range(0, usable, INDEX_ENTRY.size):
+            if INDEX_ENTRY.unpack_from(content, position)[2] >= end:
+                usable = position
+                break
+        if usable < len(content):
+            file.truncate(usable)
+    return end
+
+
+def read_index(directory, day):
+    index = {}  # {stock_code: [(timestamp_ns, offset),],}
+    path = get_index_path(directory, day)
+    if not os.path.exists(path):
+        return index
+    with open(path, "rb") as file:
+        content = file.read()
+    usable = len(content) - len(content) % INDEX_ENTRY.size
+    for encoded_code, timestamp_ns, offset in INDEX_ENTRY.iter_unpack(content[:usable]):
+        index.setdefault(decode_stock_code(encoded_code), []).append((timestamp_ns, offset))
+    return index
+
+
+def get_start_offset(index, start_ns, stock_codes=None):
+    # Records are appended in arrival order, so the latest indexed record at or
+    # before start of any (selected) code is a safe place to start scanning
+    offset = len(FILE_HEADER)
+    for stock_code, entries in index.items():
+        if stock_codes and stock_code not in stock_codes:
+            continue
+        for timestamp_ns, entry_offset in entries:
+            if timestamp_ns > start_ns:
+                break
+            offset = max(offset, entry_offset)
+    return offset
+
+
+def read_ticks(directory, day, stock_codes=None, start_ns=None, end_ns=None):
+    """Iterator of (timestamp_ns, stock_code, real_type, data) of a recorded day, the file checked at once."""
+    stock_codes = set(stock_codes) if stock_codes else None
+    path = get_tick_path(directory, day)
+    try:
+        file = open(path, "rb")  # pylint: disable=consider-using-with
+    except OSError as error:
+        raise TickLogError(f"No tick log of {day} in '{directory}': {error}") from error
+    try:
+        if file.read(len(FILE_HEADER)) != FILE_HEADER:
+            raise TickLogError(f"'{path}' is not a tick log")
+        if start_ns is not None:
+            file.seek(get_start_offset(read_index(directory, day), start_ns, stock_codes))
+    except BaseException:
+        file.close()
+        raise
+    return iterate_ticks(file, stock_codes, start_ns, end_ns)
+
+
+def iterate_ticks(file, stock_codes, start_ns, end_ns):
+    with file:
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # A truncated tail is what an interrupted append leaves behind
+                return
+            timestamp_ns, encoded_code, real_type_id, data_length = RECORD_HEADER.unpack(header)
+            if real_type_id == CUSTOM_REAL_TYPE:
+                type_length = file.read(1)
+                if not type_length:
+                    return
+                real_type = file.read(type_length[0]).decode("utf-8")
+            else:
+                real_type = REAL_TYPES[real_type_id]
+
+            if end_ns is not None and timestamp_ns > end_ns:
+                return
+            stock_code = decode_stock_code(encoded_code)
+            if (
+                    (stock_codes and stock_code not in stock_codes)
+                    or (start_ns is not None and timestamp_ns < start_ns)
+                ):
+                file.seek(data_length, os.SEEK_CUR)
+                continue
+
+            data = file.read(data_length)
+            if len(data) < data_length:
+                return
+            yield timestamp_ns, stock_code, real_type, data.decode("utf-8")
+
+
+class TickReplayer:
+    """Serves a recorded day through `callback` on the Qt event loop at `speed` times its pace, 0 at once."""
+
+    def __init__(self, directory, day, speed=1.0, stock_codes=None, start_ns=None):
+        # pylint: disable=too-many-arguments
+        self.ticks = read_ticks(directory, day, stock_codes, start_ns)
+        self.speed = speed
+        self.callback = None
+        self.timer = None
+        self.pending = None
+        self.first_timestamp_ns = None
+        self.started = None
+        self.replayed = 0
+
+    def start(self, callback):
+        # pylint: disable=import-outside-toplevel
+        from PyQt5.QtCore import QTimer
+
+        self.callback = callback
+        self.started = monotonic()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.replay_due)
+        self.timer.start(0 if self.speed == 0 else 1)
+
+    def is_due(self, timestamp_ns):
+        if self.speed == 0:
+            return True
+        if self.first_timestamp_ns is None:
+            self.first_timestamp_ns = timestamp_ns
+        recorded_elapsed = (timestamp_ns - self.first_timestamp_ns) / 1e9
+        return recorded_elapsed / self.speed <= monotonic() - self.started
+
+    def replay_due(self):
+        for _ in range(REPLAY_BATCH_SIZE):
+            if self.pending is None:
+                self.pending = next(self.ticks, None)
+                if self.pending is None:
+                    self.stop()
+                    print(f"Replay finished: {self.replayed} ticks")
+                    return
+            timestamp_ns, stock_code, real_type, data = self.pending
+            if not self.is_due(timestamp_ns):
+                return
+            self.pending = None
+            self.replayed += 1
+            self.callback(stock_code, real_type, data)
+
+    def stop(self):
+        if self.timer:
+            self.timer.stop()
@@ -0,0 +1,89 @@
+"""Store of finished transaction results, re-fetched by task id with get-task-result."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Optional
+
+from .timing import Timeline
+
+
+RESULT_TTL = 3600  # seconds
+MAX_RESULT_ROWS = 1_000_000
+
+
+@dataclass
+class StoredResult:
+    task_id: str
+    method: str
+    status: str
+    result: object
+    rows: int
+    response_time: datetime
+    stored_at: float
+    timeline: Optional[Timeline] = None
+
+    def to_dict(self):
+        stored = {
+            "task_id": self.task_id,
+            "method": self.method,
+            "status": self.status,
+            "result": self.result,
+            "response_time": self.response_time,
+        }
+        if self.timeline is not None:
+            # Stages after the reply, `published`, are only seen here
+            stored["timing"] = self.timeline.to_dict()
+        return stored
+
+
+def count_rows(result):
+    return len(result) if isinstance(result, list) else 1
+
+
+class ResultStore:
+
+    def __init__(self, ttl=RESULT_TTL, max_rows=MAX_RESULT_ROWS):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.results = OrderedDict()  # {task_id: StoredResult,}, oldest first
+        self.rows = 0
+        # Results are stored from the Qt event loop and read from the consumer thread
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.results)
+
+    def put(self, task_id, method, status, result, timeline=None):
+        # pylint: disable=too-many-arguments
+        stored = StoredResult(
+            task_id, method, status, result, count_rows(result), datetime.now(), monotonic(), timeline
+        )
+        if stored.rows > self.max_rows:
+            print(f"Result of {task_id} is not stored, {stored.rows} rows exceed {self.max_rows}")
+            return
+        with self.lock:
+            self.remove(task_id)
+            self.results[task_id] = stored
+            self.rows += stored.rows
+            self.expire(stored.stored_at)
+            while self.rows > self.max_rows:
+                self.remove(next(iter(self.results)))
+
+    def get(self, task_id):
+        with self.lock:
+            self.expire(monotonic())
+            return self.results.get(task_id)
+
+    def remove(self, task_id):
+        stored = self.results.pop(task_id, None)
+        if stored is not None:
+            self.rows -= stored.rows
+
+    def expire(self, now):
+        while self.results:
+            oldest = next(iter(self.results.values()))
+            if now - oldest.stored_at < self.ttl:
+                break
+            self.remove(oldest.task_id)
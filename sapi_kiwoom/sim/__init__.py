@@ -0,0 +1,54 @@
+"""Offline stand-ins for Kiwoom OpenAPI, PyQt5 and RabbitMQ, installed with `install()`."""
+import sys
+from types import ModuleType
+
+from . import broker as _broker
+from . import qt as _qt
+from .control import CONTROL_NAME, SimulatedKiwoomControl, SimulationConfig
+
+
+def _get_module(name, **attributes):
+    module = ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install(config=None):
+    config = config or SimulationConfig()
+    _qt.CONTROLS[CONTROL_NAME] = lambda widget: SimulatedKiwoomControl(widget, config)
+
+    qt_attributes = {
+        "QApplication": _qt.QApplication,
+        "QTimer": _qt.QTimer,
+        "QAxWidget": _qt.QAxWidget,
+        "pyqtSignal": _qt.pyqtSignal,
+    }
+    qt = _get_module("PyQt5.Qt", **qt_attributes)
+    qt_core = _get_module("PyQt5.QtCore", **qt_attributes)
+    ax_container = _get_module("PyQt5.QAxContainer", **qt_attributes)
+    pyqt = _get_module("PyQt5", Qt=qt, QtCore=qt_core, QAxContainer=ax_container)
+    exceptions = _get_module(
+        "pika.exceptions",
+        AMQPError=_broker.AMQPError,
+        AMQPChannelError=_broker.AMQPChannelError,
+        ChannelClosedByBroker=_broker.ChannelClosedByBroker,
+        ConnectionClosed=_broker.ConnectionClosed,
+    )
+    asyncio_connection = _get_module(
+        "pika.adapters.asyncio_connection",
+        AsyncioConnection=_broker.AsyncioConnection,
+    )
+    adapters = _get_module("pika.adapters", asyncio_connection=asyncio_connection)
+    _broker.exceptions = exceptions
+    _broker.adapters = adapters
+    sys.modules.update({
+        "PyQt5": pyqt,
+        "PyQt5.Qt": qt,
+        "PyQt5.QtCore": qt_core,
+        "PyQt5.QAxContainer": ax_container,
+        "pika": _broker,
+        "pika.exceptions": exceptions,
+        "pika.adapters": adapters,
+        "pika.adapters.asyncio_connection": asyncio_connection,
+    })
+    return config
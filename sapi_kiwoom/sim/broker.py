@@ -0,0 +1,383 @@
+"""In-process stand-in for RabbitMQ, installed as `pika` by `sapi_kiwoom.sim.install()`."""
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any
+
+
+class AMQPError(Exception):
+    pass
+
+
+class AMQPChannelError(AMQPError):
+    pass
+
+
+class ChannelClosedByBroker(AMQPChannelError):
+    pass
+
+
+class ConnectionClosed(AMQPError):
+
+    def __init__(self, reply_code, reply_text):
+        super().__init__(reply_code, reply_text)
+        self.reply_code = reply_code
+        self.reply_text = reply_text
+
+
+@dataclass
+class BasicProperties:
+    # pylint: disable=too-many-instance-attributes
+    content_type: str = None
+    content_encoding: str = None
+    headers: dict = None
+    delivery_mode: int = None
+    correlation_id: str = None
+    reply_to: str = None
+    expiration: str = None
+    message_id: str = None
+    timestamp: int = None
+    app_id: str = None
+
+
+@dataclass
+class Deliver:
+    delivery_tag: int
+    routing_key: str
+    exchange: str = ""
+    redelivered: bool = False
+
+
+@dataclass
+class DeclareOk:
+    queue: str
+    message_count: int
+    consumer_count: int
+
+
+@dataclass
+class Frame:
+    method: Any
+
+
+@dataclass
+class QueuedMessage:
+    body: bytes
+    properties: BasicProperties
+    routing_key: str
+    published_at: float = field(default_factory=monotonic)
+
+
+class Queue:
+
+    def __init__(self, name, arguments=None):
+        self.name = name
+        self.arguments = arguments or {}
+        self.owner = None  # the connection an exclusive queue is locked to
+        self.messages = deque()
+        self.consumers = 0
+        self.published = 0
+        self.dropped = 0
+
+    def put(self, message):
+        self.published += 1
+        max_length = self.arguments.get("x-max-length")
+        if max_length is not None and len(self.messages) >= max_length:
+            self.dropped += 1
+            if self.arguments.get("x-overflow") in ("reject-publish", "reject-publish-dlx"):
+                return
+            self.messages.popleft()
+        self.messages.append(message)
+
+    def expire(self, now):
+        ttl = self.arguments.get("x-message-ttl")
+        if ttl is None:
+            return
+        while self.messages and (now - self.messages[0].published_at) * 1000 > ttl:
+            self.messages.popleft()
+            self.dropped += 1
+
+
+class Broker:
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.queues = {}
+        self.queue_names = itertools.count()
+        self.channels = []
+
+    def reset(self):
+        with self.condition:
+            for channel in self.channels:
+                channel.close()
+            self.channels.clear()
+            self.queues.clear()
+            self.condition.notify_all()
+
+    def declare(self, name, passive=False, arguments=None, connection=None, exclusive=False):
+        # pylint: disable=too-many-arguments
+        with self.condition:
+            if not name:
+                name = f"amq.gen-{next(self.queue_names)}"
+            if name not in self.queues:
+                if passive:
+                    raise ChannelClosedByBroker(f"NOT_FOUND - no queue '{name}'")
+                self.queues[name] = Queue(name, arguments)
+                if exclusive:
+                    self.queues[name].owner = connection
+            queue = self.queues[name]
+            if queue.owner is not None and queue.owner is not connection:
+                raise ChannelClosedByBroker(
+                    f"RESOURCE_LOCKED - cannot obtain exclusive access to locked queue '{name}'"
+                )
+            if not passive and (arguments or {}) != queue.arguments:
+                raise ChannelClosedByBroker(f"PRECONDITION_FAILED - inequivalent arguments for queue '{name}'")
+            queue.expire(monotonic())
+            return queue
+
+    def delete(self, name):
+        with self.condition:
+            self.queues.pop(name, None)
+
+    def publish(self, routing_key, body, properties):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        with self.condition:
+            queue = self.queues.get(routing_key)
+            if queue is None:
+                # Like the default exchange, unroutable messages are dropped
+                return
+            queue.put(QueuedMessage(body, properties or BasicProperties(), routing_key))
+            self.condition.notify_all()
+
+    def get(self, names, timeout):
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            while True:
+                now = monotonic()
+                for name in names:
+                    queue = self.queues.get(name)
+                    if queue is None:
+                        continue
+                    queue.expire(now)
+                    if queue.messages:
+                        return queue.messages.popleft()
+                if deadline is not None and now >= deadline:
+                    return None
+                self.condition.wait(None if deadline is None else deadline - now)
+
+    def depth(self, name):
+        with self.condition:
+            queue = self.queues.get(name)
+            return len(queue.messages) if queue else 0
+
+    def depths(self):
+        with self.condition:
+            return {name: len(queue.messages) for name, queue in self.queues.items()}
+
+
+BROKER = Broker()
+
+
+class URLParameters:
+
+    def __init__(self, url):
+        self.url = url
+
+
+class BlockingChannel:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.consumers = {}  # {queue: (callback, auto_ack),}
+        self.prefetch_count = 0
+        self.unacked = set()
+        self.delivery_tags = itertools.count(1)
+        self.consuming = False
+        self.is_open = True
+        BROKER.channels.append(self)
+
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        # pylint: disable=unused-argument
+        self.prefetch_count = prefetch_count
+
+    def queue_declare(self, queue="", passive=False, durable=False, exclusive=False, auto_delete=False,
+                      arguments=None):
+        # pylint: disable=unused-argument,too-many-arguments
+        declared = BROKER.declare(queue, passive, arguments, self.connection, exclusive)
+        return Frame(DeclareOk(declared.name, len(declared.messages), declared.consumers))
+
+    def queue_delete(self, queue):
+        BROKER.delete(queue)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        # pylint: disable=unused-argument,too-many-arguments
+        BROKER.publish(routing_key, body, properties)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, **kwargs):
+        # pylint: disable=unused-argument
+        BROKER.declare(queue, passive=True, connection=self.connection).consumers += 1
+        self.consumers[queue] = (on_message_callback, auto_ack)
+        return f"ctag-{queue}"
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        # pylint: disable=unused-argument
+        with BROKER.condition:
+            self.unacked.discard(delivery_tag)
+            BROKER.condition.notify_all()
+
+    def basic_cancel(self, consumer_tag):
+        self.consumers.pop(consumer_tag[len("ctag-"):], None)
+
+    def start_consuming(self):
+        self.consuming = True
+        while self.consuming and self.is_open:
+            self.deliver_once(timeout=0.1)
+
+    def stop_consuming(self):
+        self.consuming = False
+
+    def deliver_once(self, timeout):
+        with BROKER.condition:
+            if self.prefetch_count and len(self.unacked) >= self.prefetch_count:
+                BROKER.condition.wait(timeout)
+                return False
+        message = BROKER.get(list(self.consumers), timeout)
+        if message is None:
+            return False
+        callback, auto_ack = self.consumers[message.routing_key]
+        delivery_tag = next(self.delivery_tags)
+        if not auto_ack:
+            self.unacked.add(delivery_tag)
+        callback(self, Deliver(delivery_tag, message.routing_key), message.properties, message.body)
+        return True
+
+    def close(self):
+        self.is_open = False
+
+
+class BlockingConnection:
+
+    def __init__(self, parameters=None):
+        self.parameters = parameters
+        self.channels = []
+        self.is_open = True
+
+    def channel(self):
+        channel = BlockingChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def process_data_events(self, time_limit=0):
+        deadline = monotonic() + (time_limit or 0)
+        delivered = False
+        while True:
+            while any(
+                    [channel.deliver_once(timeout=0) for channel in self.channels if channel.consumers]
+                ):
+                delivered = True
+            remaining = deadline - monotonic()
+            if delivered or remaining <= 0:
+                return
+            with BROKER.condition:
+                BROKER.condition.wait(min(remaining, 0.01))
+
+    def close(self):
+        self.is_open = False
+        for channel in self.channels:
+            channel.close()
+
+
+ASYNC_DELIVERY_INTERVAL = 0.001  # seconds
+
+
+class AsyncioChannel:
+    """Callback based channel of `AsyncioConnection`, delivering on its event loop."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.consumers = {}  # {queue: (callback, auto_ack),}
+        self.delivery_tags = itertools.count(1)
+        self.is_open = True
+
+    def queue_declare(self, queue, passive=False, durable=False, exclusive=False, auto_delete=False,
+                      arguments=None, callback=None):
+        # pylint: disable=unused-argument,too-many-arguments
+        declared = BROKER.declare(queue, passive, arguments, self.connection, exclusive)
+        if exclusive:
+            self.connection.exclusive_queues.append(declared.name)
+        if callback is not None:
+            frame = Frame(DeclareOk(declared.name, len(declared.messages), declared.consumers))
+            self.connection.loop.call_soon(callback, frame)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        # pylint: disable=unused-argument,too-many-arguments
+        BROKER.publish(routing_key, body, properties)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, exclusive=False, consumer_tag=None,
+                      arguments=None, callback=None):
+        # pylint: disable=unused-argument,too-many-arguments
+        BROKER.declare(queue, passive=True, connection=self.connection).consumers += 1
+        self.consumers[queue] = (on_message_callback, auto_ack)
+        return f"ctag-{queue}"
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        pass
+
+    def deliver(self):
+        for queue, (callback, _) in list(self.consumers.items()):
+            message = BROKER.get([queue], timeout=0)
+            while message is not None and self.is_open:
+                callback(self, Deliver(next(self.delivery_tags), queue), message.properties, message.body)
+                message = BROKER.get([queue], timeout=0)
+
+    def close(self):
+        self.is_open = False
+
+
+class AsyncioConnection:
+    """Stand-in for `pika.adapters.asyncio_connection.AsyncioConnection`."""
+
+    def __init__(self, parameters=None, on_open_callback=None, on_open_error_callback=None,
+                 on_close_callback=None, custom_ioloop=None):
+        # pylint: disable=unused-argument,too-many-arguments
+        self.parameters = parameters
+        self.loop = custom_ioloop
+        self.on_close_callback = on_close_callback
+        self.channels = []
+        self.exclusive_queues = []
+        self.is_open = True
+        self.is_closed = False
+        if on_open_callback is not None:
+            self.loop.call_soon(on_open_callback, self)
+        self.loop.call_soon(self.deliver)
+
+    def channel(self, channel_number=None, on_open_callback=None):
+        # pylint: disable=unused-argument
+        channel = AsyncioChannel(self)
+        self.channels.append(channel)
+        if on_open_callback is not None:
+            self.loop.call_soon(on_open_callback, channel)
+        return channel
+
+    def deliver(self):
+        if not self.is_open:
+            return
+        for channel in self.channels:
+            channel.deliver()
+        self.loop.call_later(ASYNC_DELIVERY_INTERVAL, self.deliver)
+
+    def close(self, reply_code=200, reply_text="Normal shutdown"):
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.is_closed = True
+        for channel in self.channels:
+            channel.close()
+        # Exclusive queues are deleted with the connection that declared them
+        for queue in self.exclusive_queues:
+            BROKER.delete(queue)
+        if self.on_close_callback is not None:
+            self.loop.call_soon(self.on_close_callback, self, ConnectionClosed(reply_code, reply_text))
@@ -0,0 +1,297 @@
+"""Simulated `KHOPENAPI.KHOpenAPICtrl.1` control, with generated transaction pages and ticks."""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from time import monotonic
+
+from ..kiwoom.schema import get_schema
+from ..kiwoom.transaction import (
+    REQUEST_MINUTE_CANDLE_CODE,
+    REQUEST_DAY_CANDLE_CODE,
+    REQUEST_SHORT_TREND_CODE,
+    REQUEST_UPPER_AND_LOW_CODE,
+    REQUEST_MULTI_QUOTE_CODE,
+    KIWOOM_CONTINUE_REQUEST,
+    KIWOOM_SINGLE_REQUEST,
+)
+from ..kiwoom.rt import STOCK_TRADE, STOCK_OFFER
+from .qt import EVENT_LOOP
+
+
+CONTROL_NAME = "KHOPENAPI.KHOpenAPICtrl.1"
+
+
+@dataclass
+class SimulationConfig:
+    # pylint: disable=too-many-instance-attributes
+    login_delay: float = 0.0
+    response_delay: float = 0.0  # seconds between CommRqData and OnReceiveTrData
+    rows_per_page: dict = field(default_factory=lambda: {
+        REQUEST_MINUTE_CANDLE_CODE: 900,
+        REQUEST_DAY_CANDLE_CODE: 600,
+        REQUEST_SHORT_TREND_CODE: 100,
+        REQUEST_UPPER_AND_LOW_CODE: 100,
+    })
+    max_pages: int = 1000
+    tick_rate: float = 10.0  # ticks per second for each registered code
+    offer_ratio: float = 0.5  # share of ticks sent as order book updates
+    tick_interval: float = 0.001
+    record_tick_latency: bool = False
+    stock_codes: list = field(default_factory=lambda: [f"{each:06d}" for each in range(5930, 5930 + 2000, 10)])
+    now: datetime = field(default_factory=lambda: datetime.today().replace(hour=15, minute=30, second=0))
+    seed: int = 0
+
+
+def get_signed(value, reference):
+    sign = "+" if value > reference else "-" if value < reference else ""
+    return f"{sign}{value}"
+
+
+def get_previous_weekday(day):
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def generate_days(now):
+    day = now
+    while day.weekday() >= 5:
+        day = get_previous_weekday(day)
+    while True:
+        yield day
+        day = get_previous_weekday(day)
+
+
+def generate_minutes(now, tick):
+    # Minute candles are stamped with their closing time from 09:00 to 15:30
+    for day in generate_days(now):
+        opening = day.replace(hour=9, minute=0, second=0, microsecond=0)
+        closing = day.replace(hour=15, minute=30, second=0, microsecond=0)
+        last = min(now, closing) if day.date() == now.date() else closing
+        minutes = int((last - opening).total_seconds() // 60) // tick * tick
+        while minutes > 0:
+            yield opening + timedelta(minutes=minutes)
+            minutes -= tick
+
+
+class PriceWalk:
+
+    def __init__(self, rng, base):
+        self.rng = rng
+        self.base = base
+        self.price = base
+
+    def step(self):
+        self.price = max(100, self.price + self.rng.choice((-10, -5, 0, 0, 5, 10)))
+        return self.price
+
+
+class TransactionCursor:
+
+    def __init__(self, control, transaction_code, inputs):
+        self.control = control
+        self.transaction_code = transaction_code
+        self.inputs = inputs
+        self.page = 0
+        self.rng = random.Random(f"{control.config.seed}:{transaction_code}:{inputs.get('종목코드')}")
+        self.walk = PriceWalk(self.rng, self.rng.randrange(1000, 100000, 50))
+        if transaction_code == REQUEST_MINUTE_CANDLE_CODE:
+            self.times = generate_minutes(control.config.now, int(inputs.get("틱범위", "1")))
+        else:
+            self.times = generate_days(control.config.now)
+
+    @property
+    def fields(self):
+        return list(get_schema(self.transaction_code).field_names)
+
+    def next_page(self):
+        self.page += 1
+        rows_per_page = self.control.config.rows_per_page.get(self.transaction_code, 1)
+        fields = self.fields
+        rows = [self.generate_row(fields) for _ in range(rows_per_page)]
+        has_next = (
+            KIWOOM_CONTINUE_REQUEST if self.page < self.control.config.max_pages
+            else KIWOOM_SINGLE_REQUEST
+        )
+        return rows, has_next
+
+    def generate_row(self, fields):
+        moment = next(self.times) if self.transaction_code in self.control.config.rows_per_page else None
+        closing = self.walk.step()
+        opening = closing + self.rng.choice((-10, 0, 10))
+        values = {
+            "stock_code": self.inputs.get("종목코드", ""),
+            "stock_name": f"SIM{self.inputs.get('종목코드', '')}",
+            "timestamp": (
+                f"{moment:%Y%m%d%H%M%S}" if self.transaction_code == REQUEST_MINUTE_CANDLE_CODE
+                else f"{self.control.config.now:%H%M%S}"
+            ),
+            "day": f"{moment:%Y%m%d}" if moment else "",
+            "closing": get_signed(closing, opening),
+            "opening": get_signed(opening, closing),
+            "high": str(max(opening, closing) + 5),
+            "low": str(min(opening, closing) - 5),
+            "volume": str(self.rng.randrange(1, 100000)),
+        }
+        return [values.get(each, str(self.rng.randrange(0, 1000))) for each in fields]
+
+
+class SimulatedKiwoomControl:
+
+    SIGNALS = ["OnEventConnect", "OnReceiveMsg", "OnReceiveTrData", "OnReceiveRealData"]
+
+    def __init__(self, widget, config=None):
+        self.widget = widget
+        self.config = config or SimulationConfig()
+        self.rng = random.Random(self.config.seed)
+        self.inputs = {}
+        self.cursors = {}  # {rqname: TransactionCursor,}
+        self.pages = {}  # {rqname: rows,}
+        self.registered = {}  # {stock_code: screen_number,}
+        self.walks = {}
+        self.offer_volumes = {}  # {stock_code: [sell 1..10, buy 1..10],}
+        self.tick_latencies = []
+        self.emitted_ticks = 0
+        self.requested_pages = 0
+        self.tick_debt = 0.0
+        self.last_tick_time = None
+
+    def CommConnect(self):
+        # pylint: disable=invalid-name
+        EVENT_LOOP.call_later(self.config.login_delay, self.widget.OnEventConnect.emit, 0)
+        return 0
+
+    def SetInputValue(self, key, value):
+        # pylint: disable=invalid-name
+        self.inputs[key] = value
+
+    def CommRqData(self, rqname, transaction_code, continuous, screen_number):
+        # pylint: disable=invalid-name
+        inputs, self.inputs = self.inputs, {}
+        if continuous != KIWOOM_CONTINUE_REQUEST or rqname not in self.cursors:
+            self.cursors[rqname] = TransactionCursor(self, transaction_code, inputs)
+        rows, has_next = self.cursors[rqname].next_page()
+        self.requested_pages += 1
+        EVENT_LOOP.call_later(self.config.response_delay, self._receive_page, rqname, rows, has_next,
+                              screen_number, transaction_code)
+        return 0
+
+    def CommKwRqData(self, stock_codes, has_next, code_count, type_flag, rqname, screen_number):
+        # pylint: disable=invalid-name,too-many-arguments,unused-argument
+        stock_codes = stock_codes.split(";")[:code_count]
+        rows = []
+        for stock_code in stock_codes:
+            cursor = TransactionCursor(self, REQUEST_MULTI_QUOTE_CODE, {"종목코드": stock_code})
+            rows.append(cursor.generate_row(cursor.fields))
+        self.requested_pages += 1
+        EVENT_LOOP.call_later(self.config.response_delay, self._receive_page, rqname, rows, KIWOOM_SINGLE_REQUEST,
+                              screen_number, REQUEST_MULTI_QUOTE_CODE)
+        return 0
+
+    def _receive_page(self, rqname, rows, has_next, screen_number, transaction_code):
+        # pylint: disable=too-many-arguments
+        self.pages[rqname] = rows
+        if has_next == KIWOOM_SINGLE_REQUEST:
+            self.cursors.pop(rqname, None)
+        self.widget.OnReceiveTrData.emit(screen_number, rqname, transaction_code, "", has_next, 0, "", "", "")
+
+    def GetCommDataEx(self, transaction_code, rqname):
+        # pylint: disable=invalid-name,unused-argument
+        return self.pages.pop(rqname, None)
+
+    def GetMasterCodeName(self, stock_code):
+        # pylint: disable=invalid-name
+        return f"SIM{stock_code}"
+
+    def GetCodeListByMarket(self, market):
+        # pylint: disable=invalid-name,unused-argument
+        return ";".join(self.config.stock_codes) + ";"
+
+    def GetMasterStockState(self, stock_code):
+        # pylint: disable=invalid-name,unused-argument
+        return "증거금20%|담보대출|신용가능"
+
+    def SetRealReg(self, screen_number, stock_codes, fids, real_type):
+        # pylint: disable=invalid-name,unused-argument
+        was_idle = not self.registered
+        if real_type == "0":
+            for stock_code in [code for code, screen in self.registered.items() if screen == screen_number]:
+                self.registered.pop(stock_code)
+        for stock_code in filter(None, stock_codes.split(";")):
+            self.registered[stock_code] = screen_number
+            self.walks.setdefault(stock_code, PriceWalk(self.rng, self.rng.randrange(1000, 100000, 50)))
+        if was_idle and self.registered and self.config.tick_rate > 0:
+            self.last_tick_time = monotonic()
+            EVENT_LOOP.call_later(self.config.tick_interval, self._emit_ticks)
+        return 0
+
+    def SetRealRemove(self, screen_number, stock_code):
+        # pylint: disable=invalid-name
+        for code, screen in list(self.registered.items()):
+            if screen_number in ("ALL", screen) and stock_code in ("ALL", code):
+                self.registered.pop(code)
+
+    def _emit_ticks(self):
+        if not self.registered:
+            return
+        now = monotonic()
+        self.tick_debt += (now - self.last_tick_time) * self.config.tick_rate * len(self.registered)
+        self.last_tick_time = now
+        codes = list(self.registered)
+        while self.tick_debt >= 1:
+            self.tick_debt -= 1
+            stock_code = codes[self.emitted_ticks % len(codes)]
+            self._emit_tick(stock_code, now)
+        EVENT_LOOP.call_later(self.config.tick_interval, self._emit_ticks)
+
+    def _emit_tick(self, stock_code, due):
+        self.emitted_ticks += 1
+        if self.rng.random() < self.config.offer_ratio:
+            real_type, real_data = STOCK_OFFER, self.generate_offer(stock_code)
+        else:
+            real_type, real_data = STOCK_TRADE, self.generate_trade(stock_code)
+        self.widget.OnReceiveRealData.emit(stock_code, real_type, real_data)
+        if self.config.record_tick_latency:
+            self.tick_latencies.append(monotonic() - due)
+
+    def generate_trade(self, stock_code):
+        walk = self.walks[stock_code]
+        price = walk.step()
+        volume = self.rng.randrange(1, 500) * self.rng.choice((1, -1))
+        return "\t".join([
+            f"{datetime.now():%H%M%S}",
+            get_signed(price, walk.base),
+            get_signed(price - walk.base, 0),
+            f"{(price - walk.base) / walk.base * 100:.2f}",
+            get_signed(price + 5, walk.base),
+            get_signed(price, walk.base),
+            f"{volume:+d}",
+            str(self.emitted_ticks * 100),
+            str(self.emitted_ticks),
+            get_signed(walk.base, walk.base),
+            get_signed(price + 50, walk.base),
+            get_signed(price - 50, walk.base),
+        ])
+
+    def generate_offer(self, stock_code):
+        walk = self.walks[stock_code]
+        price = walk.price
+        volumes = self.offer_volumes.get(stock_code)
+        if volumes is None:
+            volumes = self.offer_volumes[stock_code] = [self.rng.randrange(1, 10000) for _ in range(20)]
+        # Like a live book, an update changes one or two levels
+        for _ in range(self.rng.choice((1, 2))):
+            volumes[self.rng.randrange(20)] = self.rng.randrange(1, 10000)
+        values = [f"{datetime.now():%H%M%S}"]
+        for level in range(1, 11):
+            values.extend([
+                get_signed(price + 5 * level, walk.base),
+                str(volumes[level - 1]),
+                str(self.rng.randrange(-100, 100)),
+                get_signed(price - 5 * (level - 1), walk.base),
+                str(volumes[10 + level - 1]),
+                str(self.rng.randrange(-100, 100)),
+            ])
+        values.extend([str(sum(volumes[:10])), "0", str(sum(volumes[10:])), "0"])
+        return "\t".join(values)
@@ -0,0 +1,234 @@
+"""Load generation against the `tasks` queue by simulated clients with a weighted mix of operations."""
+import random
+import threading
+from dataclasses import dataclass, field
+from time import monotonic, sleep
+
+from .broker import BROKER
+from .server import SimulatedClient
+from .stats import summarize_latencies, get_rate
+from ..messenger import DEFAULT_REQUEST_QUEUE_NAME, TASK_SUCCEED
+
+
+# Operation
+LOOKUP = "lookup"
+TRANSACTION = "transaction"
+SUBSCRIBE = "subscribe"
+
+OPERATIONS = (LOOKUP, TRANSACTION, SUBSCRIBE)
+SUBSCRIPTION_METHODS = ("subscribe-realtime", "unsubscribe-realtime")
+
+
+def parse_mix(mix):
+    """Parse `operation=weight,operation=weight` into {operation: weight,}."""
+    parsed = {}
+    for each in filter(None, mix.split(",")):
+        operation, _, weight = each.partition("=")
+        if operation not in OPERATIONS:
+            raise ValueError(f"Operation '{operation}' should be one of {OPERATIONS}")
+        try:
+            parsed[operation] = float(weight)
+        except ValueError as error:
+            raise ValueError(f"Weight of '{operation}' should be a number") from error
+    if not parsed or sum(parsed.values()) <= 0:
+        raise ValueError("Mix should have at least one operation with a positive weight")
+    return parsed
+
+
+@dataclass
+class LoadConfig:
+    # pylint: disable=too-many-instance-attributes
+    clients: int = 10
+    rate: float = 100.0  # requests per second of all clients
+    concurrency: int = 4  # requests waiting for a reply per client
+    duration: float = 10.0
+    mix: dict = field(default_factory=lambda: {LOOKUP: 0.7, TRANSACTION: 0.2, SUBSCRIBE: 0.1})
+    hold: float = 1.0  # seconds a subscription is kept
+    drain: float = 10.0  # seconds to wait for replies after the duration
+    sample_interval: float = 0.5
+    stock_codes: list = field(default_factory=lambda: [f"{each:06d}" for each in range(5930, 5930 + 200, 10)])
+    seed: int = 0
+
+
+class MethodStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.latencies = []  # of successful replies
+
+    @property
+    def failed(self):
+        # Requests without a reply by the end of the drain count as errors
+        return self.requests - len(self.latencies)
+
+    def to_dict(self, elapsed):
+        completed = len(self.latencies)
+        return {
+            "requests": self.requests,
+            "completed": completed,
+            "errors": self.failed,
+            "error_rate": round(self.failed / self.requests, 4) if self.requests else None,
+            "requests_per_second": get_rate(completed, elapsed),
+            "latency_ms": summarize_latencies(self.latencies),
+        }
+
+
+class LoadClient(SimulatedClient):
+    """Simulated client sending its share of the load from its own thread."""
+
+    def __init__(self, config, rng):
+        super().__init__()
+        self.config = config
+        self.rng = rng
+        self.pending = {}  # {task_id: (method, stock code, scheduled time),}
+        self.subscriptions = []  # [(unsubscribe time, task_id, stock_code),]
+        self.stats = {}  # {method: MethodStats,}
+        self.real_time_messages = 0
+        self.operations = list(config.mix)
+        self.weights = [config.mix[each] for each in self.operations]
+
+    def get_stats(self, method):
+        if method not in self.stats:
+            self.stats[method] = MethodStats()
+        return self.stats[method]
+
+    def send(self, method, parameters, scheduled_time, task_id=None):
+        task_id = self.request(method, parameters, task_id=task_id)
+        self.pending[task_id] = (method, parameters["stock_code"], scheduled_time)
+        self.get_stats(method).requests += 1
+
+    def send_operation(self, scheduled_time):
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        stock_code = self.rng.choice(self.config.stock_codes)
+        if operation == LOOKUP:
+            self.send("get-stock-name", {"stock_code": stock_code}, scheduled_time)
+        elif operation == TRANSACTION:
+            self.send(
+                "request-day-candle",
+                {"stock_code": stock_code, "from": "19000101", "to": "99991231", "is_adjusted": "1"},
+                scheduled_time
+            )
+        else:
+            self.send("subscribe-realtime", {"stock_code": stock_code}, scheduled_time)
+
+    def _on_reply(self, channel, method, properties, body):
+        # pylint: disable=import-outside-toplevel
+        from ..mq import deserialize, decode_body
+
+        response = deserialize(decode_body(body, properties))
+        task_id = response["task_id"]
+        pending = self.pending.get(task_id)
+        if pending is None or (pending[0] in SUBSCRIPTION_METHODS and isinstance(response["result"], dict)):
+            # Real time data of a subscription, not the reply of a request
+            self.real_time_messages += 1
+            return
+        request_method, stock_code, scheduled_time = self.pending.pop(task_id)
+        if response["status"] != TASK_SUCCEED:
+            return
+        self.get_stats(request_method).latencies.append(monotonic() - scheduled_time)
+        if request_method == "subscribe-realtime":
+            self.subscriptions.append((monotonic() + self.config.hold, task_id, stock_code))
+
+    def unsubscribe_expired(self, now, force=False):
+        remaining = []
+        for unsubscribe_time, task_id, stock_code in self.subscriptions:
+            if force or unsubscribe_time <= now:
+                self.send(
+                    "unsubscribe-realtime",
+                    {"stock_code": stock_code},
+                    min(unsubscribe_time, now),
+                    task_id=task_id
+                )
+            else:
+                remaining.append((unsubscribe_time, task_id, stock_code))
+        self.subscriptions = remaining
+
+    def run(self, started, rate):
+        end = started + self.config.duration
+        next_time = started + self.rng.expovariate(rate) if rate > 0 else float("inf")
+        while True:
+            now = monotonic()
+            if now >= end:
+                break
+            self.unsubscribe_expired(now)
+            while next_time <= now and len(self.pending) < self.config.concurrency:
+                # Measured from when it was due, not from when a slot was free
+                self.send_operation(next_time)
+                next_time += self.rng.expovariate(rate)
+            self.connection.process_data_events(time_limit=0.002)
+
+        self.unsubscribe_expired(monotonic(), force=True)
+        deadline = monotonic() + self.config.drain
+        while (self.pending or self.subscriptions) and monotonic() < deadline:
+            self.connection.process_data_events(time_limit=0.01)
+            self.unsubscribe_expired(monotonic(), force=True)
+
+
+def sample_queue_depths(reply_queues, samples, started, interval, stopped):
+    while not stopped.is_set():
+        depths = BROKER.depths()
+        samples.append({
+            "elapsed_seconds": round(monotonic() - started, 3),
+            "tasks": depths.get(DEFAULT_REQUEST_QUEUE_NAME, 0),
+            "replies": sum(depths.get(each, 0) for each in reply_queues),
+        })
+        sleep(interval)
+
+
+def summarize_depths(samples):
+    if not samples:
+        return {}
+    return {
+        "max_tasks": max(each["tasks"] for each in samples),
+        "max_replies": max(each["replies"] for each in samples),
+        "mean_tasks": round(sum(each["tasks"] for each in samples) / len(samples), 2),
+    }
+
+
+def run_load(config):
+    """Drive a started `SimulatedServer` with `config` and return the report."""
+    rng = random.Random(config.seed)
+    clients = [LoadClient(config, random.Random(rng.random())) for _ in range(config.clients)]
+    samples = []
+    stopped = threading.Event()
+    started = monotonic()
+    sampler = threading.Thread(
+        target=sample_queue_depths,
+        args=([each.reply_queue for each in clients], samples, started, config.sample_interval, stopped),
+        daemon=True,
+    )
+    threads = [
+        threading.Thread(target=each.run, args=(started, config.rate / config.clients), daemon=True)
+        for each in clients
+    ]
+    sampler.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = monotonic() - started
+    stopped.set()
+    sampler.join()
+
+    methods = {}
+    for client in clients:
+        for method, stats in client.stats.items():
+            merged = methods.setdefault(method, MethodStats())
+            merged.requests += stats.requests
+            merged.latencies.extend(stats.latencies)
+    for client in clients:
+        client.close()
+
+    requests = sum(each.requests for each in methods.values())
+    errors = sum(each.failed for each in methods.values())
+    return {
+        "clients": config.clients,
+        "seconds": round(elapsed, 3),
+        "requests": requests,
+        "requests_per_second": get_rate(requests, elapsed),
+        "error_rate": round(errors / requests, 4) if requests else None,
+        "real_time_messages": sum(each.real_time_messages for each in clients),
+        "methods": {method: stats.to_dict(elapsed) for method, stats in sorted(methods.items())},
+        "queue_depth": summarize_depths(samples),
+        "queue_depth_samples": samples,
+    }
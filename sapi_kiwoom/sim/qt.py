@@ -0,0 +1,172 @@
+"""Minimal stand-in for the parts of PyQt5 used by the server."""
+import heapq
+import itertools
+import threading
+from time import monotonic
+
+
+class EventLoop:
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.scheduled = []  # [(due, order, callback, args),]
+        self.order = itertools.count()
+        self.running = False
+        self.thread_id = None
+
+    def call_later(self, delay, callback, *args):
+        with self.condition:
+            heapq.heappush(self.scheduled, (monotonic() + delay, next(self.order), callback, args))
+            self.condition.notify()
+
+    def call_soon(self, callback, *args):
+        self.call_later(0, callback, *args)
+
+    def run(self):
+        self.running = True
+        self.thread_id = threading.get_ident()
+        while self.running:
+            with self.condition:
+                while self.running:
+                    timeout = self.scheduled[0][0] - monotonic() if self.scheduled else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self.condition.wait(timeout)
+                if not self.running:
+                    break
+                _, _, callback, args = heapq.heappop(self.scheduled)
+            callback(*args)
+        return 0
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+
+EVENT_LOOP = EventLoop()
+
+
+class Signal:
+
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class QueuedSignal(Signal):
+
+    def emit(self, *args):
+        # Like a queued connection, an emit from another thread runs the slots on the event loop
+        if threading.get_ident() == EVENT_LOOP.thread_id:
+            super().emit(*args)
+        else:
+            EVENT_LOOP.call_soon(super().emit, *args)
+
+
+class pyqtSignal:  # pylint: disable=invalid-name
+    """Signal declared on a class, one `QueuedSignal` per instance."""
+
+    def __init__(self, *types):
+        self.types = types
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = f"_{name}_signal"
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.name not in instance.__dict__:
+            instance.__dict__[self.name] = QueuedSignal()
+        return instance.__dict__[self.name]
+
+
+class QApplication:
+
+    def __init__(self, args):
+        self.args = args
+
+    def exec(self):
+        return EVENT_LOOP.run()
+
+    exec_ = exec
+
+    @staticmethod
+    def quit():
+        EVENT_LOOP.stop()
+
+
+class QTimer:
+
+    def __init__(self, parent=None):
+        # pylint: disable=unused-argument
+        self.timeout = Signal()
+        self.interval = 0
+        self.active = False
+        self.single_shot = False
+        self.generation = 0
+
+    def setInterval(self, interval):
+        self.interval = interval
+
+    def setSingleShot(self, single_shot):
+        self.single_shot = single_shot
+
+    def isActive(self):
+        return self.active
+
+    def start(self, interval=None):
+        if interval is not None:
+            self.interval = interval
+        self.active = True
+        self.generation += 1
+        EVENT_LOOP.call_later(self.interval / 1000, self._fire, self.generation)
+
+    def stop(self):
+        self.active = False
+
+    def _fire(self, generation):
+        if not self.active or generation != self.generation:
+            return
+        if self.single_shot:
+            self.active = False
+        else:
+            EVENT_LOOP.call_later(self.interval / 1000, self._fire, generation)
+        self.timeout.emit()
+
+    @staticmethod
+    def singleShot(interval, callback):
+        EVENT_LOOP.call_later(interval / 1000, callback)
+
+
+# {control_name: factory(widget) -> control,}
+CONTROLS = {}
+
+
+class QAxWidget:
+
+    def __init__(self, *args):
+        # pylint: disable=unused-argument
+        self.control = None
+
+    def setControl(self, name):
+        if name not in CONTROLS:
+            return False
+        self.control = CONTROLS[name](self)
+        for signal_name in self.control.SIGNALS:
+            setattr(self, signal_name, Signal())
+        return True
+
+    def dynamicCall(self, signature, *args):
+        function_name = signature.split("(", 1)[0]
+        if len(args) == 1 and isinstance(args[0], list):
+            # dynamicCall(signature, [arguments]) overload
+            args = args[0]
+        return getattr(self.control, function_name)(*args)
@@ -0,0 +1,165 @@
+"""Replay of a captured workload against a simulated server, and comparison of two reports."""
+from dataclasses import dataclass
+from time import monotonic
+
+from .load import MethodStats
+from .server import SimulatedClient
+from .stats import get_rate
+from ..capture import read_workload
+from ..messenger import TASK_SUCCEED, TASK_ACCEPTED, TASK_PARTIAL
+
+
+INTERIM_STATUSES = (TASK_ACCEPTED, TASK_PARTIAL)
+COMPARED_LATENCIES = ("mean", "p50", "p95", "p99")
+
+
+@dataclass
+class ReplayConfig:
+    speed: float = 1.0  # times the captured pace, 0 for as fast as possible
+    drain: float = 30.0  # seconds to wait for replies after the last request
+
+
+def is_subscription(method):
+    return method.startswith("subscribe-") or method.startswith("unsubscribe-")
+
+
+class ReplayClient(SimulatedClient):
+    """Replays the requests of one captured reply queue."""
+
+    def __init__(self):
+        super().__init__()
+        self.pending = {}  # {task_id: (method, sent time),}
+        self.stats = {}  # {method: MethodStats,}
+        self.real_time_messages = 0
+        self.unparsed = 0
+
+    def get_stats(self, method):
+        if method not in self.stats:
+            self.stats[method] = MethodStats()
+        return self.stats[method]
+
+    def send(self, captured):
+        # pylint: disable=import-outside-toplevel
+        from ..mq import deserialize, decode_body
+        from .broker import BasicProperties
+
+        properties = BasicProperties(**{**captured.properties, "reply_to": self.reply_queue})
+        try:
+            request = deserialize(decode_body(captured.body, properties))
+            task_id, method = request["task_id"], str(request["method"])
+        except (ValueError, KeyError, TypeError):
+            # Still sent, the server answers it with a failure to an unknown task
+            task_id, method = None, None
+            self.unparsed += 1
+        if task_id is not None:
+            self.pending[task_id] = (method, monotonic())
+            self.get_stats(method).requests += 1
+        self.channel.basic_publish(exchange="", routing_key="tasks", body=captured.body, properties=properties)
+
+    def _on_reply(self, channel, method, properties, body):
+        # pylint: disable=import-outside-toplevel
+        from ..mq import deserialize, decode_body
+
+        response = deserialize(decode_body(body, properties))
+        pending = self.pending.get(response["task_id"])
+        if pending is None or (is_subscription(pending[0]) and isinstance(response["result"], dict)):
+            # Real time data of a subscription, not the reply of a request
+            self.real_time_messages += 1
+            return
+        if response["status"] in INTERIM_STATUSES:
+            return
+        request_method, sent_time = self.pending.pop(response["task_id"])
+        if response["status"] == TASK_SUCCEED:
+            self.get_stats(request_method).latencies.append(monotonic() - sent_time)
+
+    def process(self, time_limit=0):
+        self.connection.process_data_events(time_limit=time_limit)
+
+
+def process_replies(clients, time_limit=0.002):
+    for client in clients.values():
+        client.process(0)
+    if clients:
+        next(iter(clients.values())).process(time_limit)
+
+
+def run_replay(path, config=None):
+    """Replay the capture log at `path` to a started `SimulatedServer` and return the report."""
+    config = config or ReplayConfig()
+    clients = {}  # {captured reply queue: ReplayClient,}
+    first_arrival_ns = None
+    started = monotonic()
+    for captured in read_workload(path):
+        if first_arrival_ns is None:
+            first_arrival_ns = captured.arrival_ns
+        if config.speed > 0:
+            due = started + (captured.arrival_ns - first_arrival_ns) / 1e9 / config.speed
+            while monotonic() < due:
+                process_replies(clients, min(0.01, max(0.0, due - monotonic())))
+        reply_queue = captured.properties.get("reply_to")
+        if reply_queue not in clients:
+            clients[reply_queue] = ReplayClient()
+        clients[reply_queue].send(captured)
+        process_replies(clients, 0)
+    sent = monotonic() - started
+
+    deadline = monotonic() + config.drain
+    while any(each.pending for each in clients.values()) and monotonic() < deadline:
+        process_replies(clients, 0.01)
+    elapsed = monotonic() - started
+
+    methods = {}
+    for client in clients.values():
+        for method, stats in client.stats.items():
+            merged = methods.setdefault(method, MethodStats())
+            merged.requests += stats.requests
+            merged.latencies.extend(stats.latencies)
+    for client in clients.values():
+        client.close()
+
+    requests = sum(each.requests for each in methods.values())
+    errors = sum(each.failed for each in methods.values())
+    return {
+        "clients": len(clients),
+        "speed": config.speed,
+        "sending_seconds": round(sent, 3),
+        "seconds": round(elapsed, 3),
+        "requests": requests,
+        "unparsed_requests": sum(each.unparsed for each in clients.values()),
+        "requests_per_second": get_rate(requests - errors, elapsed),
+        "error_rate": round(errors / requests, 4) if requests else None,
+        "real_time_messages": sum(each.real_time_messages for each in clients.values()),
+        "methods": {method: stats.to_dict(elapsed) for method, stats in sorted(methods.items())},
+    }
+
+
+def get_change(baseline, current):
+    change = {"baseline": baseline, "current": current}
+    if baseline and current is not None:
+        change["change_percent"] = round((current - baseline) / baseline * 100, 2)
+    return change
+
+
+def compare_reports(baseline, current):
+    """Throughput and latency of `current` against `baseline`, both reports of `run_replay`."""
+    comparison = {
+        "requests_per_second": get_change(baseline["requests_per_second"], current["requests_per_second"]),
+        "error_rate": get_change(baseline["error_rate"], current["error_rate"]),
+        "methods": {},
+    }
+    for method, stats in current["methods"].items():
+        baseline_stats = baseline["methods"].get(method)
+        if baseline_stats is None:
+            continue
+        comparison["methods"][method] = {
+            "requests_per_second": get_change(
+                baseline_stats["requests_per_second"], stats["requests_per_second"]
+            ),
+            **{
+                f"latency_{name}_ms": get_change(
+                    baseline_stats["latency_ms"].get(name), stats["latency_ms"].get(name)
+                )
+                for name in COMPARED_LATENCIES
+            },
+        }
+    return comparison
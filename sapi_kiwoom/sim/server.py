@@ -0,0 +1,140 @@
+import itertools
+import sys
+import threading
+from datetime import datetime
+from time import monotonic, sleep
+
+from . import install
+from .broker import BROKER, BasicProperties, BlockingConnection, URLParameters
+from .qt import QApplication, EVENT_LOOP
+
+
+SIMULATED_BROKER_URL = "amqp://simulated"
+
+
+def disable_rate_limit():
+    # pylint: disable=import-outside-toplevel
+    from .. import delay
+
+    # More requests than a run sends, so the limit never binds
+    delay.TIMES = sys.maxsize
+    delay.INTERVAL = 0
+
+
+class SimulatedServer:
+    """Runs `KiwoomModule` against the simulated control in a background thread."""
+
+    def __init__(
+            self,
+            config=None,
+            rate_limit=False,
+            transports=None,
+            watchdog=None,
+            jobs=None,
+            candle_cache=None,
+            prefetch=None
+        ):
+        # pylint: disable=too-many-arguments
+        self.config = install(config)
+        self.rate_limit = rate_limit
+        self.transports = transports
+        self.watchdog = watchdog
+        self.jobs = jobs
+        self.candle_cache = candle_cache
+        self.prefetch = prefetch
+        self.app = None
+        self.module = None
+        self.thread = None
+
+    @property
+    def control(self):
+        return self.module.control
+
+    def start(self, timeout=10):
+        # pylint: disable=import-outside-toplevel
+        from ..messenger import Messenger
+        from ..module import KiwoomModule
+
+        if not self.rate_limit:
+            disable_rate_limit()
+        self.app = QApplication([])
+        self.module = KiwoomModule(
+            Messenger(SIMULATED_BROKER_URL, self.transports),
+            watchdog=self.watchdog,
+            jobs=self.jobs,
+            candle_cache=self.candle_cache,
+            prefetch=self.prefetch
+        )
+        self.module.connect()
+        self.thread = threading.Thread(target=self.app.exec, daemon=True)
+        self.thread.start()
+
+        deadline = monotonic() + timeout
+        while not self.module.consumer.is_alive():
+            if monotonic() > deadline:
+                raise TimeoutError("Simulated server did not start consuming")
+            sleep(0.01)
+        return self
+
+    def stop(self):
+        EVENT_LOOP.stop()
+        BROKER.reset()
+        if self.module:
+            self.module.consumer.join(timeout=1)
+
+
+class SimulatedClient:
+    """Blocking client with its own reply queue, as a real user would write it."""
+
+    task_ids = itertools.count()
+
+    def __init__(self, name=None, broker_url=SIMULATED_BROKER_URL, arguments=None):
+        self.connection = BlockingConnection(URLParameters(broker_url))
+        self.channel = self.connection.channel()
+        self.reply_queue = self.channel.queue_declare(
+            queue=name or "",
+            exclusive=arguments is None,
+            arguments=arguments
+        ).method.queue
+        self.sent = {}  # {task_id: sent_time,}
+        self.replies = []  # [(task_id, latency, response_body),]
+        self.content_encodings = []  # of compressed replies
+        self.channel.basic_consume(queue=self.reply_queue, on_message_callback=self._on_reply, auto_ack=True)
+
+    def request(self, method, parameters, task_id=None, properties=None):
+        # pylint: disable=import-outside-toplevel
+        from ..mq import serialize
+
+        task_id = task_id or f"{self.reply_queue}-{next(self.task_ids)}"
+        body = serialize({
+            "task_id": task_id,
+            "method": method,
+            "parameters": parameters,
+            "request_time": datetime.now(),
+        })
+        properties = properties or BasicProperties()
+        properties.reply_to = self.reply_queue
+        self.sent.setdefault(task_id, monotonic())
+        self.channel.basic_publish(exchange="", routing_key="tasks", body=body, properties=properties)
+        return task_id
+
+    def _on_reply(self, channel, method, properties, body):
+        # pylint: disable=unused-argument,import-outside-toplevel
+        from ..mq import deserialize, decode_body
+
+        if properties.content_encoding:
+            self.content_encodings.append(properties.content_encoding)
+        response = deserialize(decode_body(body, properties))
+        task_id = response["task_id"]
+        sent_time = self.sent.get(task_id)
+        latency = monotonic() - sent_time if sent_time is not None else None
+        self.replies.append((task_id, latency, response))
+
+    def wait(self, count, timeout=60):
+        deadline = monotonic() + timeout
+        while len(self.replies) < count and monotonic() < deadline:
+            self.connection.process_data_events(time_limit=0.05)
+        return self.replies
+
+    def close(self):
+        self.connection.close()
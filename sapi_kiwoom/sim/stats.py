@@ -0,0 +1,55 @@
+import tracemalloc
+
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies):
+    """Summarize latencies given in seconds as milliseconds."""
+    values = sorted(each * 1000 for each in latencies if each is not None)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(get_percentile(values, 50), 3),
+        "p95": round(get_percentile(values, 95), 3),
+        "p99": round(get_percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def get_rate(count, seconds):
+    return round(count / seconds, 2) if seconds > 0 else None
+
+
+def get_memory_usage():
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        return {"current_mb": round(current / 2**20, 2), "peak_mb": round(peak / 2**20, 2)}
+    try:
+        # pylint: disable=import-outside-toplevel
+        import resource
+    except ImportError:
+        return {}
+    # ru_maxrss is reported in kilobytes on Linux
+    return {"max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10, 2)}
+
+
+def reset_memory_peak():
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def format_report(title, report, indent=0):
+    lines = [f"{' ' * indent}{title}"]
+    for key, value in report.items():
+        if isinstance(value, dict):
+            lines.append(format_report(key, value, indent + 2))
+        else:
+            lines.append(f"{' ' * (indent + 2)}{key}: {value}")
+    return "\n".join(lines)
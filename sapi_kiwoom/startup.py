@@ -0,0 +1,98 @@
+"""Time-to-ready breakdown of the startup, and the warm state snapshot restored by the next one."""
+import json
+import os
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+
+
+# Startup Phase
+IMPORTED = "imports"
+QT_INITIALIZED = "qt"
+MODULE_CREATED = "module"
+LOGGED_IN = "login"
+RESTORED = "restore"
+CONSUMING = "consuming"
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SAVE_INTERVAL = 5000  # ms
+
+
+class StartupTimer:
+    """Marks startup phases relative to its creation, the earliest point of the process we control."""
+
+    def __init__(self, last_phase=CONSUMING, output=print):
+        self.started = monotonic()
+        self.last_phase = last_phase
+        self.output = output
+        self.phases = []
+        self.lock = Lock()  # the consuming phase is marked from the consumer thread
+
+    def mark(self, phase):
+        with self.lock:
+            if any(each == phase for each, _ in self.phases):
+                return
+            self.phases.append((phase, monotonic()))
+            is_ready = phase == self.last_phase
+        if is_ready and self.output is not None:
+            self.output(self.format())
+
+    @property
+    def is_ready(self):
+        return any(phase == self.last_phase for phase, _ in self.phases)
+
+    def to_dict(self):
+        breakdown = []
+        previous = self.started
+        for phase, timestamp in self.phases:
+            breakdown.append({"phase": phase, "elapsed_ms": round((timestamp - previous) * 1000, 3)})
+            previous = timestamp
+        return {"total_ms": round((previous - self.started) * 1000, 3), "phases": breakdown}
+
+    def format(self):
+        report = self.to_dict()
+        phases = ", ".join(f"{each['phase']} {each['elapsed_ms']:.0f} ms" for each in report["phases"])
+        return f"Ready in {report['total_ms']:.0f} ms ({phases})"
+
+
+def get_today():
+    return f"{datetime.now():%Y%m%d}"
+
+
+class StartupSnapshot:
+
+    def __init__(self, path):
+        self.path = path
+        self.master_data = {}
+        self.subscriptions = []
+
+    def load(self):
+        """Read the snapshot of today, returning whether there was one."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError) as error:
+            print(f"Startup snapshot '{self.path}' is ignored: {error}")
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("day") != get_today():
+            return False
+        self.master_data = snapshot.get("master_data", {})
+        self.subscriptions = snapshot.get("subscriptions", [])
+        return True
+
+    def save(self, master_data, subscriptions):
+        self.master_data = master_data
+        self.subscriptions = subscriptions
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "day": get_today(),
+            "master_data": master_data,
+            "subscriptions": subscriptions,
+        }
+        # Replaced atomically so a crash while saving keeps the previous snapshot
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, ensure_ascii=False)
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,41 @@
+from time import monotonic
+
+
+# Timeline Stage
+RECEIVED = "received"
+PARSED = "parsed"
+ENQUEUED = "enqueued"
+WAITING = "waiting"
+DISPATCHED = "dispatched"
+DATA_RECEIVED = "data_received"
+SERIALIZED = "serialized"
+PUBLISHED = "published"
+
+
+def is_timing_requested(parameters):
+    return bool(parameters.get("timing")) if isinstance(parameters, dict) else False
+
+
+class Timeline:
+    def __init__(self, is_reported=False):
+        self.stages = []
+        self.is_reported = is_reported  # returned in the response, otherwise only by get-task-result
+
+    def mark(self, stage):
+        self.stages.append((stage, monotonic()))
+
+    @property
+    def started(self):
+        return self.stages[0][1] if self.stages else None
+
+    def to_dict(self):
+        # Monotonic clocks are process local, so stages are reported as
+        # milliseconds elapsed since the first mark.
+        started = self.started
+        return {
+            "clock": "monotonic",
+            "stages": [
+                {"stage": stage, "elapsed_ms": round((timestamp - started) * 1000, 3)}
+                for stage, timestamp in self.stages
+            ],
+        }
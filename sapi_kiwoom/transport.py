@@ -0,0 +1,93 @@
+"""Transports of real time messages, replies always go through the message queue."""
+from abc import ABC, abstractmethod
+
+from .mq import publish, deserialize
+
+
+# Transport Name
+AMQP = "amqp"
+ZMQ = "zmq"
+
+# ZeroMQ subscriptions match by prefix, so topics are terminated
+TOPIC_TERMINATOR = b"\0"
+
+
+class TransportError(Exception):
+    pass
+
+
+class Transport(ABC):
+
+    name = None
+
+    @abstractmethod
+    def send(self, body, destination, channel=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class AmqpTransport(Transport):
+
+    name = AMQP
+
+    def __init__(self, broker_url):
+        self.broker_url = broker_url
+
+    def send(self, body, destination, channel=None):
+        publish(self.broker_url, body, destination, channel=channel)
+
+
+def get_topic(destination):
+    return destination.encode("utf-8") + TOPIC_TERMINATOR
+
+
+class ZmqTransport(Transport):
+    """Publishes to local subscribers over a ZeroMQ PUB socket, on the reply queue as topic."""
+
+    name = ZMQ
+
+    def __init__(self, endpoint):
+        try:
+            # pylint: disable=import-outside-toplevel
+            import zmq
+        except ImportError as error:
+            raise TransportError("ZeroMQ transport needs pyzmq (pip install pyzmq)") from error
+        self.endpoint = endpoint
+        self.socket = zmq.Context.instance().socket(zmq.PUB)
+        self.socket.bind(endpoint)
+
+    def send(self, body, destination, channel=None):
+        # Only real time data is sent here, always from the Qt event loop,
+        # so the socket is never shared between threads
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.socket.send_multipart([get_topic(destination), body])
+
+    def close(self):
+        self.socket.close(linger=0)
+
+
+class LocalSubscriber:
+    """Receives real time messages published by `ZmqTransport`."""
+
+    def __init__(self, endpoint, reply_queue):
+        # pylint: disable=import-outside-toplevel
+        import zmq
+
+        self.socket = zmq.Context.instance().socket(zmq.SUB)
+        self.socket.connect(endpoint)
+        self.socket.setsockopt(zmq.SUBSCRIBE, get_topic(reply_queue))
+
+    def receive(self, timeout=None):
+        if timeout is not None and not self.socket.poll(int(timeout * 1000)):
+            return None
+        _, body = self.socket.recv_multipart()
+        return deserialize(body)
+
+    def __iter__(self):
+        while True:
+            yield self.receive()
+
+    def close(self):
+        self.socket.close(linger=0)
@@ -5,10 +5,13 @@ def get_task_id():
     return str(uuid4())
 
 
-def get_task_response(task_id, result, response_time, status):
-    return {
+def get_task_response(task_id, result, response_time, status, timing=None):
+    task_response = {
         "task_id": task_id,
         "result": result,
         "response_time": response_time,
         "status": status,
     }
+    if timing is not None:
+        task_response["timing"] = timing
+    return task_response
@@ -0,0 +1,216 @@
+"""Event loop watchdog and sampling profiler of the Qt event loop."""
+import os
+import sys
+import threading
+from collections import Counter, deque
+from time import monotonic, sleep
+
+
+LAG_CHECK_INTERVAL = 10  # ms
+STALL_THRESHOLD = 100  # ms
+LAG_HISTORY = 1000  # checks kept for the lag summary
+SLOW_CALLBACK_HISTORY = 100
+
+PROFILE_INTERVAL = 0.005  # seconds
+MAX_PROFILE_SECONDS = 60
+PROFILE_TOP = 50  # functions and stacks in a profile
+
+
+def get_frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def get_stack(frame):
+    """Frame names from the outermost call to `frame`."""
+    stack = []
+    while frame is not None:
+        stack.append(get_frame_name(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def get_thread_stack(thread_id):
+    # pylint: disable=protected-access
+    frame = sys._current_frames().get(thread_id)
+    return get_stack(frame) if frame is not None else []
+
+
+def format_stack(stack):
+    return "".join(f"\n    {each}" for each in stack)
+
+
+def summarize_lags(lags):
+    values = sorted(lags)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": round(values[len(values) // 2], 3),
+        "p99": round(values[min(len(values) - 1, len(values) * 99 // 100)], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class SamplingProfiler:
+
+    def __init__(self, thread_id, seconds, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.seconds = seconds
+        self.interval = interval
+        self.stacks = Counter()  # {(frame name,): samples,}
+        self.samples = 0
+        self.started = None
+        self.finished = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    @property
+    def is_finished(self):
+        return self.finished is not None
+
+    def start(self):
+        self.started = monotonic()
+        self.thread.start()
+        return self
+
+    def run(self):
+        deadline = self.started + self.seconds
+        while monotonic() < deadline:
+            stack = get_thread_stack(self.thread_id)
+            if stack:
+                self.stacks[tuple(stack)] += 1
+                self.samples += 1
+            sleep(self.interval)
+        self.finished = monotonic()
+
+    def to_dict(self):
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        samples = self.samples or 1
+        return {
+            "seconds": round((self.finished or monotonic()) - self.started, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "functions": [
+                {
+                    "function": name,
+                    "own_samples": count,
+                    "own_ratio": round(count / samples, 4),
+                    "total_samples": total[name],
+                    "total_ratio": round(total[name] / samples, 4),
+                }
+                for name, count in own.most_common(PROFILE_TOP)
+            ],
+            # Collapsed stacks, outermost call first, as read by flame graph tools
+            "stacks": [
+                {"stack": ";".join(stack), "samples": count}
+                for stack, count in self.stacks.most_common(PROFILE_TOP)
+            ],
+        }
+
+
+class EventLoopWatchdog:
+
+    def __init__(self, threshold=STALL_THRESHOLD, interval=LAG_CHECK_INTERVAL, output=print):
+        self.threshold = threshold / 1000
+        self.interval = interval / 1000
+        self.output = output
+        self.loop_thread_id = None
+        self.heartbeat = None
+        self.lags = deque(maxlen=LAG_HISTORY)  # ms
+        self.stalls = 0
+        self.stall_stack = None  # sampled while the event loop is blocked
+        self.slow_callbacks = deque(maxlen=SLOW_CALLBACK_HISTORY)
+        self.profiler = None
+        self.on_profiled = None
+        self.timer = None
+        self.sampler = threading.Thread(target=self.sample_stalls, daemon=True)
+
+    def start(self):
+        # Imported here so the command line defaults are read before Qt
+        from PyQt5.QtCore import QTimer  # pylint: disable=import-outside-toplevel
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.check)
+        self.timer.start(round(self.interval * 1000))
+        self.sampler.start()
+        return self
+
+    def check(self):
+        now = monotonic()
+        if self.loop_thread_id is None:
+            # The event loop may run on another thread than the one creating it
+            self.loop_thread_id = threading.get_ident()
+        elif self.heartbeat is not None:
+            lag = max(now - self.heartbeat - self.interval, 0)
+            self.lags.append(lag * 1000)
+            if lag >= self.threshold:
+                self.stalls += 1
+                message = f"Event loop blocked for {lag * 1000:.0f} ms"
+                stack = self.stall_stack
+                self.output(f"{message} in:{format_stack(stack)}" if stack else message)
+        self.stall_stack = None
+        self.heartbeat = now
+        if self.profiler is not None and self.profiler.is_finished:
+            profiler, on_profiled = self.profiler, self.on_profiled
+            self.profiler = self.on_profiled = None
+            on_profiled(profiler.to_dict())
+
+    def sample_stalls(self):
+        while True:
+            sleep(self.threshold / 2)
+            heartbeat = self.heartbeat
+            if (
+                    heartbeat is not None
+                    and self.stall_stack is None
+                    and monotonic() - heartbeat - self.interval >= self.threshold
+                ):
+                self.stall_stack = get_thread_stack(self.loop_thread_id)
+
+    def watch(self, callback):
+        """Wrap an event loop callback to log it when it runs for at least the threshold."""
+        name = getattr(callback, "__name__", repr(callback))
+
+        def watched(*args):
+            started = monotonic()
+            try:
+                return callback(*args)
+            finally:
+                duration = monotonic() - started
+                if duration >= self.threshold:
+                    self.on_slow_callback(name, duration)
+
+        return watched
+
+    def on_slow_callback(self, name, duration):
+        stack = self.stall_stack
+        # Reported here with its name, not again as a stall of the event loop
+        self.stall_stack = None
+        self.heartbeat = monotonic()
+        self.slow_callbacks.append({"callback": name, "duration_ms": round(duration * 1000, 3), "stack": stack})
+        message = f"Slow callback {name} took {duration * 1000:.0f} ms"
+        self.output(f"{message} in:{format_stack(stack)}" if stack else message)
+
+    def start_profile(self, seconds, on_profiled, interval=PROFILE_INTERVAL):
+        """Sample the event loop for `seconds` and call `on_profiled(profile)` from the event loop."""
+        if self.profiler is not None:
+            raise ValueError("Profiler is already running")
+        if self.loop_thread_id is None:
+            raise ValueError("Event loop is not watched yet")
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise ValueError(f"Profile seconds should be between 0 and {MAX_PROFILE_SECONDS}")
+        self.on_profiled = on_profiled
+        self.profiler = SamplingProfiler(self.loop_thread_id, seconds, interval).start()
+
+    def to_dict(self):
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": summarize_lags(self.lags),
+            "stalls": self.stalls,
+            "slow_callbacks": list(self.slow_callbacks),
+        }
@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sapi_kiwoom import delay
+from sapi_kiwoom.admission import AdmissionController, AdmissionRejected, parse_budgets
+from sapi_kiwoom.kiwoom.cost import count_weekdays, estimate_pages
+from sapi_kiwoom.kiwoom.schema import get_schema
+
+
+class CostEstimationTest(unittest.TestCase):
+
+    def test_count_weekdays(self):
+        self.assertEqual(23, count_weekdays("20210301", "20210331"))
+        self.assertEqual(0, count_weekdays("20210327", "20210328"))
+        self.assertEqual(0, count_weekdays("20210331", "20210301"))
+
+    def test_estimate_pages(self):
+        # 2020-01-01..2021-03-26 has 323 weekdays of 390 one minute candles
+        self.assertEqual(
+            140,
+            estimate_pages(get_schema("OPT10080"), {"from": "20200101", "to": "20201231", "tick": "1"}, "20210326")
+        )
+        self.assertEqual(
+            28,
+            estimate_pages(get_schema("OPT10080"), {"from": "20200101", "to": "20201231", "tick": "5"}, "20210326")
+        )
+        self.assertEqual(
+            1,
+            estimate_pages(get_schema("OPT10081"), {"from": "20200101", "to": "20201231"}, "20210326")
+        )
+        self.assertEqual(1, estimate_pages(get_schema("OPT10004"), {"stock_code": "005930"}))
+
+
+class AdmissionControllerTest(unittest.TestCase):
+
+    def test_dispatch_seconds(self):
+        now = datetime.today()
+        self.assertEqual(0, delay.get_dispatch_seconds([], 1, now=now))
+        self.assertEqual(delay.WAITS, delay.get_dispatch_seconds([], delay.TIMES + 1, now=now))
+        full = [now - timedelta(seconds=10)] * delay.TIMES
+        self.assertAlmostEqual(delay.WAITS - 10, delay.get_dispatch_seconds(full, 1, now=now))
+        self.assertFalse(delay.is_request_available(full, now=now))
+        self.assertTrue(delay.is_request_available([now - timedelta(seconds=1)], now=now))
+
+    def test_budget(self):
+        admission = AdmissionController(budget=100, budgets={"backfill": 1000})
+        admission.admit("backfill", "a", 800)
+        admission.admit("screener", "b", 60)
+        with self.assertRaises(AdmissionRejected) as context:
+            admission.admit("screener", "c", 50)
+        self.assertGreater(context.exception.retry_after, 0)
+        with self.assertRaises(AdmissionRejected) as context:
+            admission.admit("screener", "d", 200)
+        self.assertIsNone(context.exception.retry_after)
+
+        self.assertEqual(860, admission.estimate(0, []).backlog_pages)
+        admission.dispatched("b")
+        admission.settle("b")
+        admission.admit("screener", "e", 50)
+        self.assertEqual(850, admission.estimate(0, []).backlog_pages)
+
+        # Pages of a download job are waited for, but charged to no client
+        admission.add_backlog("job:005930", 30)
+        self.assertEqual(880, admission.estimate(0, []).backlog_pages)
+        self.assertNotIn("job:005930", admission.task_charges)
+        admission.settle("job:005930")
+        self.assertEqual(850, admission.estimate(0, []).backlog_pages)
+
+    def test_parse_budgets(self):
+        self.assertEqual({"backfill": 2000, "a=b": 3}, parse_budgets("backfill=2000,a=b=3"))
+        with self.assertRaises(ValueError):
+            parse_budgets("backfill")
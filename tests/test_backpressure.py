@@ -0,0 +1,63 @@
+import unittest
+
+from sapi_kiwoom.backpressure import (
+    BackpressureMonitor,
+    get_backpressure_parameters,
+    NORMAL,
+    LATEST,
+    SAMPLED,
+)
+
+
+def get_tick(stock_code, price):
+    return {"stock_code": stock_code, "real_data_type": "주식체결", "real_time_data": price}
+
+
+class BackpressureMonitorTest(unittest.TestCase):
+
+    def test_latest(self):
+        monitor = BackpressureMonitor()
+        monitor.add("slow", "slow-queue", get_backpressure_parameters({"degrade": LATEST, "high_watermark": 100}))
+        monitor.add("fast", "fast-queue", get_backpressure_parameters({"degrade": LATEST, "high_watermark": 100}))
+        depths = {"slow-queue": 150, "fast-queue": 0}
+        self.assertEqual([], monitor.check(depths.get))
+        self.assertEqual(LATEST, monitor.get_mode("slow"))
+        self.assertEqual(NORMAL, monitor.get_mode("fast"))
+
+        for price in range(5):
+            self.assertTrue(monitor.admit("fast", get_tick("005930", price)))
+            self.assertFalse(monitor.admit("slow", get_tick("005930", price)))
+            self.assertFalse(monitor.admit("slow", get_tick("000660", price)))
+        flushed = monitor.check(depths.get)
+        self.assertEqual(
+            [("slow", get_tick("005930", 4)), ("slow", get_tick("000660", 4))],
+            flushed
+        )
+
+        depths["slow-queue"] = 50
+        monitor.check(depths.get)
+        self.assertEqual(LATEST, monitor.get_mode("slow"))
+        depths["slow-queue"] = 25
+        monitor.check(depths.get)
+        self.assertEqual(NORMAL, monitor.get_mode("slow"))
+
+    def test_sampled(self):
+        monitor = BackpressureMonitor()
+        monitor.add("slow", "queue", get_backpressure_parameters({"degrade": SAMPLED, "sample_interval": 4}))
+        monitor.check(lambda queue: 1000)
+        admitted = [monitor.admit("slow", get_tick("005930", price)) for price in range(12)]
+        self.assertEqual(3, admitted.count(True))
+        self.assertEqual([], monitor.check(lambda queue: None))
+        monitor.remove("slow")
+        self.assertTrue(monitor.admit("slow", get_tick("005930", 0)))
+
+    def test_parameters(self):
+        self.assertIsNone(get_backpressure_parameters({})["degrade"])
+        self.assertEqual(20, get_backpressure_parameters({"max_length": 40})["high_watermark"])
+        self.assertEqual(30, get_backpressure_parameters({"max_length": 40, "high_watermark": 30})["high_watermark"])
+        with self.assertRaises(ValueError):
+            get_backpressure_parameters({"max_length": 0})
+        with self.assertRaises(ValueError):
+            get_backpressure_parameters({"overflow": "drop-tail"})
+        with self.assertRaises(ValueError):
+            get_backpressure_parameters({"degrade": "none"})
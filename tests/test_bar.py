@@ -0,0 +1,60 @@
+import unittest
+from datetime import timedelta
+
+from sapi_kiwoom.kiwoom.bar import (
+    BarAggregator,
+    get_bar_parameters,
+    get_feed_timestamp,
+    get_expiry_timestamp,
+    MINUTE_BAR,
+    TICK_BAR,
+    VOLUME_BAR,
+)
+
+
+class BarAggregatorTest(unittest.TestCase):
+
+    def test_minute_bar(self):
+        aggregator = BarAggregator("005930", MINUTE_BAR, 3)
+        self.assertIsNone(aggregator.update("090000", 100, 10))
+        self.assertIsNone(aggregator.update("090130", 105, 5))
+        self.assertIsNone(aggregator.update("090259", 95, 1))
+        bar = aggregator.update("090300", 101, 7)
+        self.assertEqual(
+            {"timestamp": "090300", "opening": 100, "high": 105, "low": 95, "closing": 95, "volume": 16, "ticks": 3},
+            {key: bar[key] for key in ("timestamp", "opening", "high", "low", "closing", "volume", "ticks")}
+        )
+        self.assertEqual(101, aggregator.opening)
+        self.assertEqual("090600", aggregator.expire("090600")["timestamp"])
+        self.assertIsNone(aggregator.expire("090700"))
+
+    def test_feed_timestamp(self):
+        self.assertEqual("090301", get_feed_timestamp("090301\t+70100\t+100"))
+        self.assertIsNone(get_feed_timestamp(""))
+        self.assertEqual("085959", get_expiry_timestamp("090001", timedelta(seconds=2)))
+
+    def test_tick_bar(self):
+        aggregator = BarAggregator("005930", TICK_BAR, 2)
+        self.assertIsNone(aggregator.update("090000", 100, 10))
+        bar = aggregator.update("090001", 99, 10)
+        self.assertEqual((100, 100, 99, 99, 20, 2), (
+            bar["opening"], bar["high"], bar["low"], bar["closing"], bar["volume"], bar["ticks"]
+        ))
+
+    def test_volume_bar(self):
+        aggregator = BarAggregator("005930", VOLUME_BAR, 100)
+        self.assertIsNone(aggregator.update("090000", 100, 60))
+        self.assertEqual(120, aggregator.update("090001", 101, 60)["volume"])
+
+    def test_real_time_data(self):
+        aggregator = BarAggregator("005930", TICK_BAR, 1)
+        fields = "090001\t-70100\t-100\t-0.14\t+70200\t-70100\t-15\t100\t10\t+70300\t+70500\t-70000".split("\t")
+        bar = aggregator.update_real_time_data(fields)
+        self.assertEqual((70100, 15), (bar["closing"], bar["volume"]))
+
+    def test_parameters(self):
+        self.assertEqual({"bar_type": "minute", "size": 1}, get_bar_parameters({}))
+        with self.assertRaises(ValueError):
+            get_bar_parameters({"bar_type": "second"})
+        with self.assertRaises(ValueError):
+            get_bar_parameters({"size": 0})
@@ -0,0 +1,77 @@
+import unittest
+
+from sapi_kiwoom.candle import MinuteCandleCache, resample_minute_candles, get_bar_timestamp
+
+
+def get_candles(day, count, opening_minute=9 * 60):
+    # 1 minute candles newest first, stamped with their closing minute
+    candles = []
+    for index in range(count):
+        minute = opening_minute + index + 1
+        price = 1000 + index
+        candles.append({
+            "timestamp": f"{day}{minute // 60:02d}{minute % 60:02d}00",
+            "opening": str(price),
+            "high": f"+{price + 5}",
+            "low": f"-{price - 5}",
+            "closing": str(price + 1),
+            "volume": "10",
+        })
+    candles.reverse()
+    return candles
+
+
+class MinuteCandleTest(unittest.TestCase):
+
+    def test_bar_timestamp(self):
+        self.assertEqual("20210326090500", get_bar_timestamp("20210326090100", 5))
+        self.assertEqual("20210326090500", get_bar_timestamp("20210326090500", 5))
+        self.assertEqual("20210326091000", get_bar_timestamp("20210326090600", 5))
+        # The last bar of a day closes at 15:30
+        self.assertEqual("20210326153000", get_bar_timestamp("20210326152100", 45))
+        self.assertEqual("20210326153000", get_bar_timestamp("20210326153000", 60))
+
+    def test_resample(self):
+        bars = resample_minute_candles(get_candles("20210326", 7), 5)
+        self.assertEqual(["20210326091000", "20210326090500"], [each["timestamp"] for each in bars])
+        first = bars[-1]
+        self.assertEqual("1000", first["opening"])
+        self.assertEqual("1005", first["closing"])
+        self.assertEqual("+1009", first["high"])
+        self.assertEqual("-995", first["low"])
+        self.assertEqual("50", first["volume"])
+        self.assertEqual("20", bars[0]["volume"])
+
+    def test_cache_coverage(self):
+        cache = MinuteCandleCache()
+        # Friday to Wednesday, the oldest day may be partial and Wednesday is today
+        candles = [
+            *get_candles("20210331", 30),
+            *get_candles("20210330", 390),
+            *get_candles("20210329", 390),
+            *get_candles("20210326", 30, 15 * 60),
+        ]
+        cache.add("015760", "1", candles, today="20210331")
+        bars = cache.get("015760", "1", "20210329", "20210330153000", 30, today="20210331")
+        self.assertEqual(2 * 13, len(bars))
+        self.assertEqual("20210330153000", bars[0]["timestamp"])
+        self.assertEqual(str(30 * 10), bars[0]["volume"])
+
+        self.assertIsNone(cache.get("015760", "1", "20210326", "20210330", 30, today="20210331"))
+        self.assertIsNone(cache.get("015760", "1", "20210330", "20210331", 30, today="20210331"))
+        self.assertIsNone(cache.get("015760", "0", "20210330", "20210330", 30, today="20210331"))
+        self.assertIsNone(cache.get("015760", "1", "20210330", "20210330", 2, today="20210331"))
+
+        # Only the days after the cached ones are missing
+        missing, bars = cache.get_oldest("015760", "1", "20210329", "99991231", 30, today="20210331")
+        self.assertEqual("20210331", missing)
+        self.assertEqual(2 * 13, len(bars))
+        self.assertIsNone(cache.get_oldest("015760", "1", "20210326", "20210331", 30, today="20210331"))
+
+    def test_eviction(self):
+        cache = MinuteCandleCache(max_rows=500)
+        candles = [*get_candles("20210330", 10), *get_candles("20210329", 390), *get_candles("20210326", 10)]
+        cache.add("015760", "1", candles, today="20210331")
+        cache.add("005930", "1", candles, today="20210331")
+        self.assertIsNone(cache.get("015760", "1", "20210329", "20210329", 1, today="20210331"))
+        self.assertEqual(390, len(cache.get("005930", "1", "20210329", "20210329", 1, today="20210331")))
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from dataclasses import dataclass
+
+from sapi_kiwoom.capture import WorkloadCapture, WorkloadLogError, read_workload
+
+
+@dataclass
+class Properties:
+    reply_to: str = None
+    app_id: str = None
+    headers: dict = None
+
+
+class WorkloadCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "workload.log")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        capture = WorkloadCapture(self.path)
+        capture.record(Properties("reply-1", "screener"), b'{"task_id": "1"}', arrival_ns=10)
+        capture.record(None, '{"task_id": "2"}', arrival_ns=20)
+        capture.close()
+        # Appended after a restart
+        capture = WorkloadCapture(self.path)
+        capture.record(Properties(headers={"accept-encoding": "zlib"}), b"{}", arrival_ns=30)
+        capture.close()
+
+        captured = list(read_workload(self.path))
+        self.assertEqual([10, 20, 30], [each.arrival_ns for each in captured])
+        self.assertEqual({"reply_to": "reply-1", "app_id": "screener"}, captured[0].properties)
+        self.assertEqual({}, captured[1].properties)
+        self.assertEqual(b'{"task_id": "2"}', captured[1].body)
+        self.assertEqual({"headers": {"accept-encoding": "zlib"}}, captured[2].properties)
+
+    def test_truncated(self):
+        capture = WorkloadCapture(self.path)
+        capture.record(Properties("reply-1"), b'{"task_id": "1"}', arrival_ns=10)
+        capture.record(Properties("reply-1"), b'{"task_id": "2"}', arrival_ns=20)
+        capture.close()
+        with open(self.path, "r+b") as file:
+            file.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(1, len(list(read_workload(self.path))))
+
+        # Appended after the cut record is dropped
+        capture = WorkloadCapture(self.path)
+        capture.record(Properties("reply-1"), b'{"task_id": "3"}', arrival_ns=30)
+        capture.close()
+        captured = list(read_workload(self.path))
+        self.assertEqual([10, 30], [each.arrival_ns for each in captured])
+        self.assertEqual(b'{"task_id": "3"}', captured[1].body)
+
+        with open(self.path, "wb") as file:
+            file.write(b"SKTK\x01")
+        with self.assertRaises(WorkloadLogError):
+            list(read_workload(self.path))
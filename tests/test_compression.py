@@ -0,0 +1,46 @@
+import os
+import unittest
+
+from sapi_kiwoom.compression import (
+    CompressionError,
+    compress_body,
+    decompress_body,
+    get_accept_encoding,
+    is_codec_available,
+    negotiate_codec,
+    parse_accept_encoding,
+    ZLIB,
+)
+
+
+BODY = ("{\"day\": \"20210326\", \"closing\": \"+12300\", \"volume\": \"123456\"}, " * 2000).encode("utf-8")
+
+
+class CompressionTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        compressed, encoding = compress_body(BODY, ZLIB, threshold=1024)
+        self.assertEqual(ZLIB, encoding)
+        self.assertLess(len(compressed), len(BODY))
+        self.assertEqual(BODY, decompress_body(compressed, encoding))
+
+    def test_threshold(self):
+        self.assertEqual((BODY, None), compress_body(BODY, ZLIB, threshold=len(BODY) + 1))
+        self.assertEqual((BODY, None), compress_body(BODY, None, threshold=0))
+        self.assertEqual((b"{}", None), compress_body("{}", ZLIB, threshold=0))
+
+    def test_incompressible(self):
+        body = os.urandom(4096)
+        self.assertEqual((body, None), compress_body(body, ZLIB, threshold=0))
+
+    def test_negotiate(self):
+        self.assertEqual(["br", "zlib"], parse_accept_encoding(b" br, ZLIB ,"))
+        self.assertEqual(ZLIB, negotiate_codec({"accept-encoding": "br, zlib"}))
+        self.assertIsNone(negotiate_codec({"accept-encoding": "br"}))
+        self.assertIsNone(negotiate_codec(None))
+        self.assertIn(ZLIB, get_accept_encoding())
+
+    def test_unknown_codec(self):
+        self.assertFalse(is_codec_available("br"))
+        with self.assertRaises(CompressionError):
+            decompress_body(b"", "br")
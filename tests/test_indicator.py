@@ -0,0 +1,80 @@
+import unittest
+
+from sapi_kiwoom.kiwoom.indicator import get_indicators, apply_indicators, validate_indicator_parameters
+from sapi_kiwoom.kiwoom.schema import get_schema
+
+
+DAY_CANDLE = get_schema("OPT10081")
+MINUTE_CANDLE = get_schema("OPT10080")
+
+
+def get_day_candles(closings):
+    # Newest first, as OPT10081 responds
+    candles = [
+        {"day": f"202103{index + 1:02d}", "closing": f"-{closing}", "high": str(closing + 1),
+         "low": str(closing - 1), "volume": "10"}
+        for index, closing in enumerate(closings)
+    ]
+    return candles[::-1]
+
+
+class IndicatorTest(unittest.TestCase):
+
+    def test_parse(self):
+        indicators = get_indicators({"indicators": "sma(3), EMA, vwap, return"})
+        self.assertEqual(["sma_3", "ema_20", "vwap", "return"], [each.column for each in indicators])
+        self.assertEqual([], get_indicators({}))
+        for wrong in ("macd", "sma(0)", "return(3)", "sma(x)"):
+            with self.assertRaises(ValueError):
+                get_indicators({"indicators": [wrong]})
+
+    def test_validate(self):
+        validate_indicator_parameters(DAY_CANDLE, {"indicators": ["sma(3)"]})
+        with self.assertRaises(ValueError):
+            validate_indicator_parameters(DAY_CANDLE, {"indicators": ["sma(3)"], "stream": True})
+        with self.assertRaises(ValueError):
+            validate_indicator_parameters(get_schema("OPT10004"), {"indicators": ["sma(3)"]})
+
+    def test_moving_averages(self):
+        rows = get_day_candles([10, 11, 12, 13, 14])
+        results = apply_indicators(DAY_CANDLE, rows, {"indicators": ["sma(3)", "ema(3)", "return", "vwap"]})
+        self.assertEqual("20210305", results[0]["day"])
+        self.assertEqual([13.0, 12.0, 11.0, None, None], [each["sma_3"] for each in results])
+        self.assertEqual([13.0, 12.0, 11.0, None, None], [each["ema_3"] for each in results])
+        self.assertEqual(round(14 / 13 - 1, 6), results[0]["return"])
+        self.assertIsNone(results[-1]["return"])
+        self.assertEqual(12.0, results[0]["vwap"])
+        self.assertEqual("-14", results[0]["closing"])
+
+    def test_long_ema(self):
+        closings = [1000 + (index * 37) % 101 for index in range(3000)]
+        rows = [
+            {"day": f"{index:08d}", "closing": str(closing), "high": str(closing), "low": str(closing), "volume": "1"}
+            for index, closing in enumerate(closings)
+        ]
+        results = apply_indicators(DAY_CANDLE, rows[::-1], {"indicators": ["ema(5)", "ema(200)"]})
+        for window in (5, 200):
+            expected = [sum(closings[:window]) / window]
+            for closing in closings[window:]:
+                expected.append(expected[-1] + 2 / (window + 1) * (closing - expected[-1]))
+            computed = [each[f"ema_{window}"] for each in reversed(results)][window - 1:]
+            for value, each in zip(expected, computed):
+                self.assertAlmostEqual(value, each, places=5)
+
+    def test_atr_and_volatility(self):
+        rows = get_day_candles([10, 10, 10, 10])
+        results = apply_indicators(
+            DAY_CANDLE, rows, {"indicators": ["atr(2)", "volatility(2)"], "indicators_only": True}
+        )
+        self.assertEqual({"day", "atr_2", "volatility_2"}, set(results[0]))
+        self.assertEqual([2.0, 2.0, 2.0, None], [each["atr_2"] for each in results])
+        self.assertEqual([0.0, 0.0, None, None], [each["volatility_2"] for each in results])
+
+    def test_session_vwap(self):
+        rows = [
+            {"timestamp": "20210326090100", "closing": "20", "high": "20", "low": "20", "volume": "1"},
+            {"timestamp": "20210325153000", "closing": "10", "high": "10", "low": "10", "volume": "3"},
+            {"timestamp": "20210325152900", "closing": "14", "high": "14", "low": "14", "volume": "1"},
+        ]
+        results = apply_indicators(MINUTE_CANDLE, rows, {"indicators": ["vwap"]})
+        self.assertEqual([20.0, 11.0, 14.0], [each["vwap"] for each in results])
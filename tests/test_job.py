@@ -0,0 +1,90 @@
+import csv
+import os
+import tempfile
+import unittest
+from time import monotonic
+
+from sapi_kiwoom.job import DownloadJobManager, RUNNING, COMPLETED, CANCELLED
+
+
+PARAMETERS = {"from": "20210101", "is_adjusted": "1"}
+
+
+class DownloadJobTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = DownloadJobManager(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def download(self, job, rows):
+        [(_, stock_code)] = self.manager.get_dispatches()
+        job.on_page(rows[:1])
+        job.on_completed(rows[1:])
+        return stock_code
+
+    def test_checkpoint(self):
+        job = self.manager.start("job", "request-day-candle", PARAMETERS, ["015760", "005930"])
+        rows = [{"day": "20210326", "close": 100}, {"day": "20210325", "close": 99}]
+        self.assertEqual("015760", self.download(job, rows))
+        self.assertEqual({"015760": 2}, job.completed)
+
+        with open(job.get_output_path("015760"), encoding="utf-8") as file:
+            written = list(csv.DictReader(file))
+        self.assertEqual(["20210326", "20210325"], [each["day"] for each in written])
+
+        # A restarted server resumes from the first code not finished
+        [(_, stock_code)] = self.manager.get_dispatches()
+        self.assertTrue(os.path.exists(job.get_output_path(stock_code) + ".part"))
+        resumed = DownloadJobManager(self.directory.name)
+        resumed.resume()
+        job = resumed.get("job")
+        self.assertEqual(RUNNING, job.status)
+        self.assertEqual({"015760": 2}, job.completed)
+        self.assertEqual([(job, "005930")], resumed.get_dispatches())
+        job.on_completed([])
+        self.assertEqual([], resumed.get_dispatches())
+        self.assertEqual(COMPLETED, job.status)
+        self.assertEqual(0, job.get_eta_seconds())
+
+    def test_failed_code(self):
+        job = self.manager.start("job", "request-day-candle", PARAMETERS, ["015760", "005930"])
+        self.manager.get_dispatches()
+        job.on_page([{"day": "20210326"}])
+        job.on_failed("CommRqData returned -200")
+        self.assertEqual({"015760": "CommRqData returned -200"}, job.failed)
+        self.assertEqual(["job.json"], os.listdir(job.directory))
+        self.assertEqual([(job, "005930")], self.manager.get_dispatches())
+
+    def test_cancel(self):
+        job = self.manager.start("job", "request-day-candle", PARAMETERS, ["015760", "005930"])
+        self.manager.get_dispatches()
+        job.cancel()
+        job.on_completed([{"day": "20210326"}])
+        self.assertEqual(CANCELLED, job.status)
+        self.assertEqual({}, job.completed)
+        self.assertEqual(["job.json"], os.listdir(job.directory))
+        self.assertEqual([], self.manager.get_dispatches())
+
+    def test_eta(self):
+        job = self.manager.start("job", "request-day-candle", PARAMETERS, ["015760", "005930"])
+        self.assertGreater(job.get_eta_seconds(), 0)
+        self.download(job, [{"day": "20210326"}])
+        # One code of two finished in 10 seconds
+        job.elapsed_seconds, job.started = 10.0, monotonic()
+        self.assertAlmostEqual(10.0, job.get_eta_seconds(), places=1)
+
+    def test_start(self):
+        self.manager.start("job", "request-day-candle", PARAMETERS, ["015760"])
+        with self.assertRaises(ValueError):
+            self.manager.start("job", "request-day-candle", PARAMETERS, ["015760"])
+        with self.assertRaises(ValueError):
+            self.manager.start("../job", "request-day-candle", PARAMETERS, ["015760"])
+        with self.assertRaises(ValueError):
+            self.manager.start("other", "request-day-candle", PARAMETERS, [])
+        with self.assertRaises(ValueError):
+            self.manager.start("other", "request-day-candle", PARAMETERS, ["015760"], "xlsx")
+        with self.assertRaises(ValueError):
+            self.manager.get("unknown")
@@ -0,0 +1,64 @@
+import unittest
+
+from sapi_kiwoom.kiwoom.orderbook import OrderBook, OrderBookStream, get_order_book_parameters, SNAPSHOT, DELTA
+from sapi_kiwoom.kiwoom.rt import KIWOOM_REAL_TIME_FIELD_MAP, STOCK_OFFER
+
+
+def get_offer(timestamp, **values):
+    names = [each.changed_name for each in KIWOOM_REAL_TIME_FIELD_MAP[STOCK_OFFER]]
+    fields = [str(values.get(name, "100")) for name in names[:-4]] + ["1000", "0", "1000", "0"]
+    fields[0] = timestamp
+    return fields
+
+
+class OrderBookTest(unittest.TestCase):
+
+    def test_delta(self):
+        book = OrderBook("005930")
+        self.assertTrue(book.update(get_offer("090000")))
+        self.assertEqual(1, book.sequence)
+        self.assertIsNone(book.delta)
+        self.assertFalse(book.update(get_offer("090001")))
+
+        self.assertTrue(book.update(get_offer("090002", sell_price_2="-70200", buy_remaining_volume_1="7")))
+        self.assertEqual(DELTA, book.delta["type"])
+        self.assertEqual(2, book.delta["sequence"])
+        self.assertEqual({"2": [70200, 100]}, book.delta["sell"])
+        self.assertEqual({"1": [100, 7]}, book.delta["buy"])
+        self.assertNotIn("total_sell_volume", book.delta)
+
+        shifted = {f"sell_price_{level}": 200 for level in range(1, 11)}
+        self.assertTrue(book.update(get_offer("090003", buy_remaining_volume_1="8", **shifted)))
+        self.assertIsNone(book.delta)
+        self.assertEqual(3, book.sequence)
+
+        snapshot = book.get_snapshot()
+        self.assertEqual(SNAPSHOT, snapshot["type"])
+        self.assertEqual(3, snapshot["sequence"])
+        self.assertEqual([200, 100], snapshot["sell"][1])
+        self.assertEqual(10, len(snapshot["buy"]))
+
+    def test_stream(self):
+        book = OrderBook("005930")
+        stream = OrderBookStream(snapshot_interval=5)
+        book.update(get_offer("090000"))
+        self.assertEqual(SNAPSHOT, stream.get_message(book, now=0)["type"])
+        book.update(get_offer("090001", sell_price_1="200"))
+        self.assertEqual(DELTA, stream.get_message(book, now=1)["type"])
+
+        # A late subscriber starts with a snapshot of the same sequence
+        late = OrderBookStream(snapshot_interval=5)
+        self.assertEqual(2, late.get_message(book, now=1)["sequence"])
+        book.update(get_offer("090002", sell_price_1="300"))
+        self.assertEqual(SNAPSHOT, stream.get_message(book, now=5)["type"])
+
+        # Sent on subscribe, the next update follows as a delta
+        subscribed = OrderBookStream(snapshot_interval=5)
+        self.assertEqual(3, subscribed.get_snapshot(book, now=6)["sequence"])
+        book.update(get_offer("090003", sell_price_1="400"))
+        self.assertEqual(DELTA, subscribed.get_message(book, now=7)["type"])
+
+    def test_parameters(self):
+        self.assertEqual({"snapshot_interval": 5.0}, get_order_book_parameters({}))
+        with self.assertRaises(ValueError):
+            get_order_book_parameters({"snapshot_interval": 0})
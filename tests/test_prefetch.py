@@ -0,0 +1,88 @@
+import unittest
+from datetime import datetime, date
+
+from sapi_kiwoom.prefetch import (
+    PrefetchScheduler,
+    PrefetchJob,
+    PrefetchStore,
+    get_window_day,
+    parse_window,
+)
+
+
+DAY_CANDLE_CODE = "OPT10081"
+JOB = {
+    "name": "watchlist",
+    "method": "request-day-candle",
+    "stock_codes": ["005930", "000660"],
+    "parameters": {"to": "99991231", "is_adjusted": "1"},
+    "days": 30,
+    "window": ["16:00", "08:00"],
+}
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        # Friday evening
+        self.now = datetime(2021, 3, 26, 18, 0)
+        self.scheduler = PrefetchScheduler([PrefetchJob.from_dict(JOB)], idle_seconds=60, clock=lambda: self.now)
+
+    def test_window(self):
+        window = parse_window(["16:00", "08:00"])
+        self.assertEqual(date(2021, 3, 26), get_window_day(datetime(2021, 3, 26, 23, 0), window))
+        self.assertEqual(date(2021, 3, 26), get_window_day(datetime(2021, 3, 27, 7, 0), window))
+        self.assertIsNone(get_window_day(datetime(2021, 3, 26, 10, 0), window))
+        with self.assertRaises(ValueError):
+            parse_window(["16"])
+
+    def test_job(self):
+        with self.assertRaises(ValueError):
+            PrefetchJob.from_dict({**JOB, "method": "request-offer-price-info"})
+        with self.assertRaises(ValueError):
+            PrefetchJob.from_dict({**JOB, "parameters": {**JOB["parameters"], "fields": ["day"]}})
+        with self.assertRaises(ValueError):
+            PrefetchJob.from_dict({**JOB, "days": None, "parameters": {"is_adjusted": "1"}})
+
+    def test_run(self):
+        [(run, stock_code)] = self.scheduler.get_dispatches()
+        self.assertEqual("005930", stock_code)
+        self.assertEqual("20210224", run.parameters["from"])
+        # One code at a time
+        self.assertEqual([], self.scheduler.get_dispatches())
+        run.on_completed([{"day": "20210326"}])
+
+        parameters = {"stock_code": "005930", "from": "20210301", "to": "20210326", "is_adjusted": "1"}
+        self.assertEqual([{"day": "20210326"}], self.scheduler.get(DAY_CANDLE_CODE, parameters))
+        self.assertIsNone(self.scheduler.get(DAY_CANDLE_CODE, {**parameters, "from": "20210101"}))
+        self.assertIsNone(self.scheduler.get(DAY_CANDLE_CODE, {**parameters, "is_adjusted": "0"}))
+
+        [(_, stock_code)] = self.scheduler.get_dispatches()
+        self.assertEqual("000660", stock_code)
+        run.on_completed([])
+        self.assertEqual([], self.scheduler.get_dispatches())
+        # Once a window
+        self.now = datetime(2021, 3, 27, 7, 0)
+        self.assertEqual([], self.scheduler.get_dispatches())
+
+    def test_yield(self):
+        [(run, stock_code)] = self.scheduler.get_dispatches()
+        self.scheduler.on_client_request()
+        self.assertTrue(run.is_cancelled)
+        run.on_completed([{"day": "20210326"}])
+        self.assertEqual(0, len(self.scheduler.store))
+        self.assertEqual([], self.scheduler.get_dispatches())
+
+        # Requested again once the clients are idle
+        self.scheduler.last_client_time -= 60
+        self.assertEqual([(run, stock_code)], self.scheduler.get_dispatches())
+
+    def test_valid_until_opening(self):
+        store = PrefetchStore()
+        parameters = {"stock_code": "005930", "from": "20210101", "to": "99991231", "is_adjusted": "1"}
+        store.put(DAY_CANDLE_CODE, parameters, [], self.now)
+        self.assertEqual([], store.get(DAY_CANDLE_CODE, parameters, datetime(2021, 3, 29, 8, 59)))
+        self.assertIsNone(store.get(DAY_CANDLE_CODE, parameters, datetime(2021, 3, 29, 9, 0)))
+        # Not kept while the market is open
+        store.put(DAY_CANDLE_CODE, parameters, [], datetime(2021, 3, 29, 10, 0))
+        self.assertEqual(0, len(store))
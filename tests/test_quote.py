@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from sapi_kiwoom.quote import QuoteBoard, QuoteBoardReader, QuoteBoardError
+
+
+class QuoteBoardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, "quotes.bin")
+        self.board = QuoteBoard(self.path, capacity=4)
+        self.reader = QuoteBoardReader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.board.close()
+        self.directory.cleanup()
+
+    def test_trade_and_offer(self):
+        trade = "090001\t-70100\t-100\t-0.14\t+70200\t-70100\t-15\t1000\t10\t+70300\t+70500\t-70000"
+        self.board.update("005930", "주식체결", trade.split("\t"))
+        quote = self.reader.get("005930")
+        self.assertEqual((70100, 70200, 70100, 1000), (
+            quote["price"], quote["ask"], quote["bid"], quote["cumulative_volume"]
+        ))
+
+        offer = ["090002", "+70300", "120", "5", "+70200", "340", "-3"] + ["0"] * 58
+        self.board.update("005930", "주식호가잔량", offer)
+        quote = self.reader.get("005930")
+        self.assertEqual((70100, 70300, 70200, 120, 340), (
+            quote["price"], quote["ask"], quote["bid"], quote["ask_volume"], quote["bid_volume"]
+        ))
+        self.assertEqual(4, quote["sequence"])
+
+    def test_unknown_stock(self):
+        self.assertIsNone(self.reader.get("000660"))
+
+    def test_capacity(self):
+        for stock_code in ("000001", "000002", "000003", "000004"):
+            self.board.update(stock_code, "주식체결", ["090000", "+100"])
+        self.assertEqual(100, self.reader.get("000004")["price"])
+        # Skipped, not raised into the real time handler
+        self.board.update("000005", "주식체결", ["090000", "+100"])
+        self.assertIsNone(self.reader.get("000005"))
+        with self.assertRaises(QuoteBoardError):
+            self.board.get_slot("000006")
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from sapi_kiwoom.recorder import TickRecorder, TickLogError, read_ticks, read_index, get_tick_path
+
+
+def get_timestamp_ns(hour, minute, second):
+    return int(datetime(2021, 3, 26, hour, minute, second).timestamp() * 1e9)
+
+
+class TickRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.recorder = TickRecorder(self.directory.name)
+        self.ticks = [
+            (get_timestamp_ns(9, 0, second), stock_code, "주식체결", f"0900{second:02d}\t+{1000 + second}")
+            for second in range(10)
+            for stock_code in ("005930", "015760")
+        ]
+        for timestamp_ns, stock_code, real_type, data in self.ticks:
+            self.recorder.record(stock_code, real_type, data, timestamp_ns)
+        self.recorder.record("005930", "사용자정의", "custom", get_timestamp_ns(9, 0, 10))
+        self.recorder.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_all(self):
+        ticks = list(read_ticks(self.directory.name, "20210326"))
+        self.assertEqual(self.ticks, ticks[:-1])
+        self.assertEqual("사용자정의", ticks[-1][2])
+
+    def test_read_by_code_and_time(self):
+        start_ns = get_timestamp_ns(9, 0, 5)
+        ticks = list(read_ticks(self.directory.name, "20210326", ["015760"], start_ns))
+        self.assertEqual([each for each in self.ticks if each[1] == "015760" and each[0] >= start_ns], ticks)
+
+    def test_index(self):
+        index = read_index(self.directory.name, "20210326")
+        self.assertEqual({"005930", "015760"}, set(index))
+        self.assertEqual(10, len(index["015760"]))
+
+    def test_truncated_tail(self):
+        path = get_tick_path(self.directory.name, "20210326")
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) - 3)
+        ticks = list(read_ticks(self.directory.name, "20210326"))
+        self.assertEqual(self.ticks, ticks)
+
+    def test_invalid_day(self):
+        # Failed before any tick is read
+        with self.assertRaises(TickLogError):
+            read_ticks(self.directory.name, "20210325")
+        with open(get_tick_path(self.directory.name, "20210325"), "wb") as file:
+            file.write(b"not a tick log")
+        with self.assertRaises(TickLogError):
+            read_ticks(self.directory.name, "20210325")
+
+    def test_append_after_crash(self):
+        path = get_tick_path(self.directory.name, "20210326")
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) - 3)
+        recorder = TickRecorder(self.directory.name)
+        recorder.record("005930", "주식체결", "090011\t+1011", get_timestamp_ns(9, 0, 11))
+        recorder.close()
+        ticks = list(read_ticks(self.directory.name, "20210326"))
+        self.assertEqual(self.ticks + [(get_timestamp_ns(9, 0, 11), "005930", "주식체결", "090011\t+1011")], ticks)
+        # The index points at complete records only
+        index = read_index(self.directory.name, "20210326")
+        self.assertLess(max(offset for entries in index.values() for _, offset in entries), os.path.getsize(path))
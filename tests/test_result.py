@@ -0,0 +1,34 @@
+import unittest
+
+from sapi_kiwoom.result import ResultStore
+
+
+class ResultStoreTest(unittest.TestCase):
+
+    def test_get(self):
+        store = ResultStore()
+        store.put("task", "request-day-candle", "COMPLETED", [{"day": "20210326"}])
+        stored = store.get("task").to_dict()
+        self.assertEqual("COMPLETED", stored["status"])
+        self.assertEqual([{"day": "20210326"}], stored["result"])
+        self.assertIsNone(store.get("unknown"))
+
+    def test_ttl(self):
+        store = ResultStore(ttl=0)
+        store.put("task", "request-day-candle", "COMPLETED", [])
+        self.assertIsNone(store.get("task"))
+        self.assertEqual(0, len(store))
+
+    def test_max_rows(self):
+        store = ResultStore(max_rows=10)
+        store.put("first", "request-day-candle", "COMPLETED", [{}] * 4)
+        store.put("second", "request-day-candle", "COMPLETED", [{}] * 4)
+        store.put("third", "request-day-candle", "COMPLETED", [{}] * 4)
+        self.assertIsNone(store.get("first"))
+        self.assertIsNotNone(store.get("second"))
+        self.assertEqual(8, store.rows)
+        store.put("second", "request-day-candle", "COMPLETED", [{}] * 2)
+        self.assertEqual(6, store.rows)
+        store.put("huge", "request-day-candle", "COMPLETED", [{}] * 11)
+        self.assertIsNone(store.get("huge"))
+        self.assertEqual(2, len(store))
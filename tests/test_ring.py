@@ -0,0 +1,30 @@
+import unittest
+
+from sapi_kiwoom.kiwoom.ring import TickRing, get_catch_up_parameters
+
+
+class TickRingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = TickRing(4)
+        for each in range(6):
+            self.ring.append("주식체결" if each != 1 else "주식호가잔량", str(each))
+
+    def test_since(self):
+        self.assertEqual((5, 6, [(5, "주식체결", "4"), (6, "주식체결", "5")]), self.ring.since(4))
+        # Sequences 2 and 3 are overwritten
+        first, last, ticks = self.ring.since(1)
+        self.assertEqual((3, 6), (first, last))
+        self.assertEqual([3, 4, 5, 6], [each[0] for each in ticks])
+        self.assertEqual((7, 6, []), self.ring.since(6))
+        # Numbered by a previous server
+        self.assertEqual(3, self.ring.since(100)[0])
+
+    def test_latest(self):
+        self.assertEqual([(2, "주식호가잔량", "1"), (6, "주식체결", "5")], self.ring.get_latest())
+
+    def test_parameters(self):
+        self.assertIsNone(get_catch_up_parameters({"stock_code": "005930"}))
+        self.assertEqual({"latest": False, "from_sequence": 10}, get_catch_up_parameters({"from_sequence": "10"}))
+        with self.assertRaises(ValueError):
+            get_catch_up_parameters({"from_sequence": -1})
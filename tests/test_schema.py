@@ -0,0 +1,67 @@
+import unittest
+
+from sapi_kiwoom.kiwoom.schema import KiwoomSchemaError, compile_schema, get_schema, get_method_transaction_codes
+from sapi_kiwoom.kiwoom.method import get_method_type, TRANSACTION
+
+
+class TransactionSchemaTest(unittest.TestCase):
+
+    def test_registry(self):
+        codes = get_method_transaction_codes()
+        self.assertEqual("OPT10081", codes["request-day-candle"])
+        self.assertEqual("OPT10080", codes["request-minute-candle"])
+        for method in codes:
+            self.assertEqual(TRANSACTION, get_method_type(method))
+        with self.assertRaises(KiwoomSchemaError):
+            get_schema("OPT99999")
+
+    def test_transaction_parameters(self):
+        schema = get_schema("OPT10081")
+        self.assertEqual(
+            {"종목코드": "005930", "기준일자": "20210326", "수정주가구분": "1"},
+            schema.get_transaction_parameters({"stock_code": "005930", "to": "20210326", "is_adjusted": "1"})
+        )
+        with self.assertRaises(ValueError):
+            schema.get_transaction_parameters({"stock_code": "005930"})
+
+    def test_stock_code_chunks(self):
+        schema = get_schema("OPTKWFID")
+        chunks = schema.get_stock_code_chunks({"stock_codes": [f"{each:06d}" for each in range(201)]})
+        self.assertEqual([100, 100, 1], [len(each) for each in chunks])
+        self.assertEqual([["005930", "000660"]], schema.get_stock_code_chunks({"stock_codes": "005930;000660,005930"}))
+        with self.assertRaises(ValueError):
+            schema.get_stock_code_chunks({"stock_codes": []})
+        self.assertEqual([], get_schema("OPT10081").get_stock_code_chunks({}))
+
+    def test_decode(self):
+        schema = compile_schema({**schema_definition(), "fields": [
+                {"origin_name": "일자", "changed_name": "day"},
+                {"origin_name": "현재가", "changed_name": "closing"},
+        ]})
+        self.assertIsNone(schema.complete_key)
+        self.assertEqual(
+            [{"day": "20210326", "closing": "-70100"}],
+            schema.decode([["20210326", "-70100"]])
+        )
+
+    def test_projection(self):
+        schema = compile_schema({**schema_definition(), "task": {"filter_key": "day"}, "fields": [
+                {"origin_name": "일자", "changed_name": "day"},
+                {"origin_name": "현재가", "changed_name": "closing"},
+                {"origin_name": "거래량", "changed_name": "volume"},
+        ]})
+        projection = schema.project(("volume",))
+        self.assertEqual(("volume", "day"), projection.field_names)
+        decoded = projection.decode([["20210326", "-70100", "12"]])
+        self.assertEqual([{"volume": "12", "day": "20210326"}], decoded)
+        self.assertEqual([{"volume": "12"}], projection.hide(decoded))
+        self.assertEqual(
+            [{"closing": "-70100", "day": "20210326"}],
+            schema.project(("closing", "day")).decode([["20210326", "-70100", "12"]])
+        )
+        with self.assertRaises(ValueError):
+            schema.project(("opening",))
+
+
+def schema_definition():
+    return {"transaction_code": "OPT00000", "method": "request-test", "parameters": []}
@@ -0,0 +1,124 @@
+import unittest
+
+from sapi_kiwoom.kiwoom.rt import STOCK_TRADE, STOCK_OFFER, KIWOOM_REAL_TIME_FIELD_MAP
+from sapi_kiwoom.kiwoom.screen import Screener, get_numpy, get_screen_codes, compile_predicate
+
+
+def get_trade_fields(price, volume, change_rate="+1.00", ask=None, bid=None, timestamp="090000"):
+    values = {
+        "timestamp": timestamp,
+        "closing": f"+{price}",
+        "fluctuation_rate": change_rate,
+        "sell_top_priority_price": str(ask or price + 10),
+        "buy_top_priority_price": str(bid or price),
+        "volume": f"+{volume}",
+        "cumulative_volume": str(volume),
+    }
+    return [values.get(each.changed_name, "0") for each in KIWOOM_REAL_TIME_FIELD_MAP[STOCK_TRADE]]
+
+
+def get_offer_fields(ask, bid):
+    values = {"timestamp": "090001", "sell_price_1": str(ask), "buy_price_1": str(bid)}
+    return [values.get(each.changed_name, "0") for each in KIWOOM_REAL_TIME_FIELD_MAP[STOCK_OFFER]]
+
+
+class ScreenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.screener = Screener(get_numpy(), capacity=2)
+
+    def add_screen(self, task_id, stock_codes, expression):
+        self.screener.add_screen(task_id, stock_codes, self.screener.get_predicate(task_id, expression))
+
+    def test_edge_triggered(self):
+        self.add_screen("task", ["005930", "000660", "035720"], {"field": "price", "op": ">=", "value": 1000})
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(1200, 10))
+        self.screener.update("000660", STOCK_TRADE, get_trade_fields(900, 10))
+        events = self.screener.evaluate()
+        self.assertEqual([("task", "005930")], [(task_id, each["stock_code"]) for task_id, each in events])
+        self.assertEqual(1200, events[0][1]["price"])
+        self.assertEqual(1.0, events[0][1]["change_rate"])
+
+        # Still matching, not sent again until it stops matching
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(1300, 10))
+        self.assertEqual([], self.screener.evaluate())
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(800, 10))
+        self.screener.update("000660", STOCK_TRADE, get_trade_fields(1000, 10))
+        self.assertEqual(["000660"], [each["stock_code"] for _, each in self.screener.evaluate()])
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(1100, 10))
+        self.assertEqual(["005930"], [each["stock_code"] for _, each in self.screener.evaluate()])
+
+    def test_crossing(self):
+        self.add_screen("task", ["005930"], {"field": "change_rate", "op": "crosses_above", "value": 3})
+        # The first trade has nothing to cross from
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(1000, 1, change_rate="+5.00"))
+        self.assertEqual([], self.screener.evaluate())
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(1000, 1, change_rate="+2.00"))
+        self.assertEqual([], self.screener.evaluate())
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(1000, 1, change_rate="+3.50"))
+        self.assertEqual(1, len(self.screener.evaluate()))
+
+    def test_volume_ratio_and_spread(self):
+        self.add_screen("task", ["005930"], {"all": [
+            {"field": "volume_ratio", "op": ">=", "value": 5},
+            {"field": "spread_rate", "op": "<", "value": 1},
+        ]})
+        for _ in range(3):
+            self.screener.update("005930", STOCK_TRADE, get_trade_fields(10000, 10))
+            self.assertEqual([], self.screener.evaluate())
+        self.screener.update("005930", STOCK_OFFER, get_offer_fields(10500, 10000))
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(10000, 40, ask=10500, bid=10000))
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(10000, 40, ask=10500, bid=10000))
+        # Wide spread
+        self.assertEqual([], self.screener.evaluate())
+        self.screener.update("005930", STOCK_OFFER, get_offer_fields(10010, 10000))
+        self.screener.update("005930", STOCK_TRADE, get_trade_fields(10000, 80, ask=10010, bid=10000))
+        events = self.screener.evaluate()
+        self.assertEqual(1, len(events))
+        self.assertEqual(10, events[0][1]["spread"])
+        self.assertGreaterEqual(events[0][1]["volume_ratio"], 5)
+
+    def test_remove_screen(self):
+        self.add_screen("task", ["005930"], {"field": "price", "op": ">", "value": 0})
+        self.add_screen("other", ["005930", "000660"], {"not": {"field": "price", "op": ">", "value": 0}})
+        self.assertEqual(["005930"], self.screener.remove_screen("task"))
+        self.assertTrue(self.screener.is_screened("005930"))
+        self.assertEqual(["005930", "000660"], self.screener.remove_screen("other"))
+        self.assertFalse(self.screener.is_screened("005930"))
+        with self.assertRaises(ValueError):
+            self.screener.remove_screen("other")
+        # Rows are freed with their last screen
+        self.assertEqual({}, self.screener.rows)
+        self.assertEqual(2, self.screener.capacity)
+
+    def test_reused_rows(self):
+        self.add_screen("task", ["005930", "000660"], {"field": "price", "op": ">", "value": 0})
+        self.add_screen("other", ["035720"], {"field": "price", "op": ">", "value": 0})
+        self.screener.update("000660", STOCK_TRADE, get_trade_fields(1000, 10))
+        self.screener.remove_screen("task")
+        self.add_screen("task", ["051910"], {"field": "price", "op": ">", "value": 0})
+        self.assertEqual(3, len(self.screener.stock_codes))
+        # Nothing of the stock which had the row before
+        self.assertEqual([], self.screener.evaluate())
+        with self.assertRaises(ValueError):
+            self.screener.get_predicate("task", {"field": "price", "op": ">", "value": 0})
+
+    def test_invalid_predicates(self):
+        numpy = get_numpy()
+        for expression in (
+            None,
+            {"field": "closing", "op": ">", "value": 1},
+            {"field": "price", "op": "~", "value": 1},
+            {"field": "price", "op": ">", "value": "1"},
+            {"field": "volume", "op": "crosses_above", "value": 1},
+            {"all": []},
+            {"any": [{"field": "price", "op": ">", "value": each} for each in range(40)]},
+        ):
+            with self.assertRaises(ValueError):
+                compile_predicate(numpy, expression)
+
+    def test_codes(self):
+        self.assertEqual(["005930", "000660"], get_screen_codes({"stock_codes": "005930;000660,005930"}))
+        self.assertEqual(["005930"], get_screen_codes({"stock_codes": ["005930"]}))
+        with self.assertRaises(ValueError):
+            get_screen_codes({})
@@ -0,0 +1,609 @@
+import asyncio
+import csv
+import importlib
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from time import monotonic, sleep
+from types import SimpleNamespace
+from unittest import mock
+
+HAS_ZMQ = importlib.util.find_spec("zmq") is not None
+ZMQ_ENDPOINT = "inproc://sapi-kiwoom-test"
+
+# Imported into `sim` by setUpModule once the stand-ins are installed
+SIMULATED_NAMES = {
+    "sapi_kiwoom.sim": ["SimulationConfig"],
+    "sapi_kiwoom.sim.broker": ["BROKER", "BasicProperties"],
+    "sapi_kiwoom.sim.control": ["TransactionCursor", "get_previous_weekday"],
+    "sapi_kiwoom.sim.server": ["SIMULATED_BROKER_URL", "SimulatedClient", "SimulatedServer"],
+    "sapi_kiwoom.sim.load": ["LoadConfig", "parse_mix", "run_load"],
+    "sapi_kiwoom.sim.replay": ["ReplayConfig", "compare_reports", "run_replay"],
+    "sapi_kiwoom.backpressure": ["LATEST", "NORMAL"],
+    "sapi_kiwoom.candle": ["MinuteCandleCache"],
+    "sapi_kiwoom.capture": ["WorkloadCapture"],
+    "sapi_kiwoom.client": ["KiwoomClient", "TaskFailedError"],
+    "sapi_kiwoom.job": ["DownloadJobManager"],
+    "sapi_kiwoom.mq": ["get_queue_arguments", "serialize"],
+    "sapi_kiwoom.prefetch": ["PrefetchJob", "PrefetchScheduler"],
+    "sapi_kiwoom.transport": ["LocalSubscriber", "ZmqTransport"],
+    "sapi_kiwoom.watchdog": ["EventLoopWatchdog"],
+}
+sim = SimpleNamespace()
+# The stand-ins replace PyQt5 and pika for this module only
+STAND_INS = mock.patch.dict(sys.modules)
+
+
+def setUpModule():
+    STAND_INS.start()
+    # Server modules already imported with the real PyQt5 and pika are imported again
+    for name in [each for each in sys.modules if each.split(".")[0] == "sapi_kiwoom"]:
+        del sys.modules[name]
+    importlib.import_module("sapi_kiwoom.sim").install()
+    for module_name, names in SIMULATED_NAMES.items():
+        module = importlib.import_module(module_name)
+        for name in names:
+            setattr(sim, name, getattr(module, name))
+
+    transports = [sim.ZmqTransport(ZMQ_ENDPOINT)] if HAS_ZMQ else []
+    SimulationTestCase.job_directory = tempfile.TemporaryDirectory()
+    SimulationTestCase.server = sim.SimulatedServer(
+        sim.SimulationConfig(max_pages=2, tick_rate=200),
+        transports=transports,
+        watchdog=sim.EventLoopWatchdog().start(),
+        jobs=sim.DownloadJobManager(SimulationTestCase.job_directory.name),
+        candle_cache=sim.MinuteCandleCache(),
+        prefetch=sim.PrefetchScheduler(
+            [sim.PrefetchJob.from_dict({
+                "name": "watchlist",
+                "method": "request-day-candle",
+                "stock_codes": ["000270", "000660"],
+                "parameters": {"to": "99991231", "is_adjusted": "1"},
+                "days": 3650,
+                "window": ["00:00", "00:00"],
+            })],
+            idle_seconds=0.2,
+            # After the closing, so the prefetched candles are served until the next opening
+            clock=lambda: SimulationTestCase.server.config.now.replace(hour=18)
+        )
+    ).start()
+
+
+def tearDownModule():
+    SimulationTestCase.server.stop()
+    SimulationTestCase.job_directory.cleanup()
+    STAND_INS.stop()
+
+
+class SimulationTestCase(unittest.TestCase):
+    # Shared by the test cases, started by setUpModule
+    server = None
+    job_directory = None
+
+    def setUp(self):
+        self.client = sim.SimulatedClient()
+
+    def tearDown(self):
+        self.client.close()
+
+
+class TransactionTest(SimulationTestCase):
+
+    def test_lookup(self):
+        self.client.request("get-stock-name", {"stock_code": "015760"})
+        task_id, _, response = self.client.wait(1)[0]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertEqual(task_id, response["task_id"])
+        self.assertEqual("SIM015760", response["result"])
+
+    def test_transaction_pages(self):
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1"}
+        )
+        _, _, response = self.client.wait(1)[0]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertEqual(2 * 600, len(response["result"]))
+
+    def test_indicators(self):
+        self.client.request(
+            "request-day-candle",
+            {
+                "stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1",
+                "indicators": ["sma(20)", "atr(14)"], "indicators_only": True,
+            }
+        )
+        _, _, response = self.client.wait(1)[0]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertEqual({"day", "sma_20", "atr_14"}, set(response["result"][0]))
+        self.assertIsNotNone(response["result"][0]["sma_20"])
+        self.assertIsNone(response["result"][-1]["sma_20"])
+
+    def test_indicators_of_empty_prices(self):
+        generate_row = sim.TransactionCursor.generate_row
+
+        def generate_empty_closing(cursor, fields):
+            row = generate_row(cursor, fields)
+            row[fields.index("closing")] = ""
+            return row
+
+        with mock.patch.object(sim.TransactionCursor, "generate_row", generate_empty_closing):
+            task_id = self.client.request(
+                "request-day-candle",
+                {
+                    "stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1",
+                    "indicators": ["sma(20)"],
+                }
+            )
+            _, _, response = self.client.wait(1)[0]
+        self.assertEqual("TASK_FAILED", response["status"])
+        self.assertIn("Indicators are not computed", response["result"])
+        self.assertNotIn(task_id, self.server.module.tasks)
+
+    def test_fields(self):
+        offer_price_id = self.client.request(
+            "request-offer-price-info",
+            {"stock_code": "015760", "fields": ["sell_top_priority_price", "buy_top_priority_price"]}
+        )
+        candles_id = self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1", "fields": "closing"}
+        )
+        replies = {task_id: response for task_id, _, response in self.client.wait(2)}
+        offer_price, candles = replies[offer_price_id], replies[candles_id]
+        self.assertEqual({"sell_top_priority_price", "buy_top_priority_price"}, set(offer_price["result"][0]))
+        self.assertEqual(2 * 600, len(candles["result"]))
+        self.assertEqual({"closing"}, set(candles["result"][0]))
+
+    def test_multi_quote(self):
+        stock_codes = [f"{each:06d}" for each in range(250)]
+        self.client.request("request-multi-quote", {"stock_codes": stock_codes, "estimate": True})
+        accepted, succeed = [each[2] for each in self.client.wait(2)]
+        self.assertEqual(3, accepted["result"]["estimated_pages"])
+        self.assertEqual("TASK_SUCCEED", succeed["status"])
+        self.assertEqual(stock_codes, [each["stock_code"] for each in succeed["result"]])
+        self.assertEqual("SIM000249", succeed["result"][-1]["stock_name"])
+
+    def test_estimate(self):
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1", "estimate": True}
+        )
+        replies = self.client.wait(2)
+        self.assertEqual(["TASK_ACCEPTED", "TASK_SUCCEED"], [each[2]["status"] for each in replies])
+        self.assertGreater(replies[0][2]["result"]["estimated_pages"], 50)
+
+    def test_budget(self):
+        self.server.module.admission.budgets[self.client.reply_queue] = 10
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1"}
+        )
+        response = self.client.wait(1)[0][2]
+        self.assertEqual("TASK_REJECTED", response["status"])
+        self.assertIsNone(response["result"]["retry_after_seconds"])
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "20200101", "to": "20201231", "is_adjusted": "1"}
+        )
+        self.assertEqual("TASK_SUCCEED", self.client.wait(2)[1][2]["status"])
+        self.assertEqual(2, self.server.module.admission.get_used_pages(self.client.reply_queue, monotonic()))
+
+    def test_compression(self):
+        self.server.module.messenger.compression_threshold = 1024
+        self.client.request(
+            "request-minute-candle",
+            {"stock_code": "015760", "tick": "1", "is_adjusted": "1", "from": "19000101", "to": "99991231"},
+            properties=sim.BasicProperties(headers={"accept-encoding": "br, zlib"})
+        )
+        response = self.client.wait(1)[0][2]
+        self.assertEqual(2 * 900, len(response["result"]))
+        self.assertEqual(["zlib"], self.client.content_encodings)
+        self.server.module.messenger.compression_threshold = 64 * 1024
+
+
+class CandleCacheTest(SimulationTestCase):
+
+    def test_minute_candle_cache(self):
+        parameters = {"stock_code": "035720", "is_adjusted": "1"}
+        self.client.request("request-minute-candle", {**parameters, "tick": "1", "from": "19000101", "to": "99991231"})
+        minutes = self.client.wait(1)[0][2]["result"]
+        day = f"{sim.get_previous_weekday(sim.get_previous_weekday(self.server.config.now)):%Y%m%d}"
+        day_minutes = [each for each in minutes if each["timestamp"].startswith(day)]
+        self.assertEqual(390, len(day_minutes))
+
+        # Past days received with tick 1 answer any tick without OpenAPI
+        requested_pages = self.server.control.requested_pages
+        self.client.request(
+            "request-minute-candle",
+            {**parameters, "tick": "5", "from": day, "to": f"{day}153000", "fields": ["timestamp", "volume"]}
+        )
+        response = self.client.wait(2)[1][2]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertEqual(requested_pages, self.server.control.requested_pages)
+        bars = response["result"]
+        self.assertEqual(78, len(bars))
+        self.assertEqual({"timestamp", "volume"}, set(bars[0]))
+        self.assertEqual(f"{day}153000", bars[0]["timestamp"])
+        self.assertEqual(f"{day}090500", bars[-1]["timestamp"])
+        self.assertEqual(sum(int(each["volume"]) for each in day_minutes), sum(int(each["volume"]) for each in bars))
+
+        # Up to today, only the days after the cached ones are requested
+        self.client.request("request-minute-candle", {**parameters, "tick": "1", "from": day, "to": "99991231"})
+        response = self.client.wait(3)[2][2]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertEqual(requested_pages + 1, self.server.control.requested_pages)
+        self.assertEqual([each for each in minutes if each["timestamp"] >= day], response["result"])
+
+    def test_prefetch(self):
+        prefetch = self.server.module.prefetch
+        deadline = monotonic() + 10
+        while len(prefetch.store) < 2 and monotonic() < deadline:
+            sleep(0.05)
+        self.assertEqual(2, len(prefetch.store))
+
+        requested_pages = self.server.control.requested_pages
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "000660", "from": "20200101", "to": "99991231", "is_adjusted": "1", "fields": ["day"]}
+        )
+        response = self.client.wait(1)[0][2]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertEqual(requested_pages, self.server.control.requested_pages)
+        self.assertEqual(2 * 600, len(response["result"]))
+        self.assertEqual({"day"}, set(response["result"][0]))
+
+
+class ClientTest(SimulationTestCase):
+
+    def test_async_client(self):
+        async def run():
+            async with sim.KiwoomClient(sim.SIMULATED_BROKER_URL) as client:
+                stock_codes = [f"{each:06d}" for each in range(20)]
+                names = await asyncio.gather(*(
+                    client.request("get-stock-name", {"stock_code": each}) for each in stock_codes
+                ))
+                self.assertEqual([f"SIM{each}" for each in stock_codes], names)
+                with self.assertRaises(sim.TaskFailedError):
+                    await client.request("unknown-method")
+
+                pages = [
+                    len(page) async for page in client.stream(
+                        "request-day-candle",
+                        {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1"}
+                    )
+                ]
+                self.assertEqual([600, 600], pages)
+
+                async with client.subscribe("015760") as ticks:
+                    received = []
+                    async for tick in ticks:
+                        received.append(tick)
+                        if len(received) == 3:
+                            break
+                self.assertEqual(["015760"] * 3, [each["stock_code"] for each in received])
+                self.assertEqual({}, client.handlers)
+
+                # A screen without its stock codes is not subscribed
+                with self.assertRaises(sim.TaskFailedError):
+                    async with client.subscribe(None, "subscribe-screen", {"when": {}}):
+                        pass
+                self.assertEqual({}, client.handlers)
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+
+    def test_request_timeout(self):
+        async def run():
+            async with sim.KiwoomClient(sim.SIMULATED_BROKER_URL) as client:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await client.request("get-stock-name", {"stock_code": "015760"}, timeout=0)
+                self.assertEqual({}, client.handlers)
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+
+    def test_unparsed_request(self):
+        # Without a method, the reply is still correlated by the task id
+        self.client.channel.basic_publish(
+            exchange="",
+            routing_key="tasks",
+            body=sim.serialize({"task_id": "unparsed"}),
+            properties=sim.BasicProperties(reply_to=self.client.reply_queue)
+        )
+        task_id, _, response = self.client.wait(1)[0]
+        self.assertEqual("unparsed", task_id)
+        self.assertEqual("TASK_FAILED", response["status"])
+
+    def test_degrade_of_exclusive_queue(self):
+        async def run():
+            async with sim.KiwoomClient(sim.SIMULATED_BROKER_URL) as client:
+                # The exclusive reply queue is locked to the client's connection, its depth can not be watched
+                with self.assertRaises(sim.TaskFailedError):
+                    async with client.subscribe("015760", parameters={"degrade": "latest"}):
+                        pass
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+        self.assertEqual({}, self.server.module.messenger.backpressure.subscribers)
+
+
+class LoadTest(SimulationTestCase):
+
+    def test_load(self):
+        mix = sim.parse_mix("lookup=2,transaction=1,subscribe=1")
+        report = sim.run_load(sim.LoadConfig(clients=3, rate=60, duration=0.5, mix=mix, hold=0.1, sample_interval=0.1))
+        self.assertGreater(report["requests"], 0)
+        self.assertEqual(0.0, report["error_rate"])
+        self.assertEqual(
+            report["methods"]["subscribe-realtime"]["requests"],
+            report["methods"]["unsubscribe-realtime"]["requests"]
+        )
+        self.assertIn("p99", report["methods"]["get-stock-name"]["latency_ms"])
+        self.assertTrue(report["queue_depth_samples"])
+        with self.assertRaises(ValueError):
+            sim.parse_mix("order=1")
+
+    def test_workload_replay(self):
+        path = os.path.join(self.job_directory.name, "workload.log")
+        self.server.module.capture = sim.WorkloadCapture(path)
+        self.client.request("get-stock-name", {"stock_code": "015760"})
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1"}
+        )
+        self.client.wait(2)
+        capture, self.server.module.capture = self.server.module.capture, None
+        capture.close()
+
+        report = sim.run_replay(path, sim.ReplayConfig(speed=0, drain=10))
+        self.assertEqual(1, report["clients"])
+        self.assertEqual(2, report["requests"])
+        self.assertEqual(0.0, report["error_rate"])
+        self.assertEqual(1, report["methods"]["request-day-candle"]["completed"])
+        comparison = sim.compare_reports(report, report)
+        self.assertEqual(0.0, comparison["requests_per_second"]["change_percent"])
+        self.assertIn("latency_p99_ms", comparison["methods"]["get-stock-name"])
+
+
+class TaskResultTest(SimulationTestCase):
+
+    def test_task_result(self):
+        task_id = self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1"}
+        )
+        self.client.wait(1)
+        self.assertNotIn(task_id, self.server.module.tasks)
+
+        other_client = sim.SimulatedClient()
+        other_client.request("get-task-result", {"task_id": task_id})
+        other_client.request("get-task-result", {"task_id": "unknown"})
+        stored, unknown = [each[2] for each in other_client.wait(2)]
+        other_client.close()
+        self.assertEqual("TASK_SUCCEED", stored["status"])
+        self.assertEqual("COMPLETED", stored["result"]["status"])
+        self.assertEqual(2 * 600, len(stored["result"]["result"]))
+        self.assertEqual("TASK_FAILED", unknown["status"])
+
+    def test_download_job(self):
+        stock_codes = ["015760", "005930", "000660"]
+        job_id = self.client.request(
+            "start-download-job",
+            {
+                "method": "request-day-candle",
+                "parameters": {"from": "19000101", "to": "99991231", "is_adjusted": "1"},
+                "stock_codes": stock_codes,
+            }
+        )
+        started = self.client.wait(1)[0][2]
+        self.assertEqual("TASK_SUCCEED", started["status"])
+        self.assertEqual(3, started["result"]["codes"])
+
+        progress = started["result"]
+        deadline = monotonic() + 30
+        while progress["status"] == "RUNNING" and monotonic() < deadline:
+            sleep(0.05)
+            self.client.request("get-download-job", {"job_id": job_id})
+            progress = self.client.wait(len(self.client.replies) + 1)[-1][2]["result"]
+        self.assertEqual("COMPLETED", progress["status"])
+        self.assertEqual(3, progress["completed_codes"])
+        self.assertEqual(3 * 2 * 600, progress["rows"])
+        job_directory = os.path.join(self.job_directory.name, job_id)
+        self.assertEqual(
+            sorted(["job.json", *(f"{each}.csv" for each in stock_codes)]),
+            sorted(os.listdir(job_directory))
+        )
+        with open(os.path.join(job_directory, "015760.csv"), encoding="utf-8") as file:
+            self.assertEqual(2 * 600, len(list(csv.DictReader(file))))
+
+    def test_timing(self):
+        self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1", "timing": True}
+        )
+        _, _, response = self.client.wait(1)[0]
+        stages = [each["stage"] for each in response["timing"]["stages"]]
+        self.assertEqual(["received", "parsed", "enqueued"], stages[:3])
+        self.assertEqual(2, stages.count("dispatched"))
+        self.assertEqual("serialized", stages[-1])
+
+    def test_timing_of_stored_result(self):
+        task_id = self.client.request(
+            "request-day-candle",
+            {"stock_code": "015760", "from": "19000101", "to": "99991231", "is_adjusted": "1"}
+        )
+        _, _, response = self.client.wait(1)[0]
+        self.assertNotIn("timing", response)
+        self.client.request("get-task-result", {"task_id": task_id})
+        _, _, stored = self.client.wait(2)[1]
+        stages = [each["stage"] for each in stored["result"]["timing"]["stages"]]
+        self.assertEqual(["serialized", "published"], stages[-2:])
+
+
+class AdminTest(SimulationTestCase):
+
+    def test_admin_profile(self):
+        profile_task_id = self.client.request("admin-profile", {"seconds": 0.3})
+        lookup_task_id = self.client.request("get-stock-name", {"stock_code": "015760"})
+        replies = self.client.wait(2)
+        # Requests are consumed while profiling
+        self.assertEqual([lookup_task_id, profile_task_id], [each[0] for each in replies])
+        response = replies[1][2]
+        self.assertEqual("TASK_SUCCEED", response["status"])
+        self.assertGreater(response["result"]["profile"]["samples"], 0)
+        self.assertGreater(response["result"]["event_loop"]["lag_ms"]["count"], 0)
+
+
+class RealTimeTest(SimulationTestCase):
+
+    def test_real_time(self):
+        task_id = self.client.request("subscribe-realtime", {"stock_code": "015760"})
+        replies = self.client.wait(5)
+        self.assertTrue(all(each[0] == task_id for each in replies))
+        self.assertEqual("015760", replies[-1][2]["result"]["stock_code"])
+        self.client.request("unsubscribe-realtime", {"stock_code": "015760"}, task_id=task_id)
+
+    def test_tick_catch_up(self):
+        task_id = self.client.request("subscribe-realtime", {"stock_code": "005380"})
+        ticks = [each[2]["result"] for each in self.client.wait(10)[1:]]
+        sequences = [each["sequence"] for each in ticks]
+        self.assertEqual(list(range(sequences[0], sequences[0] + 9)), sequences)
+
+        # A reconnected subscriber catches up from the last sequence it received
+        other_client = sim.SimulatedClient()
+        other_task_id = other_client.request(
+            "subscribe-realtime", {"stock_code": "005380", "from_sequence": sequences[4]}
+        )
+        replies = [each[2]["result"] for each in other_client.wait(8)[1:]]
+        self.assertEqual(sequences[5], replies[0]["catch_up"]["requested_sequence"])
+        self.assertEqual(sequences[5], replies[0]["catch_up"]["first_sequence"])
+        self.assertEqual(sequences[5:], [each["sequence"] for each in replies[1:5]])
+        self.assertEqual(ticks[5]["real_time_data"], replies[1]["real_time_data"])
+
+        latest_client = sim.SimulatedClient()
+        latest_task_id = latest_client.request("subscribe-realtime", {"stock_code": "005380", "latest": True})
+        self.assertIn("sequence", latest_client.wait(2)[1][2]["result"])
+        for each, each_task_id in ((other_client, other_task_id), (latest_client, latest_task_id)):
+            each.request("unsubscribe-realtime", {"stock_code": "005380"}, task_id=each_task_id)
+            each.close()
+        self.client.request("unsubscribe-realtime", {"stock_code": "005380"}, task_id=task_id)
+
+    def test_tick_reconnect(self):
+        task_id = self.client.request("subscribe-realtime", {"stock_code": "051910"})
+        sequences = [each[2]["result"]["sequence"] for each in self.client.wait(4)[1:]]
+        self.client.request("unsubscribe-realtime", {"stock_code": "051910"}, task_id=task_id)
+        self.client.wait(5)
+
+        # The sole subscriber reconnects, its numbering goes on
+        other_client = sim.SimulatedClient()
+        other_task_id = other_client.request(
+            "subscribe-realtime", {"stock_code": "051910", "from_sequence": sequences[-1]}
+        )
+        catch_up = other_client.wait(2)[1][2]["result"]["catch_up"]
+        self.assertEqual(sequences[-1] + 1, catch_up["requested_sequence"])
+        self.assertEqual(sequences[-1] + 1, catch_up["first_sequence"])
+        other_client.request("unsubscribe-realtime", {"stock_code": "051910"}, task_id=other_task_id)
+        other_client.close()
+
+    def test_tick_bars(self):
+        task_id = self.client.request("subscribe-bar", {"stock_code": "015760", "bar_type": "tick", "size": 5})
+        replies = self.client.wait(3)
+        self.assertEqual(5, replies[-1][2]["result"]["ticks"])
+        self.client.request("unsubscribe-bar", {"stock_code": "015760"}, task_id=task_id)
+
+    def test_order_book(self):
+        task_id = self.client.request("subscribe-orderbook", {"stock_code": "015760"})
+        replies = self.client.wait(12)
+        messages = [each[2]["result"] for each in replies[1:]]
+        self.assertEqual("snapshot", messages[0]["type"])
+        sequences = [each["sequence"] for each in messages]
+        self.assertEqual(list(range(sequences[0], sequences[0] + 11)), sequences)
+        snapshot_size = len(sim.serialize(messages[0]))
+        deltas = [len(sim.serialize(each)) for each in messages if each["type"] == "delta"]
+        self.assertTrue(deltas)
+        self.assertLess(max(deltas), snapshot_size)
+        self.client.request("unsubscribe-orderbook", {"stock_code": "015760"}, task_id=task_id)
+        deadline = monotonic() + 5
+        while "015760" in self.server.module.order_books and monotonic() < deadline:
+            sleep(0.05)
+        self.assertNotIn("015760", self.server.module.order_books)
+
+        # Skipped deltas would corrupt the book
+        other_client = sim.SimulatedClient()
+        other_client.request("subscribe-orderbook", {"stock_code": "015760", "degrade": "latest"})
+        self.assertEqual("TASK_FAILED", other_client.wait(1)[0][2]["status"])
+        other_client.close()
+
+    def test_screen(self):
+        parameters = {
+            "stock_codes": "068270;207940",
+            "when": {"all": [{"field": "price", "op": ">", "value": 0}, {"field": "change_rate", "op": ">", "value": -100}]},
+        }
+        # Nothing is kept of a screen failed to subscribe
+        task_id = self.client.request("subscribe-screen", {**parameters, "transport": "carrier-pigeon"})
+        self.assertEqual("TASK_FAILED", self.client.wait(1)[0][2]["status"])
+        self.assertFalse(self.server.module.has_listeners("068270"))
+        self.client.replies.clear()
+        self.client.request("subscribe-screen", parameters, task_id=task_id)
+        replies = self.client.wait(3)
+        self.assertEqual("TASK_SUCCEED", replies[0][2]["status"])
+        events = [each[2]["result"] for each in replies[1:3]]
+        # Sent once as each stock starts matching
+        self.assertEqual({"068270", "207940"}, {each["stock_code"] for each in events})
+        self.assertGreater(events[0]["price"], 0)
+        self.assertTrue(self.server.module.has_listeners("068270"))
+        self.client.request("unsubscribe-screen", {}, task_id=task_id)
+        self.assertEqual("TASK_SUCCEED", self.client.wait(4)[3][2]["status"])
+        self.assertFalse(self.server.module.has_listeners("068270"))
+        # Screens are not evaluated once none is left
+        deadline = monotonic() + 5
+        while self.server.module.screen_timer.isActive() and monotonic() < deadline:
+            sleep(0.05)
+        self.assertFalse(self.server.module.screen_timer.isActive())
+
+    def test_backpressure(self):
+        arguments = sim.get_queue_arguments(max_length=40)
+        client = sim.SimulatedClient(arguments=arguments)
+        task_id = client.request("subscribe-realtime", {"stock_code": "035720", "max_length": 40, "degrade": "latest"})
+        backpressure = self.server.module.messenger.backpressure
+        deadline = monotonic() + 5
+        while backpressure.get_mode(task_id) != sim.LATEST and monotonic() < deadline:
+            sleep(0.05)
+        self.assertEqual(sim.LATEST, backpressure.get_mode(task_id))
+        self.assertLessEqual(sim.BROKER.depth(client.reply_queue), 40)
+        deadline = monotonic() + 5
+        while backpressure.get_mode(task_id) != sim.NORMAL and monotonic() < deadline:
+            client.wait(10 ** 6, timeout=0.1)
+        self.assertEqual(sim.NORMAL, backpressure.get_mode(task_id))
+        client.request("unsubscribe-realtime", {"stock_code": "035720"}, task_id=task_id)
+        deadline = monotonic() + 5
+        while task_id in self.server.module.messenger.clients and monotonic() < deadline:
+            sleep(0.05)
+        self.assertNotIn(task_id, self.server.module.messenger.clients)
+        self.assertNotIn(task_id, backpressure.subscribers)
+        client.close()
+
+    def test_restore_subscriptions(self):
+        task_id = f"{self.client.reply_queue}-restored"
+        self.server.module.restore_subscriptions([{
+            "task_id": task_id,
+            "method": "subscribe-realtime",
+            "stock_code": "000660",
+            "parameters": {"stock_code": "000660"},
+            "reply_queue": self.client.reply_queue,
+        }])
+        replies = self.client.wait(1)
+        self.assertEqual(task_id, replies[0][0])
+        self.assertEqual("000660", replies[0][2]["result"]["stock_code"])
+        self.client.request("unsubscribe-realtime", {"stock_code": "000660"}, task_id=task_id)
+
+    @unittest.skipUnless(HAS_ZMQ, "pyzmq is not installed")
+    def test_zmq_transport(self):
+        subscriber = sim.LocalSubscriber(ZMQ_ENDPOINT, self.client.reply_queue)
+        task_id = self.client.request("subscribe-realtime", {"stock_code": "015760", "transport": "zmq"})
+        self.client.wait(1)
+        response = subscriber.receive(timeout=5)
+        self.assertEqual(task_id, response["task_id"])
+        self.assertEqual("015760", response["result"]["stock_code"])
+        self.client.request("unsubscribe-realtime", {"stock_code": "015760"}, task_id=task_id)
+        subscriber.close()
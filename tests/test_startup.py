@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+from sapi_kiwoom.startup import StartupTimer, StartupSnapshot, IMPORTED, LOGGED_IN, CONSUMING
+
+
+class StartupTimerTest(unittest.TestCase):
+
+    def test_breakdown(self):
+        reports = []
+        timer = StartupTimer(output=reports.append)
+        timer.mark(IMPORTED)
+        timer.mark(LOGGED_IN)
+        timer.mark(LOGGED_IN)
+        self.assertFalse(timer.is_ready)
+        timer.mark(CONSUMING)
+        self.assertTrue(timer.is_ready)
+        report = timer.to_dict()
+        self.assertEqual([IMPORTED, LOGGED_IN, CONSUMING], [each["phase"] for each in report["phases"]])
+        self.assertAlmostEqual(report["total_ms"], sum(each["elapsed_ms"] for each in report["phases"]), places=2)
+        self.assertEqual(1, len(reports))
+        self.assertTrue(reports[0].startswith("Ready in"))
+
+
+class StartupSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        master_data = {"get-stock-name": {"005930": "삼성전자"}}
+        subscriptions = [{
+            "task_id": "task",
+            "method": "subscribe-realtime",
+            "stock_code": "005930",
+            "parameters": {"stock_code": "005930"},
+            "reply_queue": "reply",
+        }]
+        StartupSnapshot(self.path).save(master_data, subscriptions)
+        snapshot = StartupSnapshot(self.path)
+        self.assertTrue(snapshot.load())
+        self.assertEqual(master_data, snapshot.master_data)
+        self.assertEqual(subscriptions, snapshot.subscriptions)
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+    def test_stale_snapshot(self):
+        self.assertFalse(StartupSnapshot(self.path).load())
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump({"version": 1, "day": "20000101", "master_data": {"a": {}}, "subscriptions": [{}]}, file)
+        snapshot = StartupSnapshot(self.path)
+        self.assertFalse(snapshot.load())
+        self.assertEqual([], snapshot.subscriptions)
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("{")
+        self.assertFalse(StartupSnapshot(self.path).load())
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from time import monotonic, sleep
+
+from sapi_kiwoom.watchdog import EventLoopWatchdog, SamplingProfiler
+
+
+def spin(seconds):
+    deadline = monotonic() + seconds
+    while monotonic() < deadline:
+        pass
+
+
+class EventLoopWatchdogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.outputs = []
+        self.watchdog = EventLoopWatchdog(threshold=20, output=self.outputs.append)
+
+    def test_slow_callback(self):
+        def on_receive_real_data(seconds):
+            sleep(seconds)
+
+        watched = self.watchdog.watch(on_receive_real_data)
+        watched(0)
+        self.assertEqual([], self.outputs)
+        watched(0.03)
+        self.assertEqual("on_receive_real_data", self.watchdog.slow_callbacks[0]["callback"])
+        self.assertGreaterEqual(self.watchdog.slow_callbacks[0]["duration_ms"], 20)
+        self.assertTrue(self.outputs[0].startswith("Slow callback on_receive_real_data took"))
+
+    def test_lag(self):
+        self.watchdog.check()
+        self.watchdog.check()
+        self.assertEqual(0, self.watchdog.stalls)
+        self.watchdog.heartbeat -= 0.2
+        self.watchdog.check()
+        self.assertEqual(1, self.watchdog.stalls)
+        self.assertTrue(self.outputs[0].startswith("Event loop blocked for"))
+        lag = self.watchdog.to_dict()["lag_ms"]
+        self.assertEqual(2, lag["count"])
+        self.assertGreaterEqual(lag["max"], 180)
+
+    def test_profile_arguments(self):
+        with self.assertRaises(ValueError):
+            self.watchdog.start_profile(1, print)
+        self.watchdog.check()
+        with self.assertRaises(ValueError):
+            self.watchdog.start_profile(0, print)
+
+
+class SamplingProfilerTest(unittest.TestCase):
+
+    def test_profile(self):
+        thread = threading.Thread(target=spin, args=(0.3,))
+        thread.start()
+        profiler = SamplingProfiler(thread.ident, 0.1, interval=0.002).start()
+        profiler.thread.join()
+        thread.join()
+        profile = profiler.to_dict()
+        self.assertGreater(profile["samples"], 0)
+        self.assertTrue(profile["functions"][0]["function"].startswith("test_watchdog.py:spin:"))
+        self.assertEqual(1.0, profile["functions"][0]["total_ratio"])
+        self.assertIn("test_watchdog.py:spin:", profile["stacks"][0]["stack"])